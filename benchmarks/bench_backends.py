@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+渲染引擎对比基准
+
+生成合成图片，分别用各渲染引擎转换，比较耗时与文件大小，
+并用openpyxl重新打开输出文件，校验各引擎生成的填充颜色、
+列宽和行高与默认openpyxl引擎完全一致。
+
+运行:
+    python benchmarks/bench_backends.py --size 300
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# 添加项目路径到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openpyxl
+from openpyxl.utils import column_index_from_string
+
+from img2excel.core import ImageToExcel, ENGINES
+from synthetic import make_gradient
+
+
+def read_sheet(path: str) -> dict:
+    """读取工作表的填充颜色、列宽和行高"""
+    worksheet = openpyxl.load_workbook(path).active
+    fills = [
+        [cell.fill.start_color.rgb for cell in row]
+        for row in worksheet.iter_rows()
+    ]
+    
+    # 列宽可能以区间形式存储（min..max），展开到每一列
+    widths = {}
+    for key, dimension in worksheet.column_dimensions.items():
+        first = dimension.min or column_index_from_string(key)
+        last = dimension.max or first
+        for col in range(first, last + 1):
+            widths[col] = dimension.width
+    heights = {
+        row: worksheet.row_dimensions[row].height or worksheet.sheet_format.defaultRowHeight
+        for row in range(1, worksheet.max_row + 1)
+    }
+    
+    return {
+        "title": worksheet.title,
+        "fills": fills,
+        "widths": [widths.get(col) for col in range(1, worksheet.max_column + 1)],
+        "heights": heights,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比各渲染引擎的耗时并校验输出")
+    parser.add_argument("--size", type=int, default=300, help="测试图片边长（像素）")
+    parser.add_argument("--repeat", type=int, default=3, help="每个引擎重复次数，取最快一次")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        image_path = os.path.join(workdir, "gradient.png")
+        make_gradient(args.size).save(image_path)
+        converter = ImageToExcel(image_path)
+        
+        results = {}
+        for engine in ENGINES:
+            output_path = os.path.join(workdir, f"{engine}.xlsx")
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                converter.convert_to_excel(output_path, cell_width=14, cell_height=14, engine=engine)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results[engine] = (best, os.path.getsize(output_path), read_sheet(output_path))
+        
+        reference = results["openpyxl"][2]
+        print()
+        print(f"{'引擎':<10}{'耗时(秒)':>10}{'加速比':>8}{'文件大小':>12}  校验")
+        failed = False
+        for engine, (elapsed, size, sheet) in results.items():
+            valid = sheet == reference
+            failed = failed or not valid
+            speedup = results["openpyxl"][0] / elapsed
+            print(f"{engine:<10}{elapsed:>10.3f}{speedup:>8.1f}x{size:>12}  {'一致' if valid else '不一致'}")
+    
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
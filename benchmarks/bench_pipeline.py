@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+转换流程分阶段基准
+
+用合成图片（渐变、噪声、平涂像素画，边长50~1000像素）运行默认openpyxl
+引擎的完整转换流程，分别计时各个阶段：
+
+    load        按目标尺寸解码图片（_load_image）
+    resize      缩放到目标尺寸（resize_image）
+    index       转换为调色板和索引图（build_color_index）
+    dimensions  设置列宽和行高（_set_cell_dimensions）
+    render      逐单元格设置样式（_render_image_to_excel）
+    save        写出文件（workbook.save）
+
+同时记录峰值内存（RSS）和输出文件大小。每个用例在单独的子进程中运行，
+峰值内存只反映该用例本身。结果可保存为JSON，并与保存的基准结果比较，
+任一阶段变慢超过阈值时以退出码1结束，便于在升级openpyxl、Pillow后检查性能回归。
+
+运行:
+    # 生成基准结果
+    python benchmarks/bench_pipeline.py --update-baseline
+    
+    # 之后与基准比较，任一阶段慢25%以上时失败
+    python benchmarks/bench_pipeline.py --threshold 0.25 --output results.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+# 添加项目路径到Python路径
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import openpyxl
+import PIL
+
+from img2excel.core import ImageToExcel
+from img2excel.palette import build_color_index
+from img2excel.utils import format_file_size, resize_image
+from synthetic import IMAGE_KINDS
+
+
+# 计时的阶段，按执行顺序排列
+STAGES = ("load", "resize", "index", "dimensions", "render", "save")
+
+# 默认基准结果文件
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """当前进程的峰值常驻内存（字节），不支持的平台返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux以KB为单位，macOS以字节为单位
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_case(image_path: str, target_size: Tuple[int, int], cell_size: int, repeat: int) -> dict:
+    """
+    运行一个用例，每个阶段取多次运行中最快的一次
+    
+    Args:
+        image_path: 测试图片路径
+        target_size: 目标尺寸 (宽度, 高度)
+        cell_size: 单元格边长（像素）
+        repeat: 重复次数
+    
+    Returns:
+        包含各阶段耗时、峰值内存和输出大小的字典
+    """
+    best = {}
+    output_bytes = 0
+    
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as workdir, contextlib.redirect_stdout(io.StringIO()):
+            output_path = os.path.join(workdir, "output.xlsx")
+            converter = ImageToExcel(image_path)
+            timings = {}
+            
+            start = time.perf_counter()
+            source = converter._load_image(target_size)
+            timings["load"] = time.perf_counter() - start
+            
+            start = time.perf_counter()
+            resized = resize_image(source, target_size)
+            if resized.mode != "RGB":
+                resized = resized.convert("RGB")
+            timings["resize"] = time.perf_counter() - start
+            
+            start = time.perf_counter()
+            color_index = build_color_index(resized)
+            timings["index"] = time.perf_counter() - start
+            
+            start = time.perf_counter()
+            converter.workbook = openpyxl.Workbook()
+            converter.worksheet = converter.workbook.active
+            converter._set_cell_dimensions(*target_size, cell_size, cell_size)
+            timings["dimensions"] = time.perf_counter() - start
+            
+            start = time.perf_counter()
+            converter._render_image_to_excel(color_index)
+            timings["render"] = time.perf_counter() - start
+            
+            start = time.perf_counter()
+            converter.workbook.save(output_path)
+            timings["save"] = time.perf_counter() - start
+            
+            output_bytes = os.path.getsize(output_path)
+        
+        for stage, seconds in timings.items():
+            best[stage] = seconds if stage not in best else min(best[stage], seconds)
+    
+    return {
+        "width": target_size[0],
+        "height": target_size[1],
+        "cells": target_size[0] * target_size[1],
+        "stages": best,
+        "total": sum(best.values()),
+        "peak_rss_bytes": peak_rss_bytes(),
+        "output_bytes": output_bytes,
+    }
+
+
+def run_isolated(image_path: str, target_size: Tuple[int, int], cell_size: int, repeat: int) -> dict:
+    """在新的子进程中运行用例，使峰值内存互不影响"""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(run_case, image_path, target_size, cell_size, repeat).result()
+
+
+def environment() -> dict:
+    """记录影响性能的运行环境"""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pillow": PIL.__version__,
+        "openpyxl": openpyxl.__version__,
+        "numpy": np.__version__,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_seconds: float) -> List[str]:
+    """
+    与基准结果比较，找出变慢超过阈值的阶段
+    
+    Args:
+        results: 本次结果
+        baseline: 基准结果
+        threshold: 允许的相对变慢比例，如0.25表示25%
+        min_seconds: 绝对差值小于该值时忽略，避免计时噪声造成误报
+    
+    Returns:
+        回归描述列表，为空表示没有回归
+    """
+    regressions = []
+    for name, case in results["cases"].items():
+        reference = baseline.get("cases", {}).get(name)
+        if reference is None:
+            continue
+        
+        measured = dict(case["stages"], total=case["total"])
+        expected = dict(reference["stages"], total=reference["total"])
+        for stage, seconds in measured.items():
+            old = expected.get(stage)
+            if old is None:
+                continue
+            if seconds > old * (1 + threshold) and seconds - old > min_seconds:
+                regressions.append(
+                    f"{name} {stage}: {old:.4f}s -> {seconds:.4f}s (+{(seconds / old - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def print_table(results: dict):
+    """打印各用例的分阶段耗时"""
+    header = f"{'用例':<14}{'单元格':>6}" + "".join(f"{stage:>11}" for stage in STAGES)
+    print(header + f"{'合计':>9}{'峰值内存':>8}{'输出大小':>8}")
+    for name, case in results["cases"].items():
+        stages = "".join(f"{case['stages'][stage]:>11.4f}" for stage in STAGES)
+        rss = case["peak_rss_bytes"]
+        print(
+            f"{name:<16}{case['cells']:>9}{stages}{case['total']:>11.4f}"
+            f"{format_file_size(rss) if rss else '-':>12}{format_file_size(case['output_bytes']):>12}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分阶段测量转换流程耗时并检查性能回归")
+    parser.add_argument("--sizes", default="50,200,500,1000", help="测试图片边长列表（像素），逗号分隔")
+    parser.add_argument(
+        "--kinds",
+        default=",".join(IMAGE_KINDS),
+        help=f"测试图片类型，逗号分隔（可选: {', '.join(IMAGE_KINDS)}）"
+    )
+    parser.add_argument("--scale", type=float, default=0.5, help="目标尺寸相对图片边长的比例")
+    parser.add_argument("--cell-size", type=int, default=14, help="单元格边长（像素）")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例重复次数，各阶段取最快一次")
+    parser.add_argument("--output", help="将结果保存为JSON文件")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基准结果JSON文件")
+    parser.add_argument("--update-baseline", action="store_true", help="用本次结果覆盖基准结果，不做比较")
+    parser.add_argument("--threshold", type=float, default=0.25, help="允许的相对变慢比例（默认: 0.25）")
+    parser.add_argument("--min-seconds", type=float, default=0.005, help="忽略小于该值的绝对耗时差（秒）")
+    args = parser.parse_args()
+    
+    sizes = [int(size) for size in args.sizes.split(",")]
+    kinds = args.kinds.split(",")
+    for kind in kinds:
+        if kind not in IMAGE_KINDS:
+            parser.error(f"不支持的图片类型: {kind}（可选: {', '.join(IMAGE_KINDS)}）")
+    
+    results = {
+        "environment": environment(),
+        "settings": {"scale": args.scale, "cell_size": args.cell_size, "repeat": args.repeat},
+        "cases": {},
+    }
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        for kind in kinds:
+            for size in sizes:
+                name = f"{kind}-{size}"
+                image_path = os.path.join(workdir, f"{name}.png")
+                IMAGE_KINDS[kind](size).save(image_path)
+                target = max(1, int(size * args.scale))
+                print(f"运行 {name} ...", file=sys.stderr)
+                results["cases"][name] = run_isolated(
+                    image_path, (target, target), args.cell_size, args.repeat
+                )
+    
+    print()
+    print_table(results)
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\n结果已保存: {args.output}")
+    
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"基准结果已更新: {args.baseline}")
+        return
+    
+    if not os.path.exists(args.baseline):
+        print(f"\n未找到基准结果 {args.baseline}，跳过回归检查（使用 --update-baseline 生成）")
+        return
+    
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("settings") != results["settings"]:
+        print(f"\n警告: 基准结果的参数 {baseline.get('settings')} 与本次不同，比较结果可能没有意义")
+    
+    regressions = compare(results, baseline, args.threshold, args.min_seconds)
+    if regressions:
+        print(f"\n以下阶段比基准慢 {args.threshold * 100:.0f}% 以上:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"\n与基准相比没有超过 {args.threshold * 100:.0f}% 的性能回归")
+
+
+if __name__ == "__main__":
+    main()
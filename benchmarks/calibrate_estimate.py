@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+开销模型校准
+
+用合成图片（渐变、噪声、平涂像素画，分别不量化和量化）在各渲染引擎上运行完整转换，
+记录耗时、输出文件大小和峰值内存增量，按 img2excel.estimate 中的特征
+拟合线性模型，供 ImageToExcel.estimate 和 img2excel --preview 使用。
+
+拟合使用以1/实测值为权重的最小二乘（使相对误差最小），系数为负的特征
+去掉后重新拟合，保证预测值随规模单调增长。每个用例在单独的子进程中运行，
+峰值内存只反映该用例本身。
+
+运行:
+    # 打印拟合结果和各用例的相对误差
+    python benchmarks/calibrate_estimate.py
+    
+    # 保存为模型文件，之后通过 img2excel --preview --cost-model models.json 使用
+    python benchmarks/calibrate_estimate.py --output models.json
+    
+    # 保存实测结果，之后只重新拟合
+    python benchmarks/calibrate_estimate.py --save-cases cases.json
+    python benchmarks/calibrate_estimate.py --load-cases cases.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 添加项目路径到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from bench_pipeline import environment, peak_rss_bytes
+from img2excel.core import ENGINES
+from img2excel.estimate import (
+    CostModel, bytes_features, memory_features, save_models, seconds_features
+)
+from synthetic import IMAGE_KINDS
+
+
+def current_rss_bytes() -> Optional[int]:
+    """当前进程的常驻内存（字节），只支持Linux，其他平台返回None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def run_case(
+    image_path: str,
+    target_size: Tuple[int, int],
+    engine: str,
+    colors: Optional[int] = None
+) -> dict:
+    """
+    运行一次完整转换
+    
+    Args:
+        image_path: 测试图片路径
+        target_size: 目标尺寸 (宽度, 高度)
+        engine: 渲染引擎
+        colors: 量化后的最大颜色数量，None表示不量化
+    
+    Returns:
+        包含特征值和实测耗时、文件大小、峰值内存增量的字典
+    """
+    from img2excel.core import ImageToExcel
+    
+    with tempfile.TemporaryDirectory() as workdir, contextlib.redirect_stdout(io.StringIO()):
+        output_path = os.path.join(workdir, "output.xlsx")
+        converter = ImageToExcel(image_path)
+        # 导入模块时的峰值可能高于转换本身，以转换前的当前内存为基准
+        baseline_rss = current_rss_bytes() or peak_rss_bytes() or 0
+        
+        start = time.perf_counter()
+        converter.convert_to_excel(
+            output_path, max_width=target_size[0], max_height=target_size[1],
+            engine=engine, colors=colors
+        )
+        seconds = time.perf_counter() - start
+        
+        # 与转换使用的尺寸相同，直接取memo中的索引图
+        color_index = converter._prepare_color_index(*target_size, colors=colors)
+        index_map = color_index.index_map
+        change_rate = 1.0
+        if index_map.shape[1] > 1:
+            change_rate = float(np.mean(index_map[:, 1:] != index_map[:, :-1]))
+        return {
+            "cells": target_size[0] * target_size[1],
+            "colors": color_index.color_count,
+            "change_rate": change_rate,
+            "source_pixels": converter._decoded_pixels(target_size),
+            "seconds": seconds,
+            "output_bytes": os.path.getsize(output_path),
+            "memory_bytes": max((peak_rss_bytes() or 0) - baseline_rss, 0),
+        }
+
+
+def run_isolated(
+    image_path: str,
+    target_size: Tuple[int, int],
+    engine: str,
+    colors: Optional[int] = None
+) -> dict:
+    """在新的子进程中运行用例，使峰值内存互不影响"""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(run_case, image_path, target_size, engine, colors).result()
+
+
+def fit(features: np.ndarray, measured: np.ndarray) -> List[float]:
+    """
+    以相对误差为目标的非负最小二乘
+    
+    Args:
+        features: 形状为 (用例数, 特征数) 的特征矩阵
+        measured: 各用例的实测值
+    
+    Returns:
+        各特征的系数，均不小于0
+    """
+    # 实测为0的用例（如内存增量低于测量精度）不参与拟合
+    measurable = measured > 0
+    features, measured = features[measurable], measured[measurable]
+    weights = 1.0 / measured
+    active = np.ones(features.shape[1], dtype=bool)
+    coefficients = np.zeros(features.shape[1])
+    while active.any():
+        solution, *_ = np.linalg.lstsq(
+            features[:, active] * weights[:, np.newaxis], measured * weights, rcond=None
+        )
+        if (solution >= 0).all():
+            coefficients[active] = solution
+            break
+        # 去掉最负的特征后重新拟合
+        active[np.flatnonzero(active)[np.argmin(solution)]] = False
+    return coefficients.tolist()
+
+
+def fit_model(cases: Sequence[dict]) -> CostModel:
+    """用一个渲染引擎的全部用例拟合开销模型"""
+    def column(name):
+        return np.array([case[name] for case in cases], dtype=float)
+    
+    def matrix(function, *names):
+        return np.array(
+            [function(*(case[name] for name in names)) for case in cases], dtype=float
+        )
+    
+    return CostModel(
+        tuple(fit(matrix(seconds_features, "cells", "colors", "source_pixels"), column("seconds"))),
+        tuple(fit(matrix(bytes_features, "cells", "colors", "change_rate"), column("output_bytes"))),
+        tuple(fit(matrix(memory_features, "cells", "colors", "source_pixels"), column("memory_bytes")))
+    )
+
+
+def relative_errors(model: CostModel, cases: Sequence[dict]) -> Dict[str, float]:
+    """各项预测的相对误差中位数"""
+    from img2excel.estimate import predict
+    
+    errors = {"seconds": [], "output_bytes": [], "memory_bytes": []}
+    for case in cases:
+        predicted = predict(
+            model, case["cells"], case["colors"], case["source_pixels"], case["change_rate"]
+        )
+        for name, value in zip(errors, predicted):
+            if case[name]:
+                errors[name].append(abs(value - case[name]) / case[name])
+    return {name: float(np.median(values)) if values else 0.0 for name, values in errors.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="拟合转换耗时、文件大小和峰值内存的开销模型")
+    parser.add_argument("--sizes", default="100,300,600", help="测试图片边长列表（像素），逗号分隔")
+    parser.add_argument("--scales", default="0.25,0.5,1.0", help="目标尺寸相对图片边长的比例，逗号分隔")
+    parser.add_argument(
+        "--kinds",
+        default=",".join(IMAGE_KINDS),
+        help=f"测试图片类型，逗号分隔（可选: {', '.join(IMAGE_KINDS)}）"
+    )
+    parser.add_argument(
+        "--colors",
+        default="none,16",
+        help="量化颜色数量列表，逗号分隔，none表示不量化（量化后的用例覆盖颜色少但变化多的图片）"
+    )
+    parser.add_argument(
+        "--engines",
+        default=",".join(ENGINES),
+        help=f"渲染引擎，逗号分隔（可选: {', '.join(ENGINES)}）"
+    )
+    parser.add_argument("--output", help="将模型保存为JSON文件")
+    parser.add_argument("--save-cases", help="将各用例的实测结果保存为JSON文件")
+    parser.add_argument("--load-cases", help="读取保存的实测结果，不重新运行转换")
+    args = parser.parse_args()
+    
+    sizes = [int(size) for size in args.sizes.split(",")]
+    scales = [float(scale) for scale in args.scales.split(",")]
+    kinds = args.kinds.split(",")
+    engines = args.engines.split(",")
+    palettes = [None if value == "none" else int(value) for value in args.colors.split(",")]
+    for kind in kinds:
+        if kind not in IMAGE_KINDS:
+            parser.error(f"不支持的图片类型: {kind}（可选: {', '.join(IMAGE_KINDS)}）")
+    for engine in engines:
+        if engine not in ENGINES:
+            parser.error(f"不支持的渲染引擎: {engine}（可选: {', '.join(ENGINES)}）")
+    
+    if args.load_cases:
+        with open(args.load_cases, encoding="utf-8") as f:
+            cases = json.load(f)
+    else:
+        cases = {engine: [] for engine in engines}
+        with tempfile.TemporaryDirectory() as workdir:
+            for kind in kinds:
+                for size in sizes:
+                    image_path = os.path.join(workdir, f"{kind}-{size}.png")
+                    IMAGE_KINDS[kind](size).save(image_path)
+                    for scale in scales:
+                        target = max(1, int(size * scale))
+                        for palette in palettes:
+                            for engine in engines:
+                                print(
+                                    f"运行 {kind}-{size} {target}x{target} colors={palette} {engine} ...",
+                                    file=sys.stderr
+                                )
+                                cases[engine].append(
+                                    run_isolated(image_path, (target, target), engine, palette)
+                                )
+    
+    if args.save_cases:
+        with open(args.save_cases, "w", encoding="utf-8") as f:
+            json.dump(cases, f, indent=2)
+    
+    models = {engine: fit_model(engine_cases) for engine, engine_cases in cases.items()}
+    
+    print(f"\n环境: {environment()}")
+    for engine, model in models.items():
+        errors = relative_errors(model, cases[engine])
+        print(f"\n{engine}:")
+        print(f"  seconds={model.seconds!r}")
+        print(f"  output_bytes={model.output_bytes!r}")
+        print(f"  memory_bytes={model.memory_bytes!r}")
+        print(
+            "  相对误差中位数: "
+            + ", ".join(f"{name} {error * 100:.0f}%" for name, error in errors.items())
+        )
+    
+    if args.output:
+        save_models(models, args.output)
+        print(f"\n模型已保存: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
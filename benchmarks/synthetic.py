@@ -0,0 +1,46 @@
+"""
+合成测试图片
+
+基准脚本使用的图片全部在本地按固定随机种子生成，不依赖外部文件，
+每次运行得到的像素完全相同。
+"""
+
+from typing import Callable, Dict
+
+import numpy as np
+from PIL import Image
+
+
+def make_gradient(size: int) -> Image.Image:
+    """生成渐变测试图片（颜色数量随尺寸增长）"""
+    x = np.linspace(0, 255, size, dtype=np.uint8)
+    pixels = np.zeros((size, size, 3), dtype=np.uint8)
+    pixels[..., 0] = x[np.newaxis, :]
+    pixels[..., 1] = x[:, np.newaxis]
+    pixels[..., 2] = 128
+    return Image.fromarray(pixels, "RGB")
+
+
+def make_noise(size: int) -> Image.Image:
+    """生成随机噪声图片（几乎每个像素颜色都不同，最坏情况）"""
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+    return Image.fromarray(pixels, "RGB")
+
+
+def make_flat(size: int) -> Image.Image:
+    """生成平涂像素画（少量颜色的大色块，接近典型的像素艺术）"""
+    rng = np.random.default_rng(0)
+    palette = rng.integers(0, 256, (8, 3), dtype=np.uint8)
+    blocks = rng.integers(0, len(palette), (8, 8))
+    cell = -(-size // 8)
+    indices = np.kron(blocks, np.ones((cell, cell), dtype=int))[:size, :size]
+    return Image.fromarray(palette[indices], "RGB")
+
+
+# 图片类型名称 -> 生成函数
+IMAGE_KINDS: Dict[str, Callable[[int], Image.Image]] = {
+    "gradient": make_gradient,
+    "noise": make_noise,
+    "flat": make_flat,
+}
@@ -0,0 +1,127 @@
+"""
+异步接口模块 - 在asyncio应用中转换图片而不阻塞事件循环
+
+解码、渲染和写出文件都在执行器（线程池或进程池）中完成，事件循环
+只负责调度，因此在转换过程中仍能处理其他协程。
+"""
+
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import AsyncIterator, Iterable, Optional
+
+from .batch import BatchResult, convert_one, plan_outputs
+from .core import ImageToExcel
+from .parallel import default_jobs
+from .progress import CancelToken
+
+
+def _convert(input_path: str, output_path: str, options: dict) -> str:
+    """在执行器中执行一次转换"""
+    return ImageToExcel(input_path).convert_to_excel(output_path, **options)
+
+
+async def convert_async(
+    input_path: str,
+    output_path: str,
+    executor: Optional[Executor] = None,
+    **options
+) -> str:
+    """
+    异步转换单张图片
+    
+    在线程中运行时（默认使用事件循环的默认执行器），等待转换的任务被取消后，
+    转换会在下一次检查时中止并删除未完成的输出文件；进程池中的转换无法中途取消，
+    会在后台运行结束。
+    
+    Args:
+        input_path: 输入图片路径
+        output_path: 输出Excel文件路径
+        executor: 执行器，None表示事件循环的默认线程池；
+            CPU密集的大量转换建议传入ProcessPoolExecutor
+        **options: 传给 convert_to_excel 的参数
+    
+    Returns:
+        输出文件路径
+    """
+    loop = asyncio.get_running_loop()
+    
+    token = None
+    if not isinstance(executor, ProcessPoolExecutor) and "cancel" not in options:
+        token = CancelToken()
+        options = dict(options, cancel=token)
+    
+    try:
+        return await loop.run_in_executor(executor, _convert, input_path, output_path, options)
+    except asyncio.CancelledError:
+        if token is not None:
+            token.cancel()
+        raise
+
+
+async def convert_many(
+    input_paths: Iterable[str],
+    out_dir: Optional[str] = None,
+    concurrency: Optional[int] = None,
+    executor: Optional[Executor] = None,
+    **options
+) -> AsyncIterator[BatchResult]:
+    """
+    异步并发转换多张图片，按完成顺序逐个返回结果
+    
+    同时进行的转换最多为concurrency个，其余图片在前面的转换完成后才提交，
+    因此突发的大量请求不会使内存无限增长。单个文件失败不影响其他文件，
+    错误记录在BatchResult.error中。
+    
+    Args:
+        input_paths: 输入图片路径
+        out_dir: 输出目录（不存在时自动创建），None表示输出到图片所在目录
+        concurrency: 最多同时进行的转换数，默认为CPU核心数
+        executor: 执行器，None表示创建一个concurrency个进程的进程池，结束时关闭
+        **options: 传给 convert_to_excel 的参数
+    
+    Returns:
+        BatchResult的异步迭代器
+    """
+    input_paths = list(input_paths)
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+        outputs = plan_outputs(input_paths, out_dir)
+    else:
+        outputs = {path: os.path.splitext(path)[0] + ".xlsx" for path in input_paths}
+    
+    concurrency = concurrency or default_jobs()
+    owns_executor = executor is None
+    if owns_executor:
+        executor = ProcessPoolExecutor(max_workers=concurrency)
+    # 线程中不能重定向标准输出（会影响整个进程）
+    quiet = isinstance(executor, ProcessPoolExecutor)
+    
+    loop = asyncio.get_running_loop()
+    remaining = iter(input_paths)
+    running = {}
+    try:
+        while True:
+            for path in remaining:
+                future = loop.run_in_executor(executor, convert_one, path, outputs[path], options, quiet)
+                running[future] = path
+                if len(running) >= concurrency:
+                    break
+            if not running:
+                return
+            
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                path = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # 工作进程崩溃等情况，只影响当前文件
+                    result = BatchResult(path, outputs[path], error=str(e) or type(e).__name__)
+                yield result
+    finally:
+        # 提前退出（break或任务取消）时放弃尚未开始的转换
+        for future in running:
+            future.cancel()
+        if owns_executor:
+            executor.shutdown(wait=False)
@@ -0,0 +1,149 @@
+"""
+数组输入模块 - 从NumPy数组、.npy文件和原始像素文件读取图片
+
+.npy 和原始像素文件以内存映射方式打开，缩小时按水平条带分块求平均，
+只有缩小后的中间图片会完整地放在内存中，内存占用取决于输出尺寸而不是输入尺寸。
+"""
+
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+
+# 支持的数组输入文件扩展名
+ARRAY_EXTENSIONS = (".npy",)
+
+# 缩小时每个条带读取的输入字节数上限
+_BAND_BYTES = 16 * 1024 * 1024
+
+# 数组通道数对应的PIL图片模式
+_MODES = {2: "L", 3: "RGB", 4: "RGBA"}
+
+
+def pixel_mode(array: np.ndarray) -> str:
+    """
+    检查数组是否为可转换的像素数组，返回对应的PIL图片模式
+    
+    Args:
+        array: 形状为 (高度, 宽度)、(高度, 宽度, 3) 或 (高度, 宽度, 4) 的uint8数组
+    
+    Returns:
+        "L"、"RGB" 或 "RGBA"
+    """
+    if array.dtype != np.uint8:
+        raise ValueError(f"不支持的数组类型: {array.dtype}（可选: uint8）")
+    if array.ndim not in (2, 3) or (array.ndim == 3 and array.shape[2] not in (3, 4)):
+        raise ValueError(
+            f"不支持的数组形状: {array.shape}（可选: (高度, 宽度)、(高度, 宽度, 3)、(高度, 宽度, 4)）"
+        )
+    if array.shape[0] == 0 or array.shape[1] == 0:
+        raise ValueError(f"图片尺寸为空: {array.shape}")
+    return _MODES[array.ndim] if array.ndim == 2 else _MODES[array.shape[2]]
+
+
+def load_npy(path: str) -> np.ndarray:
+    """
+    以内存映射方式打开 .npy 文件，不读取像素数据
+    
+    Args:
+        path: .npy 文件路径
+    
+    Returns:
+        只读的内存映射数组
+    """
+    try:
+        array = np.load(path, mmap_mode="r", allow_pickle=False)
+    except Exception as e:
+        raise ValueError(f"无法加载数组文件: {e}")
+    pixel_mode(array)
+    return array
+
+
+def map_raw(path: str, width: int, height: int, channels: int = 3) -> np.ndarray:
+    """
+    以内存映射方式打开原始像素文件（逐行排列的uint8像素，无文件头）
+    
+    Args:
+        path: 原始像素文件路径
+        width: 图片宽度
+        height: 图片高度
+        channels: 每个像素的通道数，1（灰度）、3（RGB）或 4（RGBA）
+    
+    Returns:
+        形状为 (高度, 宽度) 或 (高度, 宽度, 通道数) 的只读内存映射数组
+    """
+    if channels not in (1, 3, 4):
+        raise ValueError(f"不支持的通道数: {channels}（可选: 1, 3, 4）")
+    if width < 1 or height < 1:
+        raise ValueError(f"图片尺寸必须大于0: {width}x{height}")
+    expected = width * height * channels
+    actual = os.path.getsize(path)
+    if actual != expected:
+        raise ValueError(
+            f"原始像素文件大小 {actual} 字节与尺寸 {width}x{height}x{channels} 不符（应为 {expected} 字节）"
+        )
+    shape = (height, width) if channels == 1 else (height, width, channels)
+    return np.memmap(path, dtype=np.uint8, mode="r", shape=shape)
+
+
+def reduce_array(array: np.ndarray, factor: int) -> np.ndarray:
+    """
+    按整数倍缩小像素数组（每 factor x factor 个像素求平均）
+    
+    按水平条带读取输入，内存映射数组不会被整体读入内存。
+    宽高不能被factor整除时，多余的边缘像素被舍弃。
+    
+    Args:
+        array: 形状为 (高度, 宽度) 或 (高度, 宽度, 通道数) 的uint8数组
+        factor: 缩小倍数
+    
+    Returns:
+        缩小后的uint8数组
+    """
+    height, width = array.shape[0] // factor, array.shape[1] // factor
+    rest = array.shape[2:]
+    reduced = np.empty((height, width) + rest, dtype=np.uint8)
+    
+    row_bytes = array.shape[1] * int(np.prod(rest, dtype=np.int64)) * factor
+    band_rows = max(1, _BAND_BYTES // max(row_bytes, 1))
+    count = factor * factor
+    for start in range(0, height, band_rows):
+        stop = min(start + band_rows, height)
+        block = np.asarray(array[start * factor:stop * factor, :width * factor])
+        sums = block.reshape((stop - start, factor, width, factor) + rest).sum(axis=(1, 3), dtype=np.uint32)
+        reduced[start:stop] = (sums + count // 2) // count
+    return reduced
+
+
+def array_to_image(
+    array: np.ndarray,
+    target_size: Optional[Tuple[int, int]] = None,
+    reducing_gap: int = 3
+) -> Image.Image:
+    """
+    将像素数组转换为PIL图片，指定目标尺寸时先按整数倍缩小
+    
+    缩小后的尺寸至少保留目标尺寸的 reducing_gap 倍，与文件输入的降分辨率解码一致。
+    透明通道被丢弃。
+    
+    Args:
+        array: 像素数组（可以是内存映射数组）
+        target_size: 目标尺寸 (宽度, 高度)，None表示完整分辨率
+        reducing_gap: 缩小后至少保留的目标尺寸倍数
+    
+    Returns:
+        RGB或灰度（L）模式的图片对象
+    """
+    if array.ndim == 3 and array.shape[2] == 4:
+        array = array[..., :3]
+    
+    if target_size is not None:
+        min_width = max(target_size[0], 1) * reducing_gap
+        min_height = max(target_size[1], 1) * reducing_gap
+        factor = min(array.shape[1] // min_width, array.shape[0] // min_height)
+        if factor >= 2:
+            array = reduce_array(array, factor)
+    
+    return Image.fromarray(np.ascontiguousarray(array))
@@ -0,0 +1,197 @@
+"""
+批量转换模块 - 使用进程池并行转换多张图片
+"""
+
+import contextlib
+import glob
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from .core import ImageToExcel
+from .utils import validate_image_path, format_file_size
+
+
+class BatchResult(NamedTuple):
+    """
+    单个文件的批量转换结果
+    
+    Attributes:
+        input_path: 输入图片路径
+        output_path: 输出Excel文件路径
+        seconds: 转换耗时（秒）
+        cells: 单元格数量
+        output_bytes: 输出文件大小（字节）
+        error: 失败时的错误信息，成功时为None
+    """
+    input_path: str
+    output_path: str
+    seconds: float = 0.0
+    cells: int = 0
+    output_bytes: int = 0
+    error: Optional[str] = None
+    
+    @property
+    def ok(self) -> bool:
+        """是否转换成功"""
+        return self.error is None
+
+
+def collect_images(source: str) -> List[str]:
+    """
+    收集需要转换的图片文件
+    
+    Args:
+        source: 目录路径或通配符模式（如 "assets/*.png"）
+    
+    Returns:
+        排序后的有效图片路径列表
+    """
+    if os.path.isdir(source):
+        candidates = [os.path.join(source, name) for name in os.listdir(source)]
+    else:
+        candidates = glob.glob(source, recursive=True)
+    
+    return sorted(path for path in candidates if os.path.isfile(path) and validate_image_path(path))
+
+
+def plan_outputs(input_paths: List[str], out_dir: str) -> Dict[str, str]:
+    """
+    为每个输入文件生成输出路径
+    
+    文件名（不含扩展名）重复时（如 a.png 和 a.jpg），在输出文件名中
+    保留扩展名以避免互相覆盖。
+    
+    Args:
+        input_paths: 输入图片路径列表
+        out_dir: 输出目录
+    
+    Returns:
+        输入路径到输出路径的映射
+    """
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in input_paths]
+    outputs = {}
+    for path, stem in zip(input_paths, stems):
+        if stems.count(stem) > 1:
+            stem = os.path.basename(path).replace('.', '_')
+        outputs[path] = os.path.join(out_dir, f"{stem}.xlsx")
+    return outputs
+
+
+def convert_one(input_path: str, output_path: str, options: dict, quiet: bool = True) -> BatchResult:
+    """
+    转换单个文件，捕获所有异常以便与其他文件隔离
+    
+    Args:
+        input_path: 输入图片路径
+        output_path: 输出Excel文件路径
+        options: 传给 convert_to_excel 的参数
+        quiet: 是否丢弃渲染日志；在线程中运行时须为False，
+            因为重定向标准输出会影响整个进程
+    
+    Returns:
+        BatchResult对象
+    """
+    start = time.perf_counter()
+    try:
+        converter = ImageToExcel(input_path)
+        # 工作进程的渲染日志会互相交错，这里直接丢弃
+        with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+            converter.convert_to_excel(output_path, **options)
+        return BatchResult(
+            input_path,
+            output_path,
+            seconds=time.perf_counter() - start,
+            cells=converter.stats.get("cells", 0),
+            output_bytes=os.path.getsize(output_path)
+        )
+    except Exception as e:
+        return BatchResult(
+            input_path,
+            output_path,
+            seconds=time.perf_counter() - start,
+            error=str(e) or type(e).__name__
+        )
+
+
+def convert_batch(
+    input_paths: List[str],
+    out_dir: str,
+    jobs: Optional[int] = None,
+    callback: Optional[Callable[[BatchResult], None]] = None,
+    **options
+) -> List[BatchResult]:
+    """
+    使用进程池并行转换多张图片
+    
+    Args:
+        input_paths: 输入图片路径列表
+        out_dir: 输出目录（不存在时自动创建）
+        jobs: 并行进程数，默认为CPU核心数；为1时在当前进程中顺序执行
+        callback: 每个文件完成时调用的回调函数
+        **options: 传给 convert_to_excel 的参数
+    
+    Returns:
+        按输入顺序排列的BatchResult列表
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    outputs = plan_outputs(input_paths, out_dir)
+    jobs = jobs or os.cpu_count() or 1
+    results: Dict[str, BatchResult] = {}
+    
+    def finish(result: BatchResult):
+        results[result.input_path] = result
+        if callback is not None:
+            callback(result)
+    
+    if jobs == 1 or len(input_paths) <= 1:
+        for path in input_paths:
+            finish(convert_one(path, outputs[path], options))
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(input_paths))) as executor:
+            futures = {
+                executor.submit(convert_one, path, outputs[path], options): path
+                for path in input_paths
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # 工作进程崩溃等情况，只影响当前文件
+                    result = BatchResult(path, outputs[path], error=str(e) or type(e).__name__)
+                finish(result)
+    
+    return [results[path] for path in input_paths]
+
+
+def format_summary(results: List[BatchResult]) -> str:
+    """
+    生成批量转换结果汇总表
+    
+    Args:
+        results: BatchResult列表
+    
+    Returns:
+        汇总表字符串
+    """
+    name_width = max([len(os.path.basename(r.input_path)) for r in results] + [4])
+    lines = [
+        f"{'文件':<{name_width}}  {'耗时(秒)':>9}  {'单元格数':>9}  {'输出大小':>10}  状态",
+        "-" * (name_width + 48),
+    ]
+    for result in results:
+        status = "成功" if result.ok else f"失败: {result.error}"
+        size = format_file_size(result.output_bytes) if result.ok else "-"
+        lines.append(
+            f"{os.path.basename(result.input_path):<{name_width}}  "
+            f"{result.seconds:>11.2f}  {result.cells:>13}  {size:>14}  {status}"
+        )
+    
+    succeeded = sum(1 for r in results if r.ok)
+    total_seconds = sum(r.seconds for r in results)
+    lines.append("-" * (name_width + 48))
+    lines.append(f"共 {len(results)} 个文件，成功 {succeeded} 个，失败 {len(results) - succeeded} 个，累计耗时 {total_seconds:.2f} 秒")
+    return "\n".join(lines)
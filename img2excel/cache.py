@@ -0,0 +1,277 @@
+"""
+转换缓存模块 - 以图片内容和转换参数为键的磁盘缓存
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+# 缓存目录的环境变量
+CACHE_DIR_ENV = "IMG2EXCEL_CACHE_DIR"
+
+# 默认缓存容量上限（字节）
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# 缓存键的格式版本，输出格式变化时递增以使旧缓存失效
+_KEY_VERSION = 2
+
+_ENTRY_SUFFIX = ".xlsx"
+_INFO_SUFFIX = ".json"
+_COUNTERS_FILE = "counters.json"
+
+
+def default_cache_dir() -> str:
+    """默认缓存目录（环境变量 IMG2EXCEL_CACHE_DIR 或 ~/.cache/img2excel）"""
+    return os.environ.get(CACHE_DIR_ENV) or os.path.join(
+        os.path.expanduser("~"), ".cache", "img2excel"
+    )
+
+
+class ConversionCache:
+    """
+    转换结果的内容寻址缓存
+    
+    缓存键由图片文件内容的SHA-256和规范化后的转换参数共同决定；
+    命中时将缓存的 .xlsx 复制（或硬链接）到输出路径，每个条目还可以带一个
+    小JSON信息文件（如输出尺寸）。缓存总大小超过上限时按最近使用时间淘汰（LRU）。命中/未命中次数保存在一个
+    小JSON文件中，每次查找后整体原子替换；多个进程同时使用同一缓存目录时
+    个别计数可能丢失，但文件不会损坏，大小也不会增长。
+    """
+    
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        link: bool = False
+    ):
+        """
+        初始化缓存
+        
+        Args:
+            cache_dir: 缓存目录，默认为 default_cache_dir()
+            max_bytes: 缓存容量上限（字节）
+            link: 命中时是否使用硬链接代替复制。硬链接更快，但之后原地
+                覆盖输出文件会同时修改缓存条目，仅适合只读使用的输出
+        """
+        self.cache_dir = os.path.expanduser(cache_dir or default_cache_dir())
+        self.max_bytes = max_bytes
+        self.link = link
+        os.makedirs(self.cache_dir, exist_ok=True)
+    
+    def make_key(self, image_path: str, options: dict) -> str:
+        """
+        计算缓存键
+        
+        Args:
+            image_path: 图片文件路径
+            options: 转换参数
+        
+        Returns:
+            十六进制SHA-256字符串
+        """
+        digest = hashlib.sha256()
+        with open(image_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        
+        normalized = json.dumps(
+            {"version": _KEY_VERSION, "options": options}, sort_keys=True, default=str
+        )
+        digest.update(normalized.encode("utf-8"))
+        return digest.hexdigest()
+    
+    def _entry_path(self, key: str) -> str:
+        """缓存条目的文件路径（按键的前两位分目录）"""
+        return os.path.join(self.cache_dir, key[:2], key + _ENTRY_SUFFIX)
+    
+    @staticmethod
+    def _info_path(entry: str) -> str:
+        """缓存条目信息文件的路径"""
+        return os.path.splitext(entry)[0] + _INFO_SUFFIX
+    
+    def fetch(self, key: str, output_path: str) -> Optional[dict]:
+        """
+        查找缓存，命中时将结果放到输出路径
+        
+        结果先链接或复制到输出目录中的临时文件，再原子替换输出文件；
+        未命中时已有的输出文件保持不变。
+        
+        Args:
+            key: 缓存键
+            output_path: 输出文件路径
+        
+        Returns:
+            命中时返回存入时的条目信息（存入时未提供信息则为空字典），未命中时为None
+        """
+        entry = self._entry_path(key)
+        
+        # 不预先检查条目是否存在：其他进程的 prune() 可能在检查之后删除条目，
+        # 直接读取，条目或信息文件不存在（或无法读取）时按未命中处理。
+        # 信息文件先于条目写入、晚于条目删除，因此条目存在时信息文件也存在
+        try:
+            with open(self._info_path(entry), encoding="utf-8") as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            self._record("misses")
+            return None
+        
+        # 临时文件按普通方式创建（权限与直接写输出文件相同），不用mkstemp
+        temp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            if self.link:
+                try:
+                    os.link(entry, temp_path)
+                except FileNotFoundError:
+                    raise
+                except OSError:
+                    # 跨文件系统等情况无法硬链接，退回复制
+                    shutil.copyfile(entry, temp_path)
+            else:
+                shutil.copyfile(entry, temp_path)
+            os.replace(temp_path, output_path)
+        except OSError:
+            if os.path.lexists(temp_path):
+                os.remove(temp_path)
+            self._record("misses")
+            return None
+        
+        # 更新修改时间，作为LRU淘汰的依据（条目此时被淘汰不影响已取得的输出）
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        
+        self._record("hits")
+        return info
+    
+    def store(self, key: str, source_path: str, info: Optional[dict] = None):
+        """
+        将转换结果存入缓存，并在超过容量上限时淘汰旧条目
+        
+        Args:
+            key: 缓存键
+            source_path: 转换生成的文件路径
+            info: 与条目一起保存的信息（可JSON序列化的字典），命中时由 fetch 返回
+        """
+        entry = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        
+        # 信息文件先于条目写入，条目存在时信息文件一定存在
+        self._write_atomic(self._info_path(entry), lambda f: json.dump(info or {}, f))
+        with open(source_path, "rb") as source:
+            self._write_atomic(entry, lambda f: shutil.copyfileobj(source, f), binary=True)
+        
+        self.prune()
+    
+    def _write_atomic(self, path: str, write: Callable, binary: bool = False):
+        """
+        写入临时文件再原子替换目标文件，其他进程不会读到写了一半的文件
+        
+        Args:
+            path: 目标文件路径
+            write: 接收已打开的临时文件对象并写入内容的函数
+            binary: 是否以二进制模式打开临时文件
+        """
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            if binary:
+                with os.fdopen(fd, "wb") as f:
+                    write(f)
+            else:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    write(f)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """列出所有缓存条目 (修改时间, 大小, 路径)"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(_ENTRY_SUFFIX):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+    
+    def prune(self, max_bytes: Optional[int] = None) -> Tuple[int, int]:
+        """
+        按最近使用时间淘汰条目，直到总大小不超过上限
+        
+        Args:
+            max_bytes: 容量上限，默认为初始化时的设置
+        
+        Returns:
+            (删除的条目数, 释放的字节数) 元组
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        
+        removed = freed = 0
+        for _, size, path in entries:
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            # 信息文件晚于条目删除，见 fetch
+            try:
+                os.remove(self._info_path(path))
+            except OSError:
+                pass
+            total -= size
+            removed += 1
+            freed += size
+        
+        return removed, freed
+    
+    def _read_counters(self) -> Dict[str, int]:
+        """读取命中和未命中次数，文件不存在或损坏时从0开始"""
+        try:
+            with open(os.path.join(self.cache_dir, _COUNTERS_FILE), encoding="utf-8") as f:
+                counters = json.load(f)
+            return {name: int(counters.get(name, 0)) for name in ("hits", "misses")}
+        except (OSError, ValueError, TypeError, AttributeError):
+            return {"hits": 0, "misses": 0}
+    
+    def _record(self, name: str):
+        """记录一次命中（"hits"）或未命中（"misses"）"""
+        counters = self._read_counters()
+        counters[name] += 1
+        self._write_atomic(
+            os.path.join(self.cache_dir, _COUNTERS_FILE), lambda f: json.dump(counters, f)
+        )
+    
+    def stats(self) -> dict:
+        """
+        获取缓存统计信息
+        
+        Returns:
+            包含条目数、总大小、容量上限、命中/未命中次数和命中率的字典
+        """
+        entries = self._entries()
+        counters = self._read_counters()
+        hits, misses = counters["hits"], counters["misses"]
+        lookups = hits + misses
+        return {
+            "cache_dir": self.cache_dir,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0
+        }
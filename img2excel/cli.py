@@ -3,15 +3,227 @@
 """
 
 import argparse
+import contextlib
+import json
 import sys
 import os
+import tracemalloc
 from pathlib import Path
-from .core import ImageToExcel
-from .utils import validate_image_path, get_image_dimensions, calculate_cell_count
+from typing import List, Optional
+from .batch import collect_images, convert_batch, format_summary
+from .cache import CACHE_DIR_ENV, DEFAULT_MAX_BYTES, ConversionCache
+from .core import ImageToExcel, ENGINES
+from .estimate import AUTO_COLORS, load_models, parse_budget, parse_colors
+from .instrumentation import Instrumentation, JsonLinesSink, ProfileCollector, profile_dump
+from .palette import QUANTIZE_METHODS
+from .parallel import default_jobs
+from .regions import MERGE_MODES
+from .pyramid import PYRAMID_LAYOUTS, parse_pyramid_sizes
+from .server import DEFAULT_MAX_UPLOAD, ConversionServer, ConversionService
+from .tiling import TILE_LAYOUTS, manifest_path, parse_tile_size
+from .utils import (
+    validate_image_path,
+    format_file_size, parse_file_size
+)
 
 
-def main():
+def add_conversion_arguments(parser: argparse.ArgumentParser):
+    """
+    添加转换参数（尺寸、单元格、渲染引擎和颜色量化），供各子命令共用
+    
+    Args:
+        parser: 参数解析器
+    """
+    # 尺寸控制参数
+    parser.add_argument(
+        "--max-width",
+        type=int,
+        help="最大宽度（单元格数量）"
+    )
+    
+    parser.add_argument(
+        "--max-height", 
+        type=int,
+        help="最大高度（单元格数量）"
+    )
+    
+    parser.add_argument(
+        "--no-ratio",
+        action="store_true",
+        help="不保持原图片比例"
+    )
+    
+    parser.add_argument(
+        "--budget",
+        type=parse_budget,
+        help="转换预算，在最大宽高内自动选择满足预算的最大尺寸：单元格数（200000cells）、"
+             "估计的文件大小（5MB）或耗时（30s），多项用逗号分隔"
+    )
+    
+    # 单元格尺寸参数
+    parser.add_argument(
+        "--cell-width",
+        type=int,
+        help="单元格宽度（像素）"
+    )
+    
+    parser.add_argument(
+        "--cell-height",
+        type=int,
+        help="单元格高度（像素）"
+    )
+    
+    # 其他参数
+    parser.add_argument(
+        "--sheet-name",
+        default="PixelArt",
+        help="Excel工作表名称（默认: PixelArt）"
+    )
+    
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="openpyxl",
+        help="渲染引擎（默认: openpyxl；stream为只写流式模式，xml为原生XML写入，速度最快）"
+    )
+    
+    # 颜色量化参数
+    parser.add_argument(
+        "--colors",
+        type=parse_colors,
+        help="将图片量化为最多N种颜色（1-256），限制样式数量和文件大小；"
+             "与 --budget 一起使用时可以为auto，先减少颜色再缩小尺寸"
+    )
+    
+    parser.add_argument(
+        "--quantize",
+        choices=QUANTIZE_METHODS,
+        help="量化方法（默认: median-cut；websafe使用固定216色调色板）"
+    )
+    
+    parser.add_argument(
+        "--dither",
+        action="store_true",
+        help="量化时使用Floyd-Steinberg抖动"
+    )
+    
+    parser.add_argument(
+        "--merge",
+        choices=MERGE_MODES,
+        help="合并相同颜色的单元格（rows: 水平行程，rects: 矩形），减少设置样式的单元格数量"
+    )
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser):
+    """
+    添加转换缓存参数
+    
+    Args:
+        parser: 参数解析器
+    """
+    parser.add_argument(
+        "--cache-dir",
+        help=f"转换缓存目录，指定后启用缓存（也可通过环境变量 {CACHE_DIR_ENV} 启用）"
+    )
+    
+    parser.add_argument(
+        "--cache-max-size",
+        type=parse_file_size,
+        default=DEFAULT_MAX_BYTES,
+        help=f"缓存容量上限，超出后按最近使用时间淘汰（默认: {format_file_size(DEFAULT_MAX_BYTES)}）"
+    )
+    
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="禁用转换缓存"
+    )
+
+
+def make_cache(args: argparse.Namespace) -> Optional[ConversionCache]:
+    """
+    根据命令行参数创建转换缓存
+    
+    Args:
+        args: 解析后的命令行参数
+    
+    Returns:
+        ConversionCache对象，未启用缓存或转换不能使用缓存（增量更新、原始像素文件）时为None
+    """
+    if args.no_cache:
+        return None
+    # 环境变量启用的缓存不应让不支持缓存的参数组合报错
+    if getattr(args, "incremental", False) or getattr(args, "raw_size", None):
+        return None
+    if not args.cache_dir and not os.environ.get(CACHE_DIR_ENV):
+        return None
+    return ConversionCache(args.cache_dir, max_bytes=args.cache_max_size)
+
+
+def make_converter(
+    args: argparse.Namespace,
+    instrumentation: Optional[Instrumentation] = None
+) -> ImageToExcel:
+    """
+    根据命令行参数创建转换器，指定 --raw-size 时按原始像素文件打开
+    
+    Args:
+        args: 解析后的命令行参数
+        instrumentation: 性能监测器
+    
+    Returns:
+        ImageToExcel实例
+    """
+    if args.raw_size:
+        width, height = parse_tile_size(args.raw_size)
+        return ImageToExcel.from_raw(
+            args.input_image, width, height, args.raw_channels, instrumentation=instrumentation
+        )
+    return ImageToExcel(args.input_image, instrumentation=instrumentation)
+
+
+def conversion_options(args: argparse.Namespace) -> dict:
+    """
+    将解析后的命令行参数转换为 convert_to_excel 的关键字参数
+    
+    Args:
+        args: 解析后的命令行参数
+    
+    Returns:
+        参数字典
+    """
+    return {
+        "cell_width": args.cell_width,
+        "cell_height": args.cell_height,
+        "max_width": args.max_width,
+        "max_height": args.max_height,
+        "keep_ratio": not args.no_ratio,
+        "sheet_name": args.sheet_name,
+        "engine": args.engine,
+        "colors": args.colors,
+        "quantize": args.quantize,
+        "dither": args.dither,
+        "merge": args.merge,
+        "budget": args.budget
+    }
+
+
+def main(argv: Optional[List[str]] = None):
     """命令行主函数"""
+    if argv is None:
+        argv = sys.argv[1:]
+    
+    # 子命令
+    if argv and argv[0] == "batch":
+        batch_main(argv[1:])
+        return
+    if argv and argv[0] == "cache":
+        cache_main(argv[1:])
+        return
+    if argv and argv[0] == "serve":
+        serve_main(argv[1:])
+        return
+    
     parser = argparse.ArgumentParser(
         description="将图片转换为Excel像素画",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -32,15 +244,54 @@ def main():
   # 不保持比例，强制指定尺寸
   img2excel input.jpg output.xlsx --max-width 100 --max-height 50 --no-ratio
   
-  # 预览转换后的尺寸
+  # 大图使用流式渲染，内存占用不随高度增长
+  img2excel input.jpg output.xlsx --max-width 500 --engine stream
+  
+  # 量化为64种颜色并抖动，限制样式数量和文件大小
+  img2excel input.jpg output.xlsx --max-width 200 --colors 64 --dither
+  
+  # 合并相同颜色的矩形区域，适合扁平风格或量化后的图片
+  img2excel input.png output.xlsx --colors 16 --merge rects
+  
+  # 超大图片按256x256分块，每块一个工作表，并行渲染
+  img2excel input.jpg output.xlsx --max-width 4000 --tile 256x256 --jobs 4
+  
+  # 同一张图片输出4个宽度，每个宽度一个工作表，共用样式表
+  img2excel input.png output.xlsx --pyramid 32,64,128,256
+  
+  # 直接转换NumPy数组或原始RGB像素文件（内存映射，不整体读入内存）
+  img2excel frame.npy output.xlsx --max-width 200 --engine xml
+  img2excel frame.raw output.xlsx --raw-size 1920x1080 --max-width 200
+  
+  # GIF动画的每一帧输出为一个工作表
+  img2excel anim.gif output.xlsx --max-width 120 --frames
+  
+  # 逐帧更新同一个工作簿，只重新生成有变化的部分
+  img2excel frame_001.png output.xlsx --max-width 200 --engine xml --incremental
+  img2excel frame_002.png output.xlsx --max-width 200 --engine xml --incremental
+  
+  # 在预算内自动选择尺寸（估计的文件大小不超过5MB），必要时先减少颜色
+  img2excel input.jpg output.xlsx --engine xml --budget 5MB --colors auto
+  
+  # 预览转换后的尺寸，估计文件大小、耗时和峰值内存
   img2excel input.jpg --preview --max-width 100
+  img2excel input.jpg --preview --budget 200000cells,10s
+  
+  # 批量转换目录中的所有图片（详见 img2excel batch --help）
+  img2excel batch images/ --out-dir output/ --max-width 100
+  
+  # 启用转换缓存，相同图片和参数直接复用结果（详见 img2excel cache --help）
+  img2excel input.jpg output.xlsx --max-width 100 --cache-dir ~/.cache/img2excel
+  
+  # 启动本地转换服务（详见 img2excel serve --help）
+  img2excel serve --port 8765 --workers 4
         """
     )
     
     # 必需参数
     parser.add_argument(
         "input_image",
-        help="输入图片文件路径"
+        help="输入图片文件路径（也支持 .npy 数组文件和原始像素文件）"
     )
     
     parser.add_argument(
@@ -49,49 +300,111 @@ def main():
         help="输出Excel文件路径（可选，用于预览模式）"
     )
     
-    # 尺寸控制参数
+    add_conversion_arguments(parser)
+    add_cache_arguments(parser)
+    
+    # 分块输出参数
     parser.add_argument(
-        "--max-width",
-        type=int,
-        help="最大宽度（单元格数量）"
+        "--tile",
+        help="将图片按 宽x高 分块输出（如 256x256），适合超大尺寸"
     )
     
     parser.add_argument(
-        "--max-height", 
+        "--tile-layout",
+        choices=TILE_LAYOUTS,
+        default="sheets",
+        help="分块输出方式（默认: sheets每块一个工作表；workbooks每块一个工作簿）"
+    )
+    
+    # 原始像素输入参数
+    parser.add_argument(
+        "--raw-size",
+        help="输入为原始像素文件（逐行排列的uint8像素，无文件头）时的尺寸 宽x高，如 1920x1080"
+    )
+    
+    parser.add_argument(
+        "--raw-channels",
         type=int,
-        help="最大高度（单元格数量）"
+        choices=[1, 3, 4],
+        default=3,
+        help="原始像素文件每个像素的通道数（默认: 3，即RGB）"
     )
     
+    # 多尺寸输出参数
     parser.add_argument(
-        "--no-ratio",
+        "--pyramid",
+        help="按多个宽度输出同一张图片（逗号分隔，如 32,64,128,256），图片只解码一次"
+    )
+    
+    parser.add_argument(
+        "--pyramid-layout",
+        choices=PYRAMID_LAYOUTS,
+        default="sheets",
+        help="多尺寸输出方式（默认: sheets每个尺寸一个工作表；workbooks每个尺寸一个工作簿）"
+    )
+    
+    # 多帧输出参数
+    parser.add_argument(
+        "--frames",
         action="store_true",
-        help="不保持原图片比例"
+        help="将多帧图片（GIF动画、APNG、多页TIFF）的每一帧输出为一个工作表，共用调色板和样式表"
     )
     
-    # 单元格尺寸参数
     parser.add_argument(
-        "--cell-width",
+        "--max-frames",
         type=int,
-        help="单元格宽度（像素）"
+        help="与 --frames 一起使用，最多转换的帧数（默认: 全部）"
     )
     
+    # 增量更新参数
     parser.add_argument(
-        "--cell-height",
-        type=int,
-        help="单元格高度（像素）"
+        "--incremental",
+        action="store_true",
+        help="增量更新输出文件：保存状态文件（.state.npz），再次转换到同一文件时只重新生成变化的部分（需要 --engine xml）"
     )
     
-    # 其他参数
     parser.add_argument(
-        "--sheet-name",
-        default="PixelArt",
-        help="Excel工作表名称（默认: PixelArt）"
+        "--jobs", "-j",
+        type=int,
+        default=None,
+        help=f"并行进程数，用于分块输出和xml引擎的分带渲染（默认: 分块输出使用CPU核心数 {default_jobs()}，分带渲染不并行）"
     )
     
     parser.add_argument(
         "--preview",
         action="store_true",
-        help="预览模式，只显示转换后的尺寸，不生成文件"
+        help="预览模式，显示转换后的尺寸和估计的颜色数、文件大小、耗时与峰值内存，不生成文件"
+    )
+    
+    parser.add_argument(
+        "--cost-model",
+        metavar="FILE",
+        help="与 --preview 一起使用，读取 benchmarks/calibrate_estimate.py 在本机拟合的开销模型"
+    )
+    
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="与 --preview 一起使用，以JSON格式输出估计结果"
+    )
+    
+    # 性能分析参数
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="转换结束后打印各阶段的耗时、CPU时间和峰值内存（开启内存跟踪，耗时会偏高）"
+    )
+    
+    parser.add_argument(
+        "--profile-dump",
+        metavar="PREFIX",
+        help="保存cProfile结果（PREFIX.prof）和内存分配快照（PREFIX.tracemalloc.txt）"
+    )
+    
+    parser.add_argument(
+        "--telemetry",
+        metavar="FILE",
+        help="将各阶段的监测数据以JSON Lines格式追加到文件"
     )
     
     parser.add_argument(
@@ -100,39 +413,66 @@ def main():
         help="详细输出模式"
     )
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    
+    if args.incremental and (args.pyramid or args.frames or args.tile):
+        parser.error("--incremental 只能用于单个工作表的转换，不能与 --pyramid、--frames、--tile 一起使用")
     
     # 验证输入文件
-    if not validate_image_path(args.input_image):
+    if not (os.path.isfile(args.input_image) if args.raw_size else validate_image_path(args.input_image)):
         print(f"错误: 无效的图片文件: {args.input_image}")
         sys.exit(1)
     
     # 预览模式
     if args.preview:
         try:
-            # 获取原图片尺寸
-            original_width, original_height = get_image_dimensions(args.input_image)
-            print(f"原图片尺寸: {original_width} x {original_height}")
-            
-            # 计算目标尺寸
+            models = load_models(args.cost_model) if args.cost_model else None
+            converter = make_converter(args)
+            original_width, original_height = converter.get_image_info()["size"]
             keep_ratio = not args.no_ratio
-            target_width, target_height = calculate_cell_count(
-                original_width, original_height,
-                max_cells=10000,  # 默认最大单元格数
-                keep_ratio=keep_ratio
-            )
+            options = {
+                "max_width": args.max_width,
+                "max_height": args.max_height,
+                "keep_ratio": keep_ratio,
+                "engine": args.engine,
+                "colors": args.colors,
+                "quantize": args.quantize,
+                "models": models
+            }
+            if args.budget:
+                plan = converter.plan(args.budget, **options)
+                estimate, palette = plan.estimate, plan.colors
+            else:
+                estimate, palette = converter.estimate(**options), args.colors
             
-            if args.max_width:
-                target_width = min(target_width, args.max_width)
-            if args.max_height:
-                target_height = min(target_height, args.max_height)
+            if args.json:
+                print(json.dumps(
+                    dict(
+                        estimate._asdict(),
+                        original_width=original_width,
+                        original_height=original_height,
+                        palette=palette
+                    ),
+                    ensure_ascii=False
+                ))
+                return
             
-            print(f"转换后尺寸: {target_width} x {target_height}")
-            print(f"总单元格数: {target_width * target_height}")
+            print(f"原图片尺寸: {original_width} x {original_height}")
+            if args.budget:
+                print(f"预算: {args.budget.describe()}")
+            print(f"转换后尺寸: {estimate.width} x {estimate.height}")
+            if palette is not None:
+                print(f"量化颜色数: {palette}")
+            print(f"总单元格数: {estimate.cells}")
+            print(f"估计颜色数: {estimate.colors}")
+            print(f"估计文件大小: {format_file_size(estimate.output_bytes)}")
+            print(f"估计耗时: {estimate.seconds:.2f}秒（{estimate.engine}引擎）")
+            print(f"估计峰值内存: {format_file_size(estimate.peak_memory_bytes)}")
             
             if args.verbose:
                 print(f"保持比例: {'是' if keep_ratio else '否'}")
-                
+                print(f"解码像素数: {estimate.source_pixels}")
+        
         except Exception as e:
             print(f"预览失败: {e}")
             sys.exit(1)
@@ -144,36 +484,98 @@ def main():
         print("错误: 请指定输出Excel文件路径")
         sys.exit(1)
     
+    if (args.pyramid or args.frames or args.tile) and (args.budget or args.colors == AUTO_COLORS):
+        print("错误: --budget 和 --colors auto 只能用于单个工作表的转换，不能与 --pyramid、--frames、--tile 一起使用")
+        sys.exit(1)
+    
     # 执行转换
     try:
         print(f"开始转换图片: {args.input_image}")
         
         # 创建转换器实例
-        converter = ImageToExcel(args.input_image)
+        collector = ProfileCollector()
+        instrumentation = Instrumentation()
+        if args.profile:
+            instrumentation.add_sink(collector)
+        if args.telemetry:
+            instrumentation.add_sink(JsonLinesSink(args.telemetry))
+        if args.profile or args.profile_dump:
+            tracemalloc.start()
+        converter = make_converter(args, instrumentation)
         
         # 获取图片信息
         if args.verbose:
             info = converter.get_image_info()
             print(f"图片信息: {info['width']} x {info['height']}, 格式: {info['format']}")
         
-        # 执行转换
-        output_path = converter.convert_to_excel(
-            output_path=args.output_excel,
-            cell_width=args.cell_width,
-            cell_height=args.cell_height,
-            max_width=args.max_width,
-            max_height=args.max_height,
-            keep_ratio=not args.no_ratio,
-            sheet_name=args.sheet_name
-        )
-        
-        print(f"转换完成！输出文件: {output_path}")
+        # 多帧图片默认只转换第一帧
+        frames = converter.get_image_info()["frames"]
+        if frames > 1 and not args.frames:
+            print(f"提示: 图片包含 {frames} 帧，只转换第一帧（使用 --frames 将每一帧输出为一个工作表）")
         
-        # 显示文件信息
-        if args.verbose and os.path.exists(output_path):
-            file_size = os.path.getsize(output_path)
-            print(f"文件大小: {file_size} 字节")
+        with profile_dump(args.profile_dump) if args.profile_dump else contextlib.nullcontext():
+            if args.pyramid:
+                # 多尺寸输出
+                options = conversion_options(args)
+                for key in ("engine", "max_width", "max_height", "keep_ratio", "budget"):
+                    options.pop(key)
+                result = converter.convert_pyramid(
+                    args.output_excel,
+                    parse_pyramid_sizes(args.pyramid),
+                    layout=args.pyramid_layout,
+                    **options
+                )
+                files = sorted({level["file"] for level in result["levels"]})
+                print(f"转换完成！输出文件: {', '.join(files)}")
+            elif args.frames:
+                # 多帧输出
+                options = conversion_options(args)
+                options.pop("engine")
+                options.pop("budget")
+                result = converter.convert_frames(
+                    args.output_excel,
+                    max_frames=args.max_frames,
+                    **options
+                )
+                print(f"转换完成！输出文件: {args.output_excel}（{len(result['frames'])} 个工作表）")
+            elif args.tile:
+                # 分块输出
+                options = conversion_options(args)
+                options.pop("engine")
+                options.pop("budget")
+                converter.convert_tiled(
+                    args.output_excel,
+                    parse_tile_size(args.tile),
+                    layout=args.tile_layout,
+                    jobs=args.jobs,
+                    **options
+                )
+                print(f"转换完成！分块清单: {manifest_path(args.output_excel)}")
+            else:
+                # 执行转换
+                output_path = converter.convert_to_excel(
+                    output_path=args.output_excel,
+                    cache=make_cache(args),
+                    incremental=args.incremental,
+                    jobs=args.jobs,
+                    **conversion_options(args)
+                )
+                
+                plan = converter.last_plan
+                if plan is not None:
+                    palette = f"，量化为 {plan.colors} 种颜色" if plan.colors is not None else ""
+                    print(f"按预算（{args.budget.describe()}）选择尺寸: {plan.width} x {plan.height}{palette}")
+                print(f"转换完成！输出文件: {output_path}")
+                
+                # 显示文件信息
+                if args.verbose and os.path.exists(output_path):
+                    file_size = os.path.getsize(output_path)
+                    print(f"文件大小: {file_size} 字节")
         
+        if args.profile:
+            print()
+            print(collector.format_table())
+    
     except Exception as e:
         print(f"转换失败: {e}")
         if args.verbose:
@@ -182,5 +584,220 @@ def main():
         sys.exit(1)
 
 
+
+def batch_main(argv: List[str]):
+    """批量转换子命令"""
+    parser = argparse.ArgumentParser(
+        prog="img2excel batch",
+        description="使用进程池并行批量转换图片",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+使用示例:
+  # 转换目录中的所有图片
+  img2excel batch images/ --out-dir output/ --max-width 100
+  
+  # 使用通配符选择文件，4个进程并行
+  img2excel batch "assets/**/*.png" --out-dir output/ --jobs 4 --engine xml
+        """
+    )
+    
+    parser.add_argument(
+        "source",
+        help="输入图片目录或通配符模式"
+    )
+    
+    parser.add_argument(
+        "--out-dir",
+        required=True,
+        help="输出目录"
+    )
+    
+    parser.add_argument(
+        "--jobs", "-j",
+        type=int,
+        default=default_jobs(),
+        help="并行进程数（默认: CPU核心数）"
+    )
+    
+    add_conversion_arguments(parser)
+    add_cache_arguments(parser)
+    
+    args = parser.parse_args(argv)
+    
+    input_paths = collect_images(args.source)
+    if not input_paths:
+        print(f"错误: 没有找到图片文件: {args.source}")
+        sys.exit(1)
+    
+    print(f"开始批量转换 {len(input_paths)} 个文件（{args.jobs} 个进程）...")
+    
+    def report(result):
+        status = "✓" if result.ok else "✗"
+        print(f"{status} {os.path.basename(result.input_path)} ({result.seconds:.2f} 秒)")
+    
+    results = convert_batch(
+        input_paths,
+        args.out_dir,
+        jobs=args.jobs,
+        callback=report,
+        cache=make_cache(args),
+        **conversion_options(args)
+    )
+    
+    print()
+    print(format_summary(results))
+    
+    if not all(result.ok for result in results):
+        sys.exit(1)
+
+
+
+def cache_main(argv: List[str]):
+    """转换缓存管理子命令"""
+    parser = argparse.ArgumentParser(
+        prog="img2excel cache",
+        description="查看或清理转换缓存",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+使用示例:
+  # 查看缓存命中率和占用空间
+  img2excel cache stats --cache-dir ~/.cache/img2excel
+  
+  # 将缓存清理到100MB以内
+  img2excel cache prune --max-size 100MB
+        """
+    )
+    
+    parser.add_argument(
+        "action",
+        choices=["stats", "prune"],
+        help="stats: 显示统计信息；prune: 按LRU淘汰到容量上限以内"
+    )
+    
+    parser.add_argument(
+        "--cache-dir",
+        help=f"缓存目录（默认: 环境变量 {CACHE_DIR_ENV} 或 ~/.cache/img2excel）"
+    )
+    
+    parser.add_argument(
+        "--max-size",
+        type=parse_file_size,
+        default=DEFAULT_MAX_BYTES,
+        help=f"容量上限（默认: {format_file_size(DEFAULT_MAX_BYTES)}）"
+    )
+    
+    args = parser.parse_args(argv)
+    cache = ConversionCache(args.cache_dir, max_bytes=args.max_size)
+    
+    if args.action == "prune":
+        removed, freed = cache.prune()
+        print(f"已删除 {removed} 个缓存条目，释放 {format_file_size(freed)}")
+    
+    stats = cache.stats()
+    print(f"缓存目录: {stats['cache_dir']}")
+    print(f"缓存条目: {stats['entries']}")
+    print(f"占用空间: {format_file_size(stats['bytes'])} / {format_file_size(stats['max_bytes'])}")
+    print(f"命中次数: {stats['hits']}")
+    print(f"未命中次数: {stats['misses']}")
+    print(f"命中率: {stats['hit_rate']:.1%}")
+
+
+
+def serve_main(argv: List[str]):
+    """本地转换服务子命令"""
+    parser = argparse.ArgumentParser(
+        prog="img2excel serve",
+        description="启动本地HTTP转换服务，使用预热的进程池处理转换请求",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+使用示例:
+  # 启动服务
+  img2excel serve --port 8765 --workers 4
+  
+  # 上传图片，返回xlsx文件
+  curl --data-binary @input.jpg "http://127.0.0.1:8765/convert?max_width=100" -o output.xlsx
+  
+  # 允许转换 /data 目录内的文件并写入该目录（path 和 output 相对于 --root）
+  img2excel serve --root /data
+  curl -X POST "http://127.0.0.1:8765/convert?path=input.jpg&output=output.xlsx&engine=xml"
+  
+  # 查看请求数、队列深度和延迟直方图
+  curl http://127.0.0.1:8765/metrics
+        """
+    )
+    
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="监听地址（默认: 127.0.0.1，仅本机可访问）"
+    )
+    
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8765,
+        help="监听端口（默认: 8765）"
+    )
+    
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=default_jobs(),
+        help=f"工作进程数（默认: {default_jobs()}）"
+    )
+    
+    parser.add_argument(
+        "--max-queue",
+        type=int,
+        default=16,
+        help="所有工作进程都忙时最多排队的请求数，超出时返回503（默认: 16）"
+    )
+    
+    parser.add_argument(
+        "--max-upload",
+        type=parse_file_size,
+        default=DEFAULT_MAX_UPLOAD,
+        help=f"上传大小上限（默认: {format_file_size(DEFAULT_MAX_UPLOAD)}）"
+    )
+    
+    parser.add_argument(
+        "--root",
+        help="请求的 path 和 output 参数可以访问的目录，超出该目录的路径被拒绝；未指定时只接受上传图片"
+    )
+    
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="不输出访问日志"
+    )
+    
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers 必须大于0")
+    if args.max_queue < 0:
+        parser.error("--max-queue 不能为负数")
+    if args.root is not None and not os.path.isdir(args.root):
+        parser.error(f"--root 目录不存在: {args.root}")
+    
+    print(f"正在启动 {args.workers} 个工作进程...")
+    service = ConversionService(workers=args.workers, max_queue=args.max_queue)
+    server = ConversionServer(
+        (args.host, args.port),
+        service,
+        max_upload=args.max_upload,
+        quiet=args.quiet,
+        root=args.root
+    )
+    host, port = server.server_address[:2]
+    print(f"转换服务已启动: http://{host}:{port}（按 Ctrl+C 停止）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n正在停止...")
+    finally:
+        server.server_close()
+        service.close()
+
+
 if __name__ == "__main__":
     main()
@@ -2,13 +2,54 @@
 核心功能模块 - ImageToExcel类
 """
 
+import io
+import math
 import os
-from typing import Tuple, Optional, Union
+import uuid
+from contextlib import closing
+from typing import BinaryIO, Dict, List, Sequence, Tuple, Optional, Union
 from PIL import Image
+import numpy as np
 import openpyxl
-from openpyxl.styles import PatternFill
-from openpyxl.utils import get_column_letter
-from .utils import resize_image, rgb_to_hex
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.worksheet.dimensions import ColumnDimension
+from openpyxl.worksheet.cell_range import CellRange, MultiCellRange
+from .arrays import ARRAY_EXTENSIONS, array_to_image, load_npy, map_raw, pixel_mode
+from .bands import band_sheet_xml_chunks, can_render_bands
+from .cache import ConversionCache
+from .estimate import (
+    AUTO_COLORS, DEFAULT_MODELS, MAX_SAMPLED_CELLS, PLAN_PALETTE_SIZES,
+    Budget, CostModel, Estimate, Plan, color_limit, estimate_change_rate, estimate_colors, predict
+)
+from .frames import FramePalette, decode_frames, frame_count, prefetch, write_frames
+from .incremental import load_state, patch_workbook, write_workbook
+from .instrumentation import Instrumentation
+from .memo import ImageMemo
+from .pyramid import write_pyramid
+from .progress import CancelToken, ConversionCancelled, ProgressCallback, ProgressReporter
+from .palette import ColorIndex, LazyColorIndex, MAX_EXCEL_STYLES, build_color_index, quantize_image
+from .regions import MERGE_MODES, Region, anchor_mask, count_regions, find_regions
+from .styles import FillRegistry
+from .tiling import write_tiles
+from .utils import plan_target_size, resize_image
+from .xlsx_writer import RawXlsxWriter
+
+
+# 支持的渲染引擎
+ENGINES = ("openpyxl", "stream", "xml")
+
+# Excel单个工作表的行列上限
+MAX_EXCEL_COLUMNS = 16384
+MAX_EXCEL_ROWS = 1048576
+
+# 降分辨率解码时至少保留目标尺寸的倍数，剩余部分由LANCZOS完成
+_REDUCING_GAP = 3
+
+# 缩放与转换为RGB可以交换顺序的模式，这些模式推迟到缩放后再转换
+_DEFERRED_MODES = ("RGB", "L")
+
+# 缩放使用的重采样滤镜
+_RESAMPLE = Image.Resampling.LANCZOS
 
 
 class ImageToExcel:
@@ -18,88 +59,966 @@ class ImageToExcel:
     支持自定义单元格尺寸、保持原比例、批量处理等功能
     """
     
-    def __init__(self, image_path: str):
+    def __init__(self, image_path: str, instrumentation: Optional[Instrumentation] = None):
         """
         初始化ImageToExcel实例
         
+        只检查文件是否存在，不读取图片内容；图片在第一次转换时
+        按目标尺寸解码，因此创建大量实例的开销很小。.npy 文件以内存映射方式打开。
+        
         Args:
-            image_path: 图片文件路径
+            image_path: 图片文件或 .npy 数组文件路径
+            instrumentation: 性能监测器，记录各转换阶段的耗时、内存和数据规模
         """
-        self.image_path = image_path
-        self.image = None
-        self.workbook = None
-        self.worksheet = None
+        self._init_state(image_path, instrumentation)
+        self._has_file = True
         
         # 验证图片文件
         if not os.path.exists(image_path):
             raise FileNotFoundError(f"图片文件不存在: {image_path}")
         
-        # 加载图片
-        self._load_image()
+        if os.path.splitext(image_path)[1].lower() in ARRAY_EXTENSIONS:
+            self._use_array(load_npy(image_path), "NPY")
+    
+    def _init_state(self, image_path: str, instrumentation: Optional[Instrumentation]):
+        """初始化实例状态，供构造函数和 from_* 工厂方法共用"""
+        self.image_path = image_path
+        self.instrumentation = instrumentation or Instrumentation()
+        self.workbook = None
+        self.worksheet = None
+        self.stats = {}
+        # 上一次按预算转换时选择的尺寸和调色板（Plan），未指定预算时为None
+        self.last_plan = None
+        self._image = None
+        self._header = None
+        # 解码的中间图片、缩放后的图片和索引图，同一实例多次转换时复用
+        self.memo = ImageMemo()
+        # 图片来自文件时为True；from_* 创建的实例图片在内存中，image_path只是名称
+        self._has_file = False
+        # 内存中的编码图片（from_bytes），None表示从 image_path 读取
+        self._data = None
+        # 像素数组（from_array、from_raw 或 .npy 文件，可以是内存映射数组）
+        self._array = None
+    
+    def _use_array(self, array: np.ndarray, image_format: Optional[str] = None):
+        """使用像素数组作为图片来源，像素在转换时才读取"""
+        mode = pixel_mode(array)
+        self._array = array
+        self._header = {
+            "size": (array.shape[1], array.shape[0]),
+            "mode": mode,
+            "format": image_format
+        }
+    
+    @classmethod
+    def from_bytes(
+        cls,
+        data: bytes,
+        name: str = "<bytes>",
+        instrumentation: Optional[Instrumentation] = None
+    ) -> "ImageToExcel":
+        """
+        从内存中的编码图片（PNG、JPEG等文件内容）创建实例
+        
+        与从文件创建一样按目标尺寸降分辨率解码，不写临时文件。
+        
+        Args:
+            data: 图片文件内容
+            name: 图片名称，用于日志和性能监测记录
+            instrumentation: 性能监测器
+        
+        Returns:
+            ImageToExcel实例
+        """
+        if not data:
+            raise ValueError("图片数据为空")
+        converter = cls.__new__(cls)
+        converter._init_state(name, instrumentation)
+        converter._data = data
+        return converter
+    
+    @classmethod
+    def from_pil(
+        cls,
+        image: Image.Image,
+        name: str = "<PIL.Image>",
+        instrumentation: Optional[Instrumentation] = None
+    ) -> "ImageToExcel":
+        """
+        从已解码的PIL图片创建实例
+        
+        RGB图片直接使用，不复制像素；其他模式转换为RGB。
+        
+        Args:
+            image: PIL图片对象
+            name: 图片名称，用于日志和性能监测记录
+            instrumentation: 性能监测器
+        
+        Returns:
+            ImageToExcel实例
+        """
+        converter = cls.__new__(cls)
+        converter._init_state(name, instrumentation)
+        converter._header = {
+            "size": image.size,
+            "mode": image.mode,
+            "format": image.format
+        }
+        converter._image = image if image.mode == "RGB" else image.convert("RGB")
+        return converter
+    
+    @classmethod
+    def from_array(
+        cls,
+        array: np.ndarray,
+        name: str = "<ndarray>",
+        instrumentation: Optional[Instrumentation] = None
+    ) -> "ImageToExcel":
+        """
+        从NumPy数组创建实例
+        
+        不复制数组：缩小时按条带读取并求平均，内存映射数组
+        （np.load(mmap_mode="r")、np.memmap）不会被整体读入内存。
+        
+        Args:
+            array: uint8数组，形状为 (高度, 宽度)（灰度）、(高度, 宽度, 3)（RGB）
+                或 (高度, 宽度, 4)（RGBA）
+            name: 图片名称，用于日志和性能监测记录
+            instrumentation: 性能监测器
+        
+        Returns:
+            ImageToExcel实例
+        """
+        converter = cls.__new__(cls)
+        converter._init_state(name, instrumentation)
+        converter._use_array(np.asarray(array))
+        return converter
+    
+    @classmethod
+    def from_raw(
+        cls,
+        path: str,
+        width: int,
+        height: int,
+        channels: int = 3,
+        instrumentation: Optional[Instrumentation] = None
+    ) -> "ImageToExcel":
+        """
+        从原始像素文件（逐行排列的uint8像素，无文件头）创建实例
+        
+        文件以内存映射方式打开，与 from_array 一样不整体读入内存。
+        文件本身不包含尺寸，因此不能与转换缓存一起使用。
+        
+        Args:
+            path: 原始像素文件路径
+            width: 图片宽度
+            height: 图片高度
+            channels: 每个像素的通道数，1（灰度）、3（RGB）或 4（RGBA）
+            instrumentation: 性能监测器
+        
+        Returns:
+            ImageToExcel实例
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"图片文件不存在: {path}")
+        converter = cls.__new__(cls)
+        converter._init_state(path, instrumentation)
+        converter._use_array(map_raw(path, width, height, channels), "RAW")
+        return converter
     
-    def _load_image(self):
-        """加载图片文件"""
+    def _stage(self, name: str, **fields):
+        """记录一个转换阶段，见 Instrumentation.stage"""
+        return self.instrumentation.stage(name, source=self.image_path, **fields)
+    
+    @property
+    def image(self) -> Image.Image:
+        """完整分辨率的RGB图片，第一次访问时加载"""
+        if self._image is None:
+            self._image = self._load_image()
+        return self._image
+    
+    def _open_image(self) -> Image.Image:
+        """打开图片文件（只读取文件头，像素在首次使用时才解码）"""
+        try:
+            if self._data is not None:
+                return Image.open(io.BytesIO(self._data))
+            return Image.open(self.image_path)
+        except Exception as e:
+            raise ValueError(f"无法加载图片文件: {e}")
+    
+    def _read_header(self) -> dict:
+        """读取并缓存图片尺寸、模式和格式，不解码像素"""
+        if self._header is None:
+            with self._open_image() as image:
+                self._header = {
+                    "size": image.size,
+                    "mode": image.mode,
+                    "format": image.format,
+                    "frames": frame_count(image)
+                }
+        return self._header
+    
+    def _load_image(self, target_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+        """
+        加载图片文件
+        
+        指定目标尺寸时以降低的分辨率解码：JPEG使用draft模式在解码时
+        按1/2、1/4、1/8缩小，其他格式使用 Image.reduce 按整数倍缩小，
+        像素数组按条带分块求平均（见 arrays.array_to_image）。
+        缩小后的尺寸至少保留目标尺寸的 _REDUCING_GAP 倍，
+        由 resize_image 完成最终的LANCZOS缩放，画质与直接缩放基本一致。
+        
+        RGB和灰度图片缩小后仍保持原模式，转换为RGB推迟到缩放之后；
+        调色板、透明通道等模式需要先转换才能正确求平均。
+        
+        Args:
+            target_size: 目标尺寸 (宽度, 高度)，None表示完整分辨率
+        
+        Returns:
+            RGB或灰度（L）模式的图片对象；未指定目标尺寸时总是RGB
+        """
+        if self._array is not None:
+            image = array_to_image(self._array, target_size, _REDUCING_GAP)
+            if target_size is None and image.mode != 'RGB':
+                image = image.convert('RGB')
+            return image
+        
+        image = self._open_image()
         try:
-            self.image = Image.open(self.image_path)
+            if target_size is not None:
+                min_width = max(target_size[0], 1) * _REDUCING_GAP
+                min_height = max(target_size[1], 1) * _REDUCING_GAP
+                if image.format == "JPEG":
+                    image.draft("RGB", (min_width, min_height))
+                
+                if image.mode not in _DEFERRED_MODES:
+                    image = image.convert('RGB')
+                
+                factor = min(image.width // min_width, image.height // min_height)
+                if factor >= 2:
+                    image = image.reduce(factor)
+            
             # 转换为RGB模式（处理RGBA等格式）
-            if self.image.mode != 'RGB':
-                self.image = self.image.convert('RGB')
+            if target_size is None and image.mode != 'RGB':
+                image = image.convert('RGB')
+            image.load()
         except Exception as e:
             raise ValueError(f"无法加载图片文件: {e}")
+        return image
     
     def convert_to_excel(
         self,
-        output_path: str,
+        output_path: Union[str, BinaryIO],
         cell_width: Optional[int] = None,
         cell_height: Optional[int] = None,
         max_width: Optional[int] = None,
         max_height: Optional[int] = None,
         keep_ratio: bool = True,
-        sheet_name: str = "PixelArt"
-    ) -> str:
+        sheet_name: str = "PixelArt",
+        engine: str = "openpyxl",
+        colors: Optional[Union[int, str]] = None,
+        quantize: Optional[str] = None,
+        dither: bool = False,
+        merge: Optional[str] = None,
+        cache: Optional[ConversionCache] = None,
+        incremental: bool = False,
+        budget: Optional[Budget] = None,
+        progress: Optional[ProgressCallback] = None,
+        cancel: Optional[CancelToken] = None,
+        jobs: Optional[int] = None
+    ) -> Union[str, BinaryIO]:
         """
         将图片转换为Excel文件
         
         Args:
-            output_path: 输出Excel文件路径
+            output_path: 输出Excel文件路径，或可写的二进制文件对象（不写磁盘，
+                见 convert_to_bytes 和 convert_to_stream）
             cell_width: 单元格宽度（像素）
             cell_height: 单元格高度（像素）
             max_width: 最大宽度（单元格数量）
             max_height: 最大高度（单元格数量）
             keep_ratio: 是否保持原比例
             sheet_name: 工作表名称
+            engine: 渲染引擎，"openpyxl"（默认，内存中构建完整工作簿）、
+                "stream"（只写模式逐行输出，内存占用与图片高度无关）
+                或 "xml"（绕过openpyxl直接写出XLSX，速度最快）
+            colors: 量化后的最大颜色数量（1-256），None表示不量化；
+                "auto"表示按预算自动选择（需要指定budget）
+            quantize: 量化方法，"median-cut"、"kmeans" 或 "websafe"；
+                指定colors但未指定方法时使用 "median-cut"
+            dither: 量化时是否使用抖动
+            merge: 合并相同颜色的单元格，"rows"（水平行程）或 "rects"（矩形），
+                每个区域只为左上角单元格设置样式并记录合并区域；None表示不合并
+            cache: 转换缓存，相同图片内容和参数的转换直接复用缓存结果；
+                只支持从文件读取、输出到文件路径的转换
+            incremental: 增量更新，仅对 "xml" 引擎且不合并单元格时有效：在输出文件旁
+                保存状态文件（.state.npz），再次转换到同一文件时只重新生成有变化的条带；
+                状态文件不存在或尺寸、工作表名称、单元格尺寸不同时完整渲染
+            budget: 转换预算（单元格数、估计的文件大小或耗时），在 max_width、max_height
+                给出的上限内选择满足预算的最大尺寸（见 plan），不做试转换；
+                选择结果保存在 last_plan 中
+            progress: 进度回调，渲染过程中按限流频率接收Progress（已渲染行数、已写出字节数）
+            cancel: 取消令牌，取消后抛出ConversionCancelled并删除未完成的输出文件
+                （异常的 output_removed 表示是否删除了文件）
+            jobs: 并行进程数，仅对 "xml" 引擎有效：大于1时将工作表按水平条带
+                在多个进程中序列化，输出与串行完全相同；默认串行
+        
+        Returns:
+            output_path 为路径时返回该路径；为文件对象时返回同一个文件对象
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"不支持的渲染引擎: {engine}（可选: {', '.join(ENGINES)}）")
+        if merge is not None and merge not in MERGE_MODES:
+            raise ValueError(f"不支持的合并模式: {merge}（可选: {', '.join(MERGE_MODES)}）")
+        if incremental and (engine != "xml" or merge or cache is not None or not isinstance(output_path, str)):
+            raise ValueError("增量更新只支持 xml 引擎、不合并单元格、不使用转换缓存且输出到文件路径的转换")
+        
+        if budget is None and colors == AUTO_COLORS:
+            raise ValueError('colors="auto" 需要同时指定 budget')
+        
+        # 先查找缓存：缓存键包含预算本身，命中时不需要为按预算选择尺寸解码图片
+        if cache is not None:
+            if not self._has_file or not isinstance(output_path, str):
+                raise ValueError("转换缓存只支持从图片文件转换到文件路径")
+            options = {
+                "cell_width": cell_width,
+                "cell_height": cell_height,
+                "max_width": max_width,
+                "max_height": max_height,
+                "keep_ratio": keep_ratio,
+                "sheet_name": sheet_name,
+                "engine": engine,
+                "colors": colors,
+                "quantize": quantize,
+                "dither": dither,
+                "merge": merge,
+                "budget": budget
+            }
+            return self._convert_cached(cache, output_path, options, progress, cancel, jobs)
+        
+        plan = None
+        if budget is not None:
+            plan = self.plan(budget, max_width, max_height, keep_ratio, engine, colors, quantize)
+            max_width, max_height, keep_ratio, colors = plan.width, plan.height, False, plan.colors
+        self.last_plan = plan
+        
+        reporter = ProgressReporter(progress, cancel)
+        reporter.check()
+        output_start = self._output_position(output_path)
+        
+        color_index = self._prepare_color_index(
+            max_width, max_height, keep_ratio, colors, quantize, dither
+        )
+        width, height = color_index.size
+        
+        if width > MAX_EXCEL_COLUMNS or height > MAX_EXCEL_ROWS:
+            raise ValueError(
+                f"转换后尺寸 {width}x{height} 超过Excel工作表上限 "
+                f"({MAX_EXCEL_COLUMNS}列 x {MAX_EXCEL_ROWS}行)，请减小尺寸或使用 convert_tiled 分块输出"
+            )
+        
+        # 查找相同颜色的区域
+        regions = None
+        if merge:
+            with self._stage("regions", pixels=width * height):
+                regions = find_regions(color_index.index_map, merge)
+        
+        reporter.rows_total = height
+        reporter.check()
+        
+        try:
+            if engine == "xml":
+                # 原生XML写入器直接生成文件，不经过openpyxl工作簿，渲染和保存是同一个阶段
+                self.workbook = None
+                self.worksheet = None
+                with self._stage("render", pixels=width * height, colors=color_index.color_count) as fields:
+                    if incremental:
+                        self._render_incremental(
+                            color_index, output_path, sheet_name, cell_width, cell_height, reporter
+                        )
+                    else:
+                        self._render_image_raw(
+                            color_index, output_path, sheet_name, cell_width, cell_height,
+                            regions, reporter, jobs
+                        )
+                    fields["output_bytes"] = self._output_size(output_path, output_start)
+                reporter.update(height, fields["output_bytes"], stage="save", force=True)
+                return output_path
             
+            if engine == "stream":
+                # 只写工作簿：行在写入时即被序列化，不在内存中保留单元格
+                self.workbook = openpyxl.Workbook(write_only=True)
+                self.worksheet = self.workbook.create_sheet(sheet_name)
+                
+                with self._stage("dimensions", pixels=width * height):
+                    self._set_cell_dimensions(width, height, cell_width, cell_height)
+                with self._stage("render", pixels=width * height, colors=color_index.color_count):
+                    self._render_image_streaming(color_index, regions, reporter)
+            else:
+                # 创建Excel工作簿
+                self.workbook = openpyxl.Workbook()
+                self.worksheet = self.workbook.active
+                self.worksheet.title = sheet_name
+                
+                # 设置单元格尺寸
+                with self._stage("dimensions", pixels=width * height):
+                    self._set_cell_dimensions(width, height, cell_width, cell_height)
+                
+                # 渲染图片到Excel
+                with self._stage("render", pixels=width * height, colors=color_index.color_count):
+                    self._render_image_to_excel(color_index, regions, reporter)
+            
+            # 保存文件（保存过程本身无法中断，开始前最后检查一次）
+            reporter.check()
+            with self._stage("save") as fields:
+                self.workbook.save(output_path)
+                fields["output_bytes"] = self._output_size(output_path, output_start)
+            reporter.update(height, fields["output_bytes"], stage="save", force=True)
+        except ConversionCancelled as error:
+            # 增量更新写入临时文件后才替换原工作簿，取消时原来的输出和状态文件保持不变；
+            # 完整渲染时写出器已删除不完整的文件
+            if not incremental:
+                error.output_removed = self._discard_partial_output(engine, output_path)
+            raise
+        
+        return output_path
+    
+    def convert_to_bytes(self, **options) -> bytes:
+        """
+        将图片转换为内存中的Excel文件内容，不写磁盘
+        
+        Args:
+            **options: convert_to_excel 的参数（cache除外）
+        
+        Returns:
+            XLSX文件内容
+        """
+        buffer = io.BytesIO()
+        self.convert_to_excel(buffer, **options)
+        return buffer.getvalue()
+    
+    def convert_to_stream(self, stream: BinaryIO, **options) -> BinaryIO:
+        """
+        将图片转换为Excel文件并写入文件对象，不写临时文件
+        
+        文件对象不需要支持seek（如HTTP响应流、管道）。转换被取消时
+        已写入的部分无法撤回，由调用方丢弃。
+        
+        Args:
+            stream: 可写的二进制文件对象
+            **options: convert_to_excel 的参数（cache除外）
+        
+        Returns:
+            传入的文件对象
+        """
+        return self.convert_to_excel(stream, **options)
+    
+    @staticmethod
+    def _output_position(output: Union[str, BinaryIO]) -> Optional[int]:
+        """文件对象的当前写入位置；文件路径或不支持tell的流返回None"""
+        if isinstance(output, str):
+            return None
+        try:
+            return output.tell()
+        except (AttributeError, OSError):
+            return None
+    
+    @staticmethod
+    def _output_size(output: Union[str, BinaryIO], start: Optional[int] = None) -> Optional[int]:
+        """
+        输出的字节数
+        
+        Args:
+            output: 输出文件路径或文件对象
+            start: 写入前文件对象的位置（_output_position）
+        
+        Returns:
+            字节数，无法确定时（不支持tell的流）为None
+        """
+        if isinstance(output, str):
+            return os.path.getsize(output)
+        position = ImageToExcel._output_position(output)
+        if position is None or start is None:
+            return None
+        return position - start
+    
+    def _discard_partial_output(self, engine: str, output_path: Union[str, BinaryIO]) -> bool:
+        """
+        丢弃被取消的转换留下的中间结果
+        
+        原生XML引擎直接写入输出路径，删除该文件（写入器出错时已经删除；
+        输出到文件对象时已写入的部分由调用方丢弃）；只写工作簿的行已写入
+        临时文件，关闭并删除临时文件；openpyxl引擎在保存前取消，没有写出内容。
+        
+        Args:
+            engine: 渲染引擎
+            output_path: 输出Excel文件路径或文件对象
+        
+        Returns:
+            是否删除了写出一部分的输出文件
+        """
+        removed = engine == "xml" and isinstance(output_path, str)
+        if removed and os.path.exists(output_path):
+            os.remove(output_path)
+        
+        if engine == "stream" and getattr(self.worksheet, "_writer", None) is not None:
+            self.worksheet.close()
+            self.worksheet._writer.cleanup()
+        
+        self.workbook = None
+        self.worksheet = None
+        return removed
+    
+    def _convert_cached(
+        self,
+        cache: ConversionCache,
+        output_path: str,
+        options: dict,
+        progress: Optional[ProgressCallback] = None,
+        cancel: Optional[CancelToken] = None,
+        jobs: Optional[int] = None
+    ) -> str:
+        """
+        通过缓存执行转换：命中时直接复制缓存结果，否则转换后存入缓存
+        
+        Args:
+            cache: 转换缓存
+            output_path: 输出Excel文件路径
+            options: convert_to_excel 中影响输出内容的参数
+            progress: 进度回调
+            cancel: 取消令牌
+            jobs: 并行进程数
+        
         Returns:
             输出文件路径
         """
+        with self._stage("cache") as fields:
+            key = cache.make_key(self.image_path, options)
+            info = cache.fetch(key, output_path)
+            if info is not None:
+                fields["output_bytes"] = os.path.getsize(output_path)
+        
+        if info is not None:
+            plan = info.get("plan")
+            self.last_plan = plan and Plan(
+                plan["width"], plan["height"], plan["colors"], Estimate(**plan["estimate"])
+            )
+            self.stats = {
+                "width": info["width"],
+                "height": info["height"],
+                "cells": info["width"] * info["height"],
+                "cache_hit": True
+            }
+            print(f"命中转换缓存: {output_path}")
+            return output_path
+        
+        # 转换到同目录的临时文件，存入缓存后再替换输出文件：转换失败或取消时原来的输出
+        # 保持不变，输出文件是指向缓存条目的硬链接时也不会改写缓存内容
+        temp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            self.convert_to_excel(temp_path, progress=progress, cancel=cancel, jobs=jobs, **options)
+            self.stats["cache_hit"] = False
+            
+            plan = self.last_plan
+            info = {
+                "width": self.stats["width"],
+                "height": self.stats["height"],
+                "plan": plan and dict(plan._asdict(), estimate=plan.estimate._asdict())
+            }
+            with self._stage("cache_store", output_bytes=os.path.getsize(temp_path)):
+                cache.store(key, temp_path, info)
+            os.replace(temp_path, output_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return output_path
+    
+    def convert_tiled(
+        self,
+        output_path: str,
+        tile_size: Tuple[int, int],
+        layout: str = "sheets",
+        jobs: Optional[int] = None,
+        cell_width: Optional[int] = None,
+        cell_height: Optional[int] = None,
+        max_width: Optional[int] = None,
+        max_height: Optional[int] = None,
+        keep_ratio: bool = True,
+        sheet_name: str = "PixelArt",
+        colors: Optional[int] = None,
+        quantize: Optional[str] = None,
+        dither: bool = False,
+        merge: Optional[str] = None
+    ) -> dict:
+        """
+        将图片分块转换为多个工作表或多个工作簿
+        
+        分块在进程池中并行渲染（使用原生XML写入器），所有分块共享
+        同一个调色板；分块坐标记录在与输出文件同名的 .manifest.json 中。
+        不建立整张图片的索引图：调色板逐条带扫描得到，每个分块的索引图
+        在渲染该分块时才建立，索引占用的内存只与在途的分块数量有关。
+        
+        Args:
+            output_path: 输出Excel文件路径；"workbooks"方式下作为分块文件名的前缀
+            tile_size: 分块尺寸 (宽度, 高度)，单位为单元格
+            layout: "sheets"（每块一个工作表）或 "workbooks"（每块一个工作簿）
+            jobs: 并行进程数，默认为CPU核心数
+            其余参数与 convert_to_excel 相同
+        
+        Returns:
+            清单字典，包含每个分块的位置和所在的工作表/文件
+        """
+        if merge is not None and merge not in MERGE_MODES:
+            raise ValueError(f"不支持的合并模式: {merge}（可选: {', '.join(MERGE_MODES)}）")
+        if tile_size[0] > MAX_EXCEL_COLUMNS or tile_size[1] > MAX_EXCEL_ROWS:
+            raise ValueError(
+                f"分块尺寸 {tile_size[0]}x{tile_size[1]} 超过Excel工作表上限 "
+                f"({MAX_EXCEL_COLUMNS}列 x {MAX_EXCEL_ROWS}行)"
+            )
+        
+        target_size = self._calculate_target_size(max_width, max_height, keep_ratio)
+        resized_image = self._prepare_image(target_size, colors, quantize, dither)
+        
+        # 只扫描出调色板，各分块的索引图在渲染该分块时才建立
+        with self._stage("index", pixels=target_size[0] * target_size[1]) as fields:
+            color_index = LazyColorIndex(resized_image)
+            fields["colors"] = color_index.color_count
+        self._warn_style_limit(color_index.color_count)
+        width, height = color_index.size
+        
+        print(f"正在分块渲染图片到Excel... ({width}x{height}，分块 {tile_size[0]}x{tile_size[1]})")
+        
+        self.workbook = None
+        self.worksheet = None
+        with self._stage("render", pixels=width * height, colors=color_index.color_count):
+            manifest = write_tiles(
+                color_index,
+                output_path,
+                tile_size,
+                self._column_width(cell_width),
+                self._row_height(cell_height),
+                layout=layout,
+                sheet_name=sheet_name,
+                merge=merge,
+                jobs=jobs
+            )
+        
+        self._record_render_stats(width, height, color_index.color_count, manifest["regions"])
+        print(f"共生成 {len(manifest['tiles'])} 个分块")
+        
+        return manifest
+    
+    def convert_pyramid(
+        self,
+        output_path: str,
+        sizes: Sequence[int],
+        layout: str = "sheets",
+        cell_width: Optional[int] = None,
+        cell_height: Optional[int] = None,
+        sheet_name: str = "PixelArt",
+        colors: Optional[int] = None,
+        quantize: Optional[str] = None,
+        dither: bool = False,
+        merge: Optional[str] = None
+    ) -> dict:
+        """
+        将图片按多个宽度输出（图片金字塔），高度按原比例计算
+        
+        图片只解码一次：从最大的尺寸开始处理，降分辨率解码得到的中间图片
+        保存在 memo 中，较小的尺寸都从它缩放。使用原生XML写入器输出，
+        "sheets" 方式下所有工作表共用一个样式表。
+        
+        Args:
+            output_path: 输出Excel文件路径；"workbooks"方式下作为文件名前缀，
+                各尺寸写入 <前缀>_<宽度>.xlsx
+            sizes: 宽度列表（单元格数量），按此顺序输出
+            layout: "sheets"（每个尺寸一个工作表）或 "workbooks"（每个尺寸一个工作簿）
+            其余参数与 convert_to_excel 相同
+        
+        Returns:
+            描述各尺寸输出位置的字典，见 write_pyramid
+        """
+        if merge is not None and merge not in MERGE_MODES:
+            raise ValueError(f"不支持的合并模式: {merge}（可选: {', '.join(MERGE_MODES)}）")
+        sizes = list(dict.fromkeys(sizes))
+        if not sizes or any(size < 1 for size in sizes):
+            raise ValueError(f"尺寸必须大于0: {sizes}")
+        if max(sizes) > MAX_EXCEL_COLUMNS:
+            raise ValueError(f"宽度 {max(sizes)} 超过Excel工作表上限 ({MAX_EXCEL_COLUMNS}列)")
+        
+        levels = {}
+        for size in sorted(sizes, reverse=True):
+            levels[size] = self._prepare_color_index(size, None, True, colors, quantize, dither)
+            if levels[size].size[1] > MAX_EXCEL_ROWS:
+                raise ValueError(f"宽度 {size} 对应的高度 {levels[size].size[1]} 超过Excel工作表上限 ({MAX_EXCEL_ROWS}行)")
+        
+        print(f"正在输出 {len(sizes)} 个尺寸: {', '.join(str(size) for size in sizes)}")
+        
+        self.workbook = None
+        self.worksheet = None
+        cells = sum(level.index_map.size for level in levels.values())
+        with self._stage("render", pixels=cells) as fields:
+            result = write_pyramid(
+                [levels[size] for size in sizes],
+                output_path,
+                self._column_width(cell_width),
+                self._row_height(cell_height),
+                layout=layout,
+                sheet_name=sheet_name,
+                merge=merge
+            )
+            fields["colors"] = result["styles"]
+        
+        largest = levels[max(sizes)]
+        self.stats = {
+            "width": largest.size[0],
+            "height": largest.size[1],
+            "cells": cells,
+            "colors": result["styles"],
+            "levels": len(sizes)
+        }
+        print(f"渲染完成！共 {len(sizes)} 个尺寸、{result['styles']} 种样式")
+        
+        return result
+    
+    def convert_frames(
+        self,
+        output_path: str,
+        cell_width: Optional[int] = None,
+        cell_height: Optional[int] = None,
+        max_width: Optional[int] = None,
+        max_height: Optional[int] = None,
+        keep_ratio: bool = True,
+        sheet_name: str = "PixelArt",
+        colors: Optional[int] = None,
+        quantize: Optional[str] = None,
+        dither: bool = False,
+        merge: Optional[str] = None,
+        max_frames: Optional[int] = None
+    ) -> dict:
+        """
+        将多帧图片（GIF动画、APNG、多页TIFF）的每一帧转换为一个工作表
+        
+        所有帧共用一个调色板和样式表；量化时调色板在第一帧上生成，之后的帧
+        映射到同一个调色板。每一帧只为与上一帧不同的像素重新建立索引。
+        后台线程解码下一帧的同时，当前线程序列化上一帧的XML。
+        使用原生XML写入器输出；单帧图片输出一个工作表。
+        
+        Args:
+            output_path: 输出Excel文件路径
+            max_frames: 最多转换的帧数，None表示全部
+            其余参数与 convert_to_excel 相同
+        
+        Returns:
+            描述各帧所在工作表的字典，见 write_frames
+        """
+        if merge is not None and merge not in MERGE_MODES:
+            raise ValueError(f"不支持的合并模式: {merge}（可选: {', '.join(MERGE_MODES)}）")
+        if max_frames is not None and max_frames < 1:
+            raise ValueError(f"帧数必须大于0: {max_frames}")
+        
+        width, height = target_size = self._calculate_target_size(max_width, max_height, keep_ratio)
+        if width > MAX_EXCEL_COLUMNS or height > MAX_EXCEL_ROWS:
+            raise ValueError(
+                f"转换后尺寸 {width}x{height} 超过Excel工作表上限 "
+                f"({MAX_EXCEL_COLUMNS}列 x {MAX_EXCEL_ROWS}行)"
+            )
+        
+        quantizer = None
+        if colors is not None or quantize is not None:
+            quantizer = FramePalette(colors if colors is not None else 256, quantize or "median-cut", dither)
+        
+        # 内存中的像素数组和PIL图片只有一帧
+        multi_frame = self._array is None and self._image is None
+        source = self._open_image() if multi_frame else self.get_resized_image(target_size)
+        count = min(frame_count(source), max_frames or frame_count(source))
+        print(f"正在逐帧渲染图片到Excel... ({width}x{height}，{count} 帧)")
+        
+        self.workbook = None
+        self.worksheet = None
+        try:
+            frames = decode_frames(source, target_size, _RESAMPLE, _REDUCING_GAP, quantizer, max_frames)
+            # 写出失败时先关闭预取生成器（等待后台线程退出），再关闭源图片，
+            # 避免后台线程继续从已关闭的图片读取帧
+            with self._stage("render", pixels=width * height * count) as fields:
+                with closing(prefetch(frames)) as pipeline:
+                    result = write_frames(
+                        pipeline,
+                        output_path,
+                        self._column_width(cell_width),
+                        self._row_height(cell_height),
+                        sheet_name=sheet_name,
+                        merge=merge
+                    )
+                fields["colors"] = result["styles"]
+        finally:
+            if multi_frame:
+                source.close()
+        
+        changed = sum(entry["changed_cells"] for entry in result["frames"])
+        self.stats = {
+            "width": width,
+            "height": height,
+            "cells": width * height * count,
+            "colors": result["styles"],
+            "frames": count,
+            "changed_cells": changed
+        }
+        print(f"渲染完成！共 {count} 帧、{result['styles']} 种样式，重新索引 {changed} 个单元格")
+        
+        return result
+    
+    def _prepare_color_index(
+        self,
+        max_width: Optional[int] = None,
+        max_height: Optional[int] = None,
+        keep_ratio: bool = True,
+        colors: Optional[int] = None,
+        quantize: Optional[str] = None,
+        dither: bool = False
+    ) -> ColorIndex:
+        """
+        调整图片尺寸、按需量化，并转换为调色板和索引图
+        
+        结果按目标尺寸和量化参数保存在实例的 memo 中，相同参数再次转换时
+        跳过解码、缩放、量化和建立索引。
+        
+        Args:
+            max_width: 最大宽度
+            max_height: 最大高度
+            keep_ratio: 是否保持比例
+            colors: 量化后的最大颜色数量，None表示不量化
+            quantize: 量化方法
+            dither: 量化时是否使用抖动
+        
+        Returns:
+            ColorIndex对象
+        """
         # 计算目标尺寸
         target_size = self._calculate_target_size(
             max_width, max_height, keep_ratio
         )
         
-        # 调整图片尺寸
-        resized_image = resize_image(self.image, target_size)
+        index_key = ("index", target_size, _RESAMPLE, colors, quantize, dither)
+        color_index = self.memo.get(index_key)
+        if color_index is not None:
+            return color_index
         
-        # 创建Excel工作簿
-        self.workbook = openpyxl.Workbook()
-        self.worksheet = self.workbook.active
-        self.worksheet.title = sheet_name
+        resized_image = self._prepare_image(target_size, colors, quantize, dither)
         
-        # 设置单元格尺寸
-        self._set_cell_dimensions(
-            resized_image.size[0], 
-            resized_image.size[1],
-            cell_width,
-            cell_height
-        )
+        # 一次性转换为调色板和索引图，供各渲染引擎使用
+        with self._stage("index", pixels=target_size[0] * target_size[1]) as fields:
+            color_index = build_color_index(resized_image)
+            fields["colors"] = color_index.color_count
+        self.memo.put(index_key, color_index)
         
-        # 渲染图片到Excel
-        self._render_image_to_excel(resized_image)
+        self._warn_style_limit(color_index.color_count)
+        return color_index
+    
+    def _prepare_image(
+        self,
+        target_size: Tuple[int, int],
+        colors: Optional[int] = None,
+        quantize: Optional[str] = None,
+        dither: bool = False
+    ) -> Image.Image:
+        """
+        获取缩放到目标尺寸并按需量化的RGB图片
         
-        # 保存文件
-        self.workbook.save(output_path)
+        Args:
+            target_size: 目标尺寸 (宽度, 高度)
+            colors: 量化后的最大颜色数量，None表示不量化
+            quantize: 量化方法
+            dither: 量化时是否使用抖动
         
-        return output_path
+        Returns:
+            RGB模式的图片对象
+        """
+        resized_image = self.get_resized_image(target_size)
+        
+        # 量化颜色，限制不同样式的数量
+        if colors is not None or quantize is not None:
+            with self._stage("quantize", pixels=target_size[0] * target_size[1]):
+                resized_image = quantize_image(
+                    resized_image,
+                    colors if colors is not None else 256,
+                    quantize or "median-cut",
+                    dither
+                )
+        return resized_image
+    
+    def _warn_style_limit(self, color_count: int):
+        """颜色数量超过Excel样式上限时打印警告"""
+        if color_count > MAX_EXCEL_STYLES:
+            print(
+                f"警告: 图片包含 {color_count} 种颜色，超过Excel约 "
+                f"{MAX_EXCEL_STYLES} 种样式的上限，建议使用 colors 参数量化"
+            )
+    
+    def get_resized_image(self, target_size: Tuple[int, int]) -> Image.Image:
+        """
+        获取缩放到目标尺寸的RGB图片
+        
+        结果保存在实例的 memo 中，同一尺寸再次转换时直接复用；
+        没有缓存时从足够大的中间图片缩放（见 _intermediate_for），
+        而不是每次都从完整分辨率的原图开始。返回的图片不应被修改。
+        
+        Args:
+            target_size: 目标尺寸 (宽度, 高度)
+        
+        Returns:
+            RGB模式的图片对象
+        """
+        resized_key = ("resized", target_size, _RESAMPLE)
+        resized_image = self.memo.get(resized_key)
+        if resized_image is not None:
+            return resized_image
+        
+        # 按目标尺寸降分辨率解码，或复用已解码的中间图片
+        with self._stage("load") as fields:
+            source = self._intermediate_for(target_size)
+            fields["pixels"] = source.width * source.height
+        
+        with self._stage("resize", pixels=target_size[0] * target_size[1]):
+            resized_image = resize_image(source, target_size, _RESAMPLE)
+            if resized_image.mode != 'RGB':
+                resized_image = resized_image.convert('RGB')
+        
+        self.memo.put(resized_key, resized_image)
+        return resized_image
+    
+    def _intermediate_for(self, target_size: Tuple[int, int]) -> Image.Image:
+        """
+        找到缩放到目标尺寸时使用的源图片
+        
+        依次尝试：memo中尺寸等于目标尺寸，或两个方向都至少为目标尺寸
+        _REDUCING_GAP 倍的最小图片（与降分辨率解码的画质标准相同）；
+        已加载的完整分辨率图片；最后按目标尺寸降分辨率解码并存入memo。
+        
+        Args:
+            target_size: 目标尺寸 (宽度, 高度)
+        
+        Returns:
+            源图片对象
+        """
+        min_width = max(target_size[0], 1) * _REDUCING_GAP
+        min_height = max(target_size[1], 1) * _REDUCING_GAP
+        
+        best_key, best = None, None
+        for key, image in self.memo.images():
+            usable = image.size == target_size or (image.width >= min_width and image.height >= min_height)
+            if usable and (best is None or image.width * image.height < best.width * best.height):
+                best_key, best = key, image
+        if best is not None:
+            self.memo.touch(best_key)
+            return best
+        
+        if self._image is not None:
+            return self._image
+        
+        source = self._load_image(target_size)
+        self.memo.put(("decoded", source.size), source)
+        return source
     
     def _calculate_target_size(
         self, 
@@ -114,11 +1033,11 @@ class ImageToExcel:
             max_width: 最大宽度
             max_height: 最大高度
             keep_ratio: 是否保持比例
-            
+        
         Returns:
             (宽度, 高度) 元组
         """
-        original_width, original_height = self.image.size
+        original_width, original_height = self._read_header()["size"]
         
         if max_width is None and max_height is None:
             # 如果没有指定尺寸限制，使用原尺寸
@@ -157,62 +1076,266 @@ class ImageToExcel:
         """
         设置Excel单元格的尺寸
         
+        所有列宽度相同，写成一个覆盖第1~width列的列区间（<col min="1" max="width">）；
+        行高写为工作表的默认行高，不为每一行创建行尺寸对象。
+        无论图片多大，设置的开销都是常数。
+        
         Args:
             width: 图片宽度（单元格数量）
-            height: 图片高度（单元格数量）
+            height: 图片高度（单元格数量）；行高对所有行生效，与行数无关
             cell_width: 单元格宽度（像素）
             cell_height: 单元格高度（像素）
         """
         # 设置列宽
-        for col in range(1, width + 1):
-            col_letter = get_column_letter(col)
-            if cell_width:
-                self.worksheet.column_dimensions[col_letter].width = cell_width / 7  # openpyxl使用字符单位
-            else:
-                self.worksheet.column_dimensions[col_letter].width = 2  # 默认宽度
+        if width > 0:
+            self.worksheet.column_dimensions["A"] = ColumnDimension(
+                self.worksheet, index="A", min=1, max=width,
+                width=self._column_width(cell_width)
+            )
         
-        # 设置行高
-        for row in range(1, height + 1):
-            if cell_height:
-                self.worksheet.row_dimensions[row].height = cell_height * 0.75  # openpyxl使用磅为单位
-            else:
-                self.worksheet.row_dimensions[row].height = 15  # 默认高度
+        # 设置默认行高
+        self.worksheet.sheet_format.defaultRowHeight = self._row_height(cell_height)
+        self.worksheet.sheet_format.customHeight = True
     
-    def _render_image_to_excel(self, image: Image.Image):
+    @staticmethod
+    def _column_width(cell_width: Optional[int] = None) -> float:
+        """将单元格宽度（像素）换算为openpyxl列宽（字符单位）"""
+        if cell_width:
+            return cell_width / 7  # openpyxl使用字符单位
+        return 2  # 默认宽度
+    
+    @staticmethod
+    def _row_height(cell_height: Optional[int] = None) -> float:
+        """将单元格高度（像素）换算为openpyxl行高（磅）"""
+        if cell_height:
+            return cell_height * 0.75  # openpyxl使用磅为单位
+        return 15  # 默认高度
+    
+    def _render_image_to_excel(
+        self,
+        color_index: ColorIndex,
+        regions: Optional[List[Region]] = None,
+        reporter: Optional[ProgressReporter] = None
+    ):
         """
         将图片渲染到Excel中
         
         Args:
-            image: PIL图片对象
+            color_index: 图片的调色板和索引图
+            regions: 相同颜色的合并区域，None表示逐单元格设置样式
+            reporter: 进度报告器，每渲染一行报告一次并检查取消
         """
-        width, height = image.size
-        
-        # 获取图片数据
-        img_data = image.load()
+        width, height = color_index.size
+        mask = anchor_mask(regions, (height, width)) if regions is not None else None
         
         print(f"正在渲染图片到Excel... ({width}x{height})")
         
-        # 逐像素设置单元格颜色
+        # 每种颜色只创建一次填充样式
+        registry = FillRegistry(color_index.hex_colors)
+        
+        # 逐单元格设置颜色（合并模式下只设置区域左上角的单元格）
         for y in range(height):
-            for x in range(width):
-                # 获取像素RGB值
-                r, g, b = img_data[x, y]
-                
-                # 转换为十六进制颜色
-                hex_color = rgb_to_hex(r, g, b)
-                
-                # 创建填充样式
-                fill = PatternFill(
-                    start_color=hex_color,
-                    end_color=hex_color,
-                    fill_type="solid"
-                )
-                
-                # 设置单元格填充
+            indices = color_index.index_map[y].tolist()
+            columns = range(width) if mask is None else np.flatnonzero(mask[y]).tolist()
+            for x in columns:
                 cell = self.worksheet.cell(row=y+1, column=x+1)
-                cell.fill = fill
+                registry.apply(cell, indices[x])
+            if reporter is not None:
+                reporter.update(y + 1)
         
-        print("渲染完成！")
+        self._merge_regions(regions)
+        self._record_render_stats(width, height, registry.color_count, count_regions(regions))
+    
+    def _render_image_streaming(
+        self,
+        color_index: ColorIndex,
+        regions: Optional[List[Region]] = None,
+        reporter: Optional[ProgressReporter] = None
+    ):
+        """
+        以只写模式逐行将图片渲染到Excel中
+        
+        每一行在追加后立即写入临时文件，行高使用工作表的默认行高，
+        因此内存占用不随图片高度增长。
+        
+        Args:
+            color_index: 图片的调色板和索引图
+            regions: 相同颜色的合并区域，None表示逐单元格设置样式
+            reporter: 进度报告器，每写出一行报告一次并检查取消
+        """
+        width, height = color_index.size
+        registry = FillRegistry(color_index.hex_colors)
+        mask = anchor_mask(regions, (height, width)) if regions is not None else None
+        
+        print(f"正在流式渲染图片到Excel... ({width}x{height})")
+        
+        for y in range(height):
+            indices = color_index.index_map[y].tolist()
+            columns = range(width) if mask is None else np.flatnonzero(mask[y]).tolist()
+            
+            # 值为None的位置不会写出单元格
+            row = [None] * width
+            for x in columns:
+                cell = WriteOnlyCell(self.worksheet)
+                registry.apply(cell, indices[x])
+                row[x] = cell
+            
+            self.worksheet.append(row)
+            if reporter is not None:
+                reporter.update(y + 1)
+        
+        self._merge_regions(regions)
+        self._record_render_stats(width, height, registry.color_count, count_regions(regions))
+    
+    def _render_image_raw(
+        self,
+        color_index: ColorIndex,
+        output_path: Union[str, BinaryIO],
+        sheet_name: str,
+        cell_width: Optional[int] = None,
+        cell_height: Optional[int] = None,
+        regions: Optional[List[Region]] = None,
+        reporter: Optional[ProgressReporter] = None,
+        jobs: Optional[int] = None
+    ):
+        """
+        使用原生XML写入器将图片渲染为XLSX文件
+        
+        jobs大于1且图片足够高时，索引图放入共享内存，各进程分别序列化
+        一段连续行的XML，再按顺序写入同一个工作表流。
+        
+        Args:
+            color_index: 图片的调色板和索引图
+            output_path: 输出Excel文件路径或文件对象
+            sheet_name: 工作表名称
+            cell_width: 单元格宽度（像素）
+            cell_height: 单元格高度（像素）
+            regions: 相同颜色的合并区域，None表示逐单元格设置样式
+            reporter: 进度报告器，每写出一个XML块报告一次并检查取消
+            jobs: 并行进程数
+        """
+        width, height = color_index.size
+        progress = reporter.update if reporter is not None else None
+        
+        with RawXlsxWriter(output_path) as writer:
+            if can_render_bands(height, jobs):
+                print(f"正在以原生XML并行渲染图片到Excel... ({width}x{height}，{jobs} 个进程)")
+                lookup = writer.register_colors(color_index.hex_colors)
+                writer.add_sheet_xml(sheet_name, band_sheet_xml_chunks(
+                    color_index.index_map,
+                    lookup,
+                    self._column_width(cell_width),
+                    self._row_height(cell_height),
+                    regions,
+                    jobs,
+                    progress
+                ))
+            else:
+                print(f"正在以原生XML渲染图片到Excel... ({width}x{height})")
+                writer.add_sheet(
+                    sheet_name,
+                    color_index.hex_colors,
+                    color_index.index_map,
+                    self._column_width(cell_width),
+                    self._row_height(cell_height),
+                    regions,
+                    progress
+                )
+        
+        self._record_render_stats(width, height, writer.color_count, count_regions(regions))
+    
+    def _render_incremental(
+        self,
+        color_index: ColorIndex,
+        output_path: str,
+        sheet_name: str,
+        cell_width: Optional[int] = None,
+        cell_height: Optional[int] = None,
+        reporter: Optional[ProgressReporter] = None
+    ):
+        """
+        增量更新已有的工作簿，无法增量更新时完整渲染并保存状态文件
+        
+        Args:
+            color_index: 图片的调色板和索引图
+            output_path: 输出Excel文件路径
+            sheet_name: 工作表名称
+            cell_width: 单元格宽度（像素）
+            cell_height: 单元格高度（像素）
+            reporter: 进度报告器
+        """
+        width, height = color_index.size
+        column_width = self._column_width(cell_width)
+        row_height = self._row_height(cell_height)
+        
+        progress = reporter.update if reporter is not None else None
+        state = load_state(output_path)
+        patched = None
+        if state is not None and state.matches((height, width), sheet_name, column_width, row_height):
+            patched = patch_workbook(
+                output_path, state, color_index.hex_colors, color_index.index_map, progress
+            )
+        
+        if patched is not None:
+            state, changed_cells, changed_bands = patched
+            bands = -(-height // state.band_rows)
+            print(f"增量更新Excel完成: {changed_cells} 个单元格变化，重新生成 {changed_bands} / {bands} 个条带")
+        else:
+            print(f"正在以原生XML渲染图片到Excel... ({width}x{height})")
+            state = write_workbook(
+                output_path, color_index.hex_colors, color_index.index_map,
+                sheet_name, column_width, row_height, progress
+            )
+            changed_cells = width * height
+        
+        self._record_render_stats(width, height, len(state.colors))
+        self.stats.update({"incremental": patched is not None, "changed_cells": changed_cells})
+    
+    def _merge_regions(self, regions: Optional[List[Region]]):
+        """
+        记录多于一个单元格的合并区域
+        
+        直接一次性构造合并区域集合，避免逐个 merge_cells 时的重复检查。
+        
+        Args:
+            regions: 相同颜色的合并区域
+        """
+        if regions is None:
+            return
+        self.worksheet.merged_cells = MultiCellRange(
+            [CellRange(region.ref) for region in regions if region.cell_count > 1]
+        )
+    
+    def _record_render_stats(
+        self,
+        width: int,
+        height: int,
+        color_count: int,
+        region_count: Optional[int] = None
+    ):
+        """
+        记录渲染统计信息
+        
+        Args:
+            width: 图片宽度（单元格数量）
+            height: 图片高度（单元格数量）
+            color_count: 不同颜色数量
+            region_count: 合并区域数量（即设置样式的单元格数），None表示不合并
+        """
+        cells = width * height
+        styled_cells = region_count if region_count is not None else cells
+        self.stats = {
+            "width": width,
+            "height": height,
+            "cells": cells,
+            "styled_cells": styled_cells,
+            "colors": color_count
+        }
+        print(f"渲染完成！共 {color_count} 种颜色")
+        
+        if region_count is not None:
+            reduction = (1 - styled_cells / cells) * 100 if cells else 0
+            print(f"合并后设置样式的单元格: {styled_cells} / {cells}（减少 {reduction:.1f}%）")
     
     def get_image_info(self) -> dict:
         """
@@ -221,18 +1344,225 @@ class ImageToExcel:
         Returns:
             包含图片信息的字典
         """
-        if self.image is None:
-            return {}
+        header = self._read_header()
         
         return {
             "path": self.image_path,
-            "size": self.image.size,
-            "mode": self.image.mode,
-            "format": self.image.format,
-            "width": self.image.size[0],
-            "height": self.image.size[1]
+            "size": header["size"],
+            "mode": header["mode"],
+            "format": header["format"],
+            "width": header["size"][0],
+            "height": header["size"][1],
+            "frames": header.get("frames", 1)
         }
     
+    def estimate(
+        self,
+        max_width: Optional[int] = None,
+        max_height: Optional[int] = None,
+        keep_ratio: bool = True,
+        engine: str = "openpyxl",
+        colors: Optional[int] = None,
+        quantize: Optional[str] = None,
+        models: Optional[Dict[str, CostModel]] = None
+    ) -> Estimate:
+        """
+        估计转换后的尺寸、颜色数量、输出文件大小、耗时和峰值内存，不生成文件
+        
+        尺寸与 convert_to_excel 的计算相同。颜色数量从缩放到目标尺寸的图片中
+        随机抽样估计，缩放结果保存在 memo 中，随后的转换直接复用；目标尺寸超过
+        MAX_SAMPLED_CELLS 时只取不超过该单元格数的抽样网格上的最近邻像素
+        （见 _sample_grid），颜色数量按目标单元格数外推。文件大小、耗时和内存由开销模型预测
+        （见 estimate 模块），不考虑合并单元格。
+        
+        Args:
+            max_width: 最大宽度
+            max_height: 最大高度
+            keep_ratio: 是否保持比例
+            engine: 渲染引擎
+            colors: 量化后的最大颜色数量，None表示不量化
+            quantize: 量化方法
+            models: 渲染引擎 -> 开销模型，默认使用 DEFAULT_MODELS
+        
+        Returns:
+            Estimate对象
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"不支持的渲染引擎: {engine}（可选: {', '.join(ENGINES)}）")
+        if colors == AUTO_COLORS:
+            raise ValueError('colors="auto" 需要同时指定 budget')
+        models = models or DEFAULT_MODELS
+        
+        width, height = target_size = self._calculate_target_size(max_width, max_height, keep_ratio)
+        cells = width * height
+        scale = math.sqrt(MAX_SAMPLED_CELLS / max(cells, 1))
+        if scale < 1.0:
+            sample = self._sample_grid((max(1, int(width * scale)), max(1, int(height * scale))))
+        else:
+            sample = self.get_resized_image(target_size)
+        
+        with self._stage("estimate", pixels=cells) as fields:
+            pixels = np.asarray(sample)
+            color_count = estimate_colors(pixels, cells)
+            change_rate = estimate_change_rate(pixels)
+            fields["colors"] = color_count
+        limit = color_limit(colors, quantize)
+        if limit is not None:
+            color_count = min(color_count, limit)
+        
+        source_pixels = self._decoded_pixels(target_size)
+        seconds, output_bytes, memory = predict(
+            models[engine], cells, color_count, source_pixels, change_rate
+        )
+        return Estimate(
+            width, height, cells, color_count, change_rate, source_pixels,
+            output_bytes, seconds, memory, engine
+        )
+    
+    def _sample_grid(self, sample_size: Tuple[int, int]) -> Image.Image:
+        """
+        取抽样网格上的最近邻像素，不解码和缩放到目标尺寸
+        
+        LANCZOS缩放和按整数倍缩小都会在色块边缘混合出目标图片中没有的颜色，
+        因此直接取源图片中网格点上的像素。JPEG使用draft模式降分辨率解码（至少保留
+        网格尺寸的 _REDUCING_GAP 倍），像素数组只读取网格点所在的行，
+        内存映射数组不会被整体读入内存。
+        
+        Args:
+            sample_size: 抽样网格尺寸 (宽度, 高度)
+        
+        Returns:
+            RGB模式的图片对象
+        """
+        with self._stage("load") as fields:
+            if self._array is not None:
+                height, width = self._array.shape[:2]
+                rows = ((np.arange(sample_size[1]) + 0.5) * height / sample_size[1]).astype(np.intp)
+                columns = ((np.arange(sample_size[0]) + 0.5) * width / sample_size[0]).astype(np.intp)
+                sample = Image.fromarray(np.ascontiguousarray(self._array[rows][:, columns]))
+            else:
+                source = self._image
+                if source is None:
+                    source = self._open_image()
+                    if source.format == "JPEG":
+                        source.draft(
+                            "RGB", (sample_size[0] * _REDUCING_GAP, sample_size[1] * _REDUCING_GAP)
+                        )
+                sample = source.resize(sample_size, Image.Resampling.NEAREST)
+            fields["pixels"] = sample_size[0] * sample_size[1]
+        
+        if sample.mode != 'RGB':
+            sample = sample.convert('RGB')
+        return sample
+    
+    def _decoded_pixels(self, target_size: Tuple[int, int]) -> int:
+        """按目标尺寸降分辨率解码时得到的像素数（与 _load_image 的缩小倍数一致）"""
+        original_width, original_height = self._read_header()["size"]
+        if self._image is not None:
+            return original_width * original_height
+        factor = min(
+            original_width // (max(target_size[0], 1) * _REDUCING_GAP),
+            original_height // (max(target_size[1], 1) * _REDUCING_GAP)
+        )
+        if factor >= 2:
+            return (original_width // factor) * (original_height // factor)
+        return original_width * original_height
+    
+    def plan(
+        self,
+        budget: Budget,
+        max_width: Optional[int] = None,
+        max_height: Optional[int] = None,
+        keep_ratio: bool = True,
+        engine: str = "openpyxl",
+        colors: Optional[Union[int, str]] = None,
+        quantize: Optional[str] = None,
+        models: Optional[Dict[str, CostModel]] = None
+    ) -> Plan:
+        """
+        在预算内选择最大的目标尺寸，colors 为 "auto" 时同时选择调色板大小
+        
+        max_width、max_height 和 keep_ratio 按 convert_to_excel 的方式给出尺寸上限，
+        在上限内按比例缩小（见 utils.plan_target_size），同时不超过Excel工作表的行列上限。
+        预算只限制单元格数时直接计算；限制文件大小或耗时时在尺寸上限上抽样估计一次
+        颜色数量和颜色变化率，各候选尺寸的颜色数取该值与单元格数中的较小者，
+        量化后的变化率按未量化的计（都偏保守），由开销模型预测，不做试转换。
+        
+        colors 为 "auto" 时先减少颜色再缩小尺寸：依次尝试不量化和 PLAN_PALETTE_SIZES，
+        取第一个能在尺寸上限满足预算的调色板；都不能时取得到尺寸最大的一个。
+        
+        Args:
+            budget: 转换预算
+            max_width: 最大宽度
+            max_height: 最大高度
+            keep_ratio: 是否保持比例
+            engine: 渲染引擎
+            colors: 量化后的最大颜色数量，None表示不量化，"auto"表示自动选择
+            quantize: 量化方法
+            models: 渲染引擎 -> 开销模型，默认使用 DEFAULT_MODELS
+        
+        Returns:
+            Plan对象；其中的估计在所选尺寸上重新抽样（缩放结果保存在 memo 中，
+            随后的转换直接复用），重新抽样后超出预算时继续缩小，返回的估计总满足预算
+        
+        Raises:
+            ValueError: 最小的尺寸也超出预算
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"不支持的渲染引擎: {engine}（可选: {', '.join(ENGINES)}）")
+        model = (models or DEFAULT_MODELS)[engine]
+        upper = self._calculate_target_size(max_width, max_height, keep_ratio)
+        
+        if colors != AUTO_COLORS:
+            palettes = [colors]
+        elif quantize == "websafe":
+            # Web安全色的调色板大小固定
+            palettes = [None]
+        else:
+            palettes = [None, *PLAN_PALETTE_SIZES]
+        
+        def fitter(limit: Optional[int], sample: Optional[Estimate]):
+            """按抽样得到的颜色数和变化率判断尺寸是否满足预算"""
+            def fits(width: int, height: int) -> bool:
+                cells = width * height
+                if width > MAX_EXCEL_COLUMNS or height > MAX_EXCEL_ROWS:
+                    return False
+                if sample is None:
+                    return budget.allows(cells)
+                color_count = min(sample.colors, cells, limit or cells)
+                seconds, output_bytes, _ = predict(
+                    model, cells, color_count, self._decoded_pixels((width, height)),
+                    sample.change_rate
+                )
+                return budget.allows(cells, output_bytes, seconds)
+            return fits
+        
+        upper_estimate = None
+        if budget.needs_estimate:
+            upper_estimate = self.estimate(upper[0], upper[1], False, engine, models=models)
+        
+        best_size, best_palette = None, None
+        for palette in palettes:
+            size = plan_target_size(upper[0], upper[1], fitter(color_limit(palette, quantize), upper_estimate))
+            if size is not None and (best_size is None or size[0] * size[1] > best_size[0] * best_size[1]):
+                best_size, best_palette = size, palette
+            if size == upper:
+                break
+        
+        while best_size is not None:
+            width, height = best_size
+            estimate = self.estimate(width, height, False, engine, best_palette, quantize, models)
+            if budget.allows(estimate.cells, estimate.output_bytes, estimate.seconds):
+                return Plan(width, height, best_palette, estimate)
+            # 缩小后的图片颜色更多、变化更频繁时，在所选尺寸上重新抽样的估计可能超出预算，
+            # 按该估计在更小的尺寸中重新选择
+            fits = fitter(color_limit(best_palette, quantize), estimate)
+            best_size = plan_target_size(
+                upper[0], upper[1], lambda w, h: w * h < estimate.cells and fits(w, h)
+            )
+        
+        raise ValueError(f"预算过小，最小的尺寸也无法满足: {budget.describe()}")
+    
     def preview_resize(
         self, 
         max_width: Optional[int] = None, 
@@ -246,7 +1576,7 @@ class ImageToExcel:
             max_width: 最大宽度
             max_height: 最大高度
             keep_ratio: 是否保持比例
-            
+        
         Returns:
             (宽度, 高度) 元组
         """
@@ -0,0 +1,274 @@
+"""
+多帧输入模块 - 将GIF动画、APNG和多页TIFF的每一帧写为一个工作表
+
+所有帧共用一个调色板和样式表，每一帧只为与上一帧不同的像素重新建立索引。
+解码、缩放和量化在后台线程中进行（Pillow在这些操作中释放GIL），
+与上一帧的XML序列化同时进行。
+"""
+
+import queue
+import threading
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .palette import apply_palette, pack_rgb, quantize_palette
+from .regions import find_regions
+from .utils import resize_image
+from .xlsx_writer import RawXlsxWriter
+
+
+# 后台线程最多提前解码的帧数
+FRAME_PIPELINE_DEPTH = 2
+
+# Excel工作表名称的最大长度
+_MAX_SHEET_NAME = 31
+
+
+class Frame(NamedTuple):
+    """
+    缩放（和量化）后的一帧
+    
+    Attributes:
+        number: 帧序号（从0开始）
+        pixels: 形状为 (高度, 宽度, 3) 的uint8数组
+        duration: 帧的显示时长（毫秒），格式中没有记录时为None
+    """
+    number: int
+    pixels: np.ndarray
+    duration: Optional[float]
+
+
+def frame_count(image: Image.Image) -> int:
+    """图片包含的帧数（单帧图片为1）"""
+    return getattr(image, "n_frames", 1)
+
+
+def frame_name(base: str, number: int) -> str:
+    """生成某一帧的工作表名称，如 PixelArt_1（帧序号从1开始）"""
+    suffix = f"_{number + 1}"
+    return base[:_MAX_SHEET_NAME - len(suffix)] + suffix
+
+
+class FramePalette:
+    """
+    所有帧共用的量化调色板
+    
+    调色板在第一帧上生成，之后的帧都映射到这个调色板上，
+    使各帧的颜色一致、样式表不随帧数增长。
+    """
+    
+    def __init__(self, colors: int, method: str, dither: bool = False):
+        """
+        Args:
+            colors: 目标颜色数量
+            method: 量化方法，见 quantize_image
+            dither: 是否使用抖动
+        """
+        self.colors = colors
+        self.method = method
+        self.dither = dither
+        self._palette_image = None
+    
+    def __call__(self, image: Image.Image) -> Image.Image:
+        """将一帧映射到共用调色板，第一次调用时生成调色板"""
+        if self._palette_image is None:
+            self._palette_image = quantize_palette(image, self.colors, self.method)
+        return apply_palette(image, self._palette_image, self.dither)
+
+
+def decode_frames(
+    image: Image.Image,
+    target_size: Tuple[int, int],
+    resample: int = Image.Resampling.LANCZOS,
+    reducing_gap: int = 3,
+    quantizer: Optional[FramePalette] = None,
+    max_frames: Optional[int] = None
+) -> Iterator[Frame]:
+    """
+    逐帧解码、缩放并按需量化
+    
+    GIF和APNG的每一帧在定位时已经与之前的帧合成，得到的是完整画面。
+    帧尺寸至少为目标尺寸 reducing_gap 倍时先按整数倍缩小，与单帧图片的
+    降分辨率解码一致。
+    
+    Args:
+        image: 已打开的PIL图片
+        target_size: 目标尺寸 (宽度, 高度)
+        resample: 重采样滤镜
+        reducing_gap: 整数倍缩小后至少保留的目标尺寸倍数
+        quantizer: 共用调色板，None表示不量化
+        max_frames: 最多处理的帧数，None表示全部
+    
+    Returns:
+        Frame的迭代器
+    """
+    count = frame_count(image)
+    if max_frames is not None:
+        count = min(count, max_frames)
+    
+    min_width = max(target_size[0], 1) * reducing_gap
+    min_height = max(target_size[1], 1) * reducing_gap
+    for number in range(count):
+        image.seek(number)
+        frame = image.convert("RGB")
+        factor = min(frame.width // min_width, frame.height // min_height)
+        if factor >= 2:
+            frame = frame.reduce(factor)
+        if frame.size != target_size:
+            frame = resize_image(frame, target_size, resample)
+        if quantizer is not None:
+            frame = quantizer(frame)
+        yield Frame(number, np.asarray(frame), image.info.get("duration"))
+
+
+def prefetch(items: Iterable, depth: int = FRAME_PIPELINE_DEPTH) -> Iterator:
+    """
+    在后台线程中提前生成最多depth项
+    
+    生成过程中的异常在取到对应位置时重新抛出；提前停止迭代时
+    后台线程在当前项完成后退出。
+    
+    Args:
+        items: 可迭代对象，在后台线程中迭代
+        depth: 最多提前生成的项数
+    
+    Returns:
+        与items顺序相同的迭代器
+    """
+    pending = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+    
+    def put(entry) -> bool:
+        while not stopped.is_set():
+            try:
+                pending.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def produce():
+        try:
+            for item in items:
+                if not put((True, item)):
+                    return
+        except BaseException as e:
+            put((False, e))
+            return
+        put((False, None))
+    
+    thread = threading.Thread(target=produce, name="img2excel-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            ok, value = pending.get()
+            if ok:
+                yield value
+            elif value is None:
+                return
+            else:
+                raise value
+    finally:
+        stopped.set()
+        thread.join()
+
+
+class FrameIndexer:
+    """
+    所有帧共用的调色板和增量索引
+    
+    颜色在第一次出现的帧中加入调色板（同一帧的新颜色按颜色值排序），已有颜色的索引保持不变；
+    每一帧只为与上一帧不同的像素查找索引，其余像素沿用上一帧的索引图。
+    """
+    
+    def __init__(self):
+        self.hex_colors: List[str] = []
+        self._color_ids: Dict[int, int] = {}
+        self._previous: Optional[np.ndarray] = None
+        self._index_map: Optional[np.ndarray] = None
+    
+    @property
+    def color_count(self) -> int:
+        """调色板中的颜色数量"""
+        return len(self.hex_colors)
+    
+    def _color_id(self, color: int) -> int:
+        """获取打包颜色值对应的调色板索引（不存在时追加）"""
+        color_id = self._color_ids.get(color)
+        if color_id is None:
+            color_id = self._color_ids[color] = len(self.hex_colors)
+            self.hex_colors.append(f"{color:06X}")
+        return color_id
+    
+    def index(self, pixels: np.ndarray) -> Tuple[np.ndarray, int]:
+        """
+        建立一帧的索引图
+        
+        Args:
+            pixels: 形状为 (高度, 宽度, 3) 的uint8数组
+        
+        Returns:
+            (索引图, 与上一帧不同的像素数)；第一帧的所有像素都算作变化
+        """
+        packed = pack_rgb(pixels)
+        if self._previous is None or self._previous.shape != packed.shape:
+            changed = np.ones(packed.shape, dtype=bool)
+            index_map = np.empty(packed.shape, dtype=np.uint32)
+        else:
+            changed = packed != self._previous
+            index_map = self._index_map.copy()
+        
+        colors, inverse = np.unique(packed[changed], return_inverse=True)
+        ids = np.array([self._color_id(color) for color in colors.tolist()], dtype=np.uint32)
+        index_map[changed] = ids[inverse]
+        
+        self._previous = packed
+        self._index_map = index_map
+        return index_map, int(inverse.size)
+
+
+def write_frames(
+    frames: Iterable[Frame],
+    output_path: str,
+    column_width: float,
+    row_height: float,
+    sheet_name: str = "PixelArt",
+    merge: Optional[str] = None
+) -> dict:
+    """
+    将各帧写为同一个工作簿的多个工作表，所有工作表共用一个样式表
+    
+    Args:
+        frames: 各帧，按输出顺序排列
+        output_path: 输出Excel文件路径
+        column_width: 列宽（字符单位）
+        row_height: 行高（磅）
+        sheet_name: 工作表名称前缀
+        merge: 合并模式，None表示不合并
+    
+    Returns:
+        描述各帧所在工作表的字典
+    """
+    indexer = FrameIndexer()
+    entries = []
+    with RawXlsxWriter(output_path) as writer:
+        for frame in frames:
+            index_map, changed = indexer.index(frame.pixels)
+            name = frame_name(sheet_name, frame.number)
+            writer.add_sheet(
+                name,
+                indexer.hex_colors,
+                index_map,
+                column_width,
+                row_height,
+                find_regions(index_map, merge) if merge else None
+            )
+            entries.append({
+                "frame": frame.number,
+                "sheet": name,
+                "duration": frame.duration,
+                "changed_cells": changed
+            })
+    return {"styles": writer.color_count, "frames": entries}
@@ -9,9 +9,10 @@ from tkinter import ttk, filedialog, messagebox, scrolledtext
 import threading
 import os
 from pathlib import Path
-from PIL import Image, ImageTk
+from PIL import ImageTk
 import openpyxl
 from .core import ImageToExcel
+from .progress import CancelToken, ConversionCancelled
 from .utils import validate_image_path, get_image_dimensions, calculate_cell_count
 
 
@@ -38,6 +39,12 @@ class Img2ExcelGUI:
         self.preview_image = None
         self.preview_photo = None
         
+        # 当前转换的取消令牌
+        self.cancel_token = None
+        
+        # 当前图片的转换器，预览和转换共用，复用已解码和缩放的图片
+        self.converter = None
+        
         self.setup_ui()
         
     def setup_ui(self):
@@ -150,10 +157,15 @@ class Img2ExcelGUI:
         # 转换按钮
         self.convert_btn = ttk.Button(frame, text="开始转换", command=self.start_conversion, 
                                      style="Accent.TButton")
-        self.convert_btn.grid(row=0, column=0, columnspan=2, pady=(0, 10))
+        self.convert_btn.grid(row=0, column=0, pady=(0, 10), sticky=tk.E, padx=(0, 5))
+        
+        # 取消按钮
+        self.cancel_btn = ttk.Button(frame, text="取消", command=self.cancel_conversion, 
+                                    state="disabled")
+        self.cancel_btn.grid(row=0, column=1, pady=(0, 10), sticky=tk.W, padx=(5, 0))
         
-        # 进度条
-        self.progress = ttk.Progressbar(frame, mode='indeterminate')
+        # 进度条（按已渲染的行数显示）
+        self.progress = ttk.Progressbar(frame, mode='determinate', maximum=100)
         self.progress.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
         
         # 状态标签
@@ -179,7 +191,7 @@ class Img2ExcelGUI:
         file_path = filedialog.askopenfilename(
             title="选择图片文件",
             filetypes=[
-                ("图片文件", "*.jpg *.jpeg *.png *.bmp *.gif *.tiff *.tif *.webp"),
+                ("图片文件", "*.jpg *.jpeg *.png *.bmp *.gif *.tiff *.tif *.webp *.npy"),
                 ("所有文件", "*.*")
             ]
         )
@@ -210,11 +222,11 @@ class Img2ExcelGUI:
     def load_preview(self, image_path):
         """加载图片预览"""
         try:
-            # 加载图片
-            image = Image.open(image_path)
+            # 创建转换器（只读取文件头），之后的预览和转换都复用它
+            self.converter = ImageToExcel(image_path)
             
             # 获取图片信息
-            width, height = image.size
+            width, height = self.converter.get_image_info()["size"]
             file_size = os.path.getsize(image_path)
             
             # 计算预览尺寸（最大200x200）
@@ -227,7 +239,7 @@ class Img2ExcelGUI:
                 preview_width = int(width * max_preview_size / height)
             
             # 创建预览图片
-            preview_image = image.resize((preview_width, preview_height), Image.Resampling.LANCZOS)
+            preview_image = self.converter.get_resized_image((max(preview_width, 1), max(preview_height, 1)))
             self.preview_photo = ImageTk.PhotoImage(preview_image)
             
             # 更新预览标签
@@ -241,6 +253,7 @@ class Img2ExcelGUI:
             self.auto_set_parameters(width, height)
             
         except Exception as e:
+            self.converter = None
             self.log_message(f"加载预览失败: {str(e)}")
             self.preview_label.configure(image="", text="预览加载失败")
             
@@ -281,8 +294,10 @@ class Img2ExcelGUI:
             return
             
         # 开始转换（在新线程中）
+        self.cancel_token = CancelToken()
         self.convert_btn.configure(state="disabled")
-        self.progress.start()
+        self.cancel_btn.configure(state="normal")
+        self.progress.configure(value=0)
         self.status_label.configure(text="转换中...", foreground="blue")
         
         # 在新线程中执行转换
@@ -295,10 +310,12 @@ class Img2ExcelGUI:
         try:
             self.log_message("开始转换图片...")
             
-            # 创建转换器
-            converter = ImageToExcel(self.input_path.get())
+            # 复用预览时创建的转换器，已缩放的图片不必重新解码
+            converter = self.converter
+            if converter is None or converter.image_path != self.input_path.get():
+                converter = ImageToExcel(self.input_path.get())
             
-            # 执行转换
+            # 执行转换（进度回调在工作线程中调用，交给主线程更新界面）
             output_path = converter.convert_to_excel(
                 output_path=self.output_path.get(),
                 cell_width=self.cell_width.get(),
@@ -306,7 +323,9 @@ class Img2ExcelGUI:
                 max_width=self.max_width.get(),
                 max_height=self.max_height.get(),
                 keep_ratio=self.keep_ratio.get(),
-                sheet_name=self.sheet_name.get()
+                sheet_name=self.sheet_name.get(),
+                progress=lambda progress: self.root.after(0, self.update_progress, progress),
+                cancel=self.cancel_token
             )
             
             self.log_message(f"转换完成！输出文件: {output_path}")
@@ -314,15 +333,40 @@ class Img2ExcelGUI:
             # 在主线程中更新UI
             self.root.after(0, self.conversion_completed, output_path)
             
+        except ConversionCancelled as e:
+            self.log_message("转换已取消，已删除未完成的输出" if e.output_removed else "转换已取消")
+            self.root.after(0, self.conversion_cancelled)
+        
         except Exception as e:
             error_msg = f"转换失败: {str(e)}"
             self.log_message(error_msg)
             self.root.after(0, self.conversion_failed, error_msg)
             
+    def cancel_conversion(self):
+        """请求取消当前转换，渲染循环会在下一行停止"""
+        if self.cancel_token is not None:
+            self.cancel_token.cancel()
+            self.cancel_btn.configure(state="disabled")
+            self.status_label.configure(text="正在取消...", foreground="orange")
+    
+    def update_progress(self, progress):
+        """更新进度条和状态（在主线程中调用）"""
+        if self.cancel_token is None or self.cancel_token.cancelled:
+            return
+        self.progress.configure(value=progress.fraction * 100)
+        if progress.stage == "save":
+            self.status_label.configure(text="正在保存...", foreground="blue")
+        else:
+            self.status_label.configure(
+                text=f"渲染中... {progress.rows_done}/{progress.rows_total} 行",
+                foreground="blue"
+            )
+    
     def conversion_completed(self, output_path):
         """转换完成后的处理"""
-        self.progress.stop()
+        self.progress.configure(value=100)
         self.convert_btn.configure(state="normal")
+        self.cancel_btn.configure(state="disabled")
         self.status_label.configure(text="转换完成！", foreground="green")
         
         # 询问是否打开文件
@@ -332,10 +376,18 @@ class Img2ExcelGUI:
             except:
                 messagebox.showinfo("提示", f"文件已保存到:\n{output_path}")
                 
+    def conversion_cancelled(self):
+        """转换取消后的处理"""
+        self.progress.configure(value=0)
+        self.convert_btn.configure(state="normal")
+        self.cancel_btn.configure(state="disabled")
+        self.status_label.configure(text="已取消", foreground="orange")
+    
     def conversion_failed(self, error_msg):
         """转换失败后的处理"""
-        self.progress.stop()
+        self.progress.configure(value=0)
         self.convert_btn.configure(state="normal")
+        self.cancel_btn.configure(state="disabled")
         self.status_label.configure(text="转换失败", foreground="red")
         messagebox.showerror("转换失败", error_msg)
         
@@ -0,0 +1,341 @@
+"""
+增量更新模块 - 只重新生成和压缩有变化的行，更新原生XML引擎写出的工作簿
+
+工作表XML按水平条带压缩为可独立替换的deflate片段（见 deflate_segment）。
+每次写出工作簿时在旁边保存一个状态文件（<输出文件名>.state.npz），记录各单元格的
+样式索引、样式表中的颜色顺序和各片段的长度与CRC32。下一次转换时与新的索引图比较：
+未变化的条带原样复制已压缩的字节，只有变化的条带重新生成XML并压缩，
+样式表只追加新出现的颜色。
+"""
+
+import json
+import os
+import struct
+import tempfile
+import zipfile
+from typing import Callable, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .palette import MAX_EXCEL_STYLES
+from .xlsx_writer import RawXlsxWriter, deflate_segment, sheet_footer, sheet_header, sheet_rows
+
+
+# 状态文件格式版本，格式变化时递增使旧状态失效
+_STATE_VERSION = 1
+
+# 每个条带的单元格数量，条带是重新生成和压缩的最小单位
+_SEGMENT_CELLS = 16384
+
+# 工作表在压缩包中的位置（只写一个工作表）
+_SHEET_PART = "xl/worksheets/sheet1.xml"
+
+
+class SheetState(NamedTuple):
+    """
+    已写出工作簿的状态
+    
+    Attributes:
+        style_map: 形状为 (高度, 宽度) 的样式索引数组
+        colors: 样式表中的颜色，第i项对应样式索引i+1
+        sheet_name: 工作表名称
+        column_width: 列宽（字符单位）
+        row_height: 行高（磅）
+        band_rows: 每个条带的行数
+        segments: 形状为 (片段数, 3) 的数组，每行为压缩后长度、未压缩长度和CRC32；
+            第一个片段为 sheetData 之前的部分，最后一个为之后的部分，中间为各条带
+        output_bytes: 写出后工作簿的文件大小，用于发现工作簿被其他程序修改
+        output_mtime_ns: 写出后工作簿的修改时间（纳秒）
+    """
+    style_map: np.ndarray
+    colors: List[str]
+    sheet_name: str
+    column_width: float
+    row_height: float
+    band_rows: int
+    segments: np.ndarray
+    output_bytes: int = 0
+    output_mtime_ns: int = 0
+    
+    def matches(self, shape: Tuple[int, int], sheet_name: str, column_width: float, row_height: float) -> bool:
+        """新的转换是否可以在此状态上增量更新"""
+        return (
+            self.style_map.shape == shape
+            and self.sheet_name == sheet_name
+            and self.column_width == column_width
+            and self.row_height == row_height
+        )
+
+
+def state_path(output_path: str) -> str:
+    """状态文件路径（与输出文件同名，扩展名为 .state.npz）"""
+    return f"{os.path.splitext(output_path)[0]}.state.npz"
+
+
+def _compact(style_map: np.ndarray) -> np.ndarray:
+    """用能容纳所有样式索引的最小整数类型保存"""
+    return style_map.astype(np.uint16 if style_map.max(initial=0) < 2 ** 16 else np.uint32)
+
+
+def save_state(output_path: str, state: SheetState) -> SheetState:
+    """
+    保存状态文件，并记录工作簿当前的大小和修改时间
+    
+    Args:
+        output_path: 工作簿路径
+        state: 工作簿状态
+    
+    Returns:
+        记录了文件大小和修改时间的状态
+    """
+    stat = os.stat(output_path)
+    state = state._replace(output_bytes=stat.st_size, output_mtime_ns=stat.st_mtime_ns)
+    meta = {
+        "version": _STATE_VERSION,
+        "sheet_name": state.sheet_name,
+        "column_width": state.column_width,
+        "row_height": state.row_height,
+        "band_rows": state.band_rows,
+        "output_bytes": state.output_bytes,
+        "output_mtime_ns": state.output_mtime_ns,
+    }
+    path = state_path(output_path)
+    with open(path + ".tmp", "wb") as f:
+        np.savez(
+            f,
+            style_map=_compact(state.style_map),
+            colors=np.array(state.colors, dtype="U6"),
+            segments=state.segments,
+            meta=np.array(json.dumps(meta))
+        )
+    os.replace(path + ".tmp", path)
+    return state
+
+
+def load_state(output_path: str) -> Optional[SheetState]:
+    """
+    读取状态文件
+    
+    Args:
+        output_path: 工作簿路径
+    
+    Returns:
+        工作簿状态；状态文件或工作簿不存在、格式不符，或工作簿在写出后
+        被修改过时返回None
+    """
+    path = state_path(output_path)
+    if not os.path.exists(path) or not os.path.exists(output_path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            style_map = data["style_map"].astype(np.int64)
+            colors = data["colors"].tolist()
+            segments = data["segments"].astype(np.int64)
+    except Exception:
+        return None
+    
+    stat = os.stat(output_path)
+    if (
+        meta.get("version") != _STATE_VERSION
+        or stat.st_size != meta["output_bytes"]
+        or stat.st_mtime_ns != meta["output_mtime_ns"]
+    ):
+        return None
+    return SheetState(
+        style_map,
+        colors,
+        meta["sheet_name"],
+        meta["column_width"],
+        meta["row_height"],
+        meta["band_rows"],
+        segments,
+        meta["output_bytes"],
+        meta["output_mtime_ns"]
+    )
+
+
+def _band_segment(style_map: np.ndarray, band: int, band_rows: int) -> Tuple[bytes, int, int]:
+    """生成并压缩第band个条带的行XML"""
+    start = band * band_rows
+    rows = sheet_rows(style_map[start:start + band_rows], row_offset=start)
+    return deflate_segment(b"".join(rows))
+
+
+def _write_sheet(
+    output_path: str,
+    colors: Sequence[str],
+    sheet_name: str,
+    segments: Iterable[Tuple[bytes, int, int]]
+):
+    """写出只有一个由已压缩片段组成的工作表的工作簿"""
+    with RawXlsxWriter(output_path) as writer:
+        writer.register_colors(colors)
+        writer.add_sheet_deflated(sheet_name, segments)
+
+
+def write_workbook(
+    output_path: str,
+    hex_colors: List[str],
+    index_map: np.ndarray,
+    sheet_name: str,
+    column_width: float,
+    row_height: float,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> SheetState:
+    """
+    完整写出可以增量更新的工作簿，并保存状态文件
+    
+    Args:
+        output_path: 工作簿路径
+        hex_colors: 调色板的十六进制颜色字符串列表
+        index_map: 形状为 (高度, 宽度) 的调色板索引数组
+        sheet_name: 工作表名称
+        column_width: 列宽（字符单位）
+        row_height: 行高（磅）
+        progress: 进度回调，参数为已写出的行数和累计压缩后字节数
+    
+    Returns:
+        工作簿状态
+    """
+    height, width = index_map.shape
+    band_rows = max(1, _SEGMENT_CELLS // max(width, 1))
+    # RawXlsxWriter 按调色板顺序为各颜色分配样式索引1、2、3……
+    style_map = index_map.astype(np.int64) + 1
+    table = []
+    
+    def segments():
+        segment = deflate_segment(sheet_header(width, height, column_width, row_height))
+        table.append((len(segment[0]),) + segment[1:])
+        yield segment
+        written = len(segment[0])
+        for band in range(-(-height // band_rows)):
+            segment = _band_segment(style_map, band, band_rows)
+            table.append((len(segment[0]),) + segment[1:])
+            yield segment
+            written += len(segment[0])
+            if progress is not None:
+                progress(min((band + 1) * band_rows, height), written)
+        segment = deflate_segment(b"".join(sheet_footer()), final=True)
+        table.append((len(segment[0]),) + segment[1:])
+        yield segment
+    
+    _write_sheet(output_path, hex_colors, sheet_name, segments())
+    state = SheetState(
+        style_map,
+        list(hex_colors),
+        sheet_name,
+        column_width,
+        row_height,
+        band_rows,
+        np.array(table, dtype=np.int64)
+    )
+    return save_state(output_path, state)
+
+
+def _read_compressed_sheet(output_path: str) -> Optional[bytes]:
+    """读取工作簿中工作表部件的原始压缩字节，不解压"""
+    try:
+        with zipfile.ZipFile(output_path) as archive:
+            info = archive.getinfo(_SHEET_PART)
+    except (KeyError, zipfile.BadZipFile):
+        return None
+    if info.compress_type != zipfile.ZIP_DEFLATED:
+        return None
+    
+    with open(output_path, "rb") as f:
+        f.seek(info.header_offset)
+        header = f.read(zipfile.sizeFileHeader)
+        if len(header) != zipfile.sizeFileHeader or header[:4] != zipfile.stringFileHeader:
+            return None
+        name_length, extra_length = struct.unpack("<HH", header[26:30])
+        f.seek(name_length + extra_length, os.SEEK_CUR)
+        data = f.read(info.compress_size)
+    return data if len(data) == info.compress_size else None
+
+
+def patch_workbook(
+    output_path: str,
+    state: SheetState,
+    hex_colors: List[str],
+    index_map: np.ndarray,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Optional[Tuple[SheetState, int, int]]:
+    """
+    在已有工作簿上增量更新
+    
+    已有颜色保持原来的样式索引，新颜色追加到样式表末尾；只有包含变化
+    单元格的条带重新生成XML并压缩，其余条带原样复制压缩后的字节。
+    工作簿先写入临时文件，完成后替换原文件；progress 抛出异常（如取消转换）时
+    删除临时文件，原来的工作簿和状态文件保持不变。
+    
+    Args:
+        output_path: 工作簿路径
+        state: 工作簿当前的状态（load_state）
+        hex_colors: 新图片调色板的十六进制颜色字符串列表
+        index_map: 新图片的索引图，形状须与状态中的相同
+        progress: 进度回调，每写出一个条带调用一次，参数为已写出的行数和累计压缩后字节数
+    
+    Returns:
+        (新状态, 变化的单元格数, 重新生成的条带数)；工作簿结构与状态不符，
+        或追加颜色后样式表超过Excel上限、无法增量更新时返回None
+    """
+    colors = list(state.colors)
+    style_ids = {color: style_id for style_id, color in enumerate(colors, start=1)}
+    lookup = np.empty(len(hex_colors), dtype=np.int64)
+    for i, color in enumerate(hex_colors):
+        style_id = style_ids.get(color)
+        if style_id is None:
+            colors.append(color)
+            style_id = style_ids[color] = len(colors)
+        lookup[i] = style_id
+    if len(colors) > MAX_EXCEL_STYLES:
+        return None
+    style_map = lookup[index_map] if len(lookup) else index_map.astype(np.int64)
+    
+    changed = style_map != state.style_map
+    changed_cells = int(np.count_nonzero(changed))
+    new_state = state._replace(style_map=style_map, colors=colors)
+    if changed_cells == 0:
+        return new_state, 0, 0
+    changed_bands = np.unique(np.flatnonzero(changed.any(axis=1)) // state.band_rows).tolist()
+    
+    data = _read_compressed_sheet(output_path)
+    offsets = np.concatenate(([0], np.cumsum(state.segments[:, 0]))).tolist()
+    if data is None or len(data) != offsets[-1]:
+        return None
+    
+    view = memoryview(data)
+    segments = [
+        (view[start:stop], length, crc)
+        for start, stop, (_, length, crc) in zip(offsets[:-1], offsets[1:], state.segments.tolist())
+    ]
+    table = state.segments.copy()
+    height = style_map.shape[0]
+    changed_bands = set(changed_bands)
+    
+    def patched_segments():
+        written = 0
+        for index, segment in enumerate(segments):
+            # 片段0为 sheetData 之前的部分，最后一个片段为之后的部分
+            band = index - 1
+            if band in changed_bands:
+                segment = _band_segment(style_map, band, state.band_rows)
+                table[index] = (len(segment[0]),) + segment[1:]
+            yield segment
+            written += len(segment[0])
+            if progress is not None and 0 <= band < len(segments) - 2:
+                progress(min((band + 1) * state.band_rows, height), written)
+    
+    directory = os.path.dirname(os.path.abspath(output_path))
+    fd, temp_path = tempfile.mkstemp(suffix=".xlsx", dir=directory)
+    os.close(fd)
+    try:
+        _write_sheet(temp_path, colors, state.sheet_name, patched_segments())
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    
+    return save_state(output_path, new_state._replace(segments=table)), changed_cells, len(changed_bands)
@@ -0,0 +1,214 @@
+"""
+性能监测模块 - 记录转换各阶段的耗时、内存和数据规模
+"""
+
+import contextlib
+import cProfile
+import json
+import logging
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, TextIO, Union
+
+from .utils import format_file_size
+
+
+class StageRecord(NamedTuple):
+    """
+    一个转换阶段的监测数据
+    
+    Attributes:
+        source: 输入图片路径
+        stage: 阶段名称，如 "load"、"resize"、"render"、"save"
+        wall_seconds: 实际耗时（秒）
+        cpu_seconds: 当前进程的CPU耗时（秒）
+        peak_bytes: 阶段内新增的峰值内存分配（字节），仅在tracemalloc开启时记录；
+            只统计Python和NumPy的分配，不含Pillow内部的图像缓冲区
+        pixels: 阶段处理的像素（单元格）数量
+        colors: 不同颜色数量
+        output_bytes: 输出文件大小（字节）
+    """
+    source: str
+    stage: str
+    wall_seconds: float
+    cpu_seconds: float
+    peak_bytes: Optional[int] = None
+    pixels: Optional[int] = None
+    colors: Optional[int] = None
+    output_bytes: Optional[int] = None
+
+
+# 接收StageRecord的回调函数
+Sink = Callable[[StageRecord], None]
+
+
+class Instrumentation:
+    """
+    转换阶段监测器
+    
+    每个阶段结束时生成一条StageRecord并依次交给所有输出端（sink）。
+    没有输出端时不做任何计时，开销可以忽略。峰值内存依赖tracemalloc，
+    由调用方决定是否开启（开启后转换会明显变慢）。
+    """
+    
+    def __init__(self, sinks: Iterable[Sink] = ()):
+        """
+        初始化监测器
+        
+        Args:
+            sinks: 输出端列表，任何接收StageRecord的可调用对象都可以作为输出端
+        """
+        self.sinks: List[Sink] = list(sinks)
+    
+    def add_sink(self, sink: Sink):
+        """添加输出端"""
+        self.sinks.append(sink)
+    
+    @contextlib.contextmanager
+    def stage(self, name: str, source: str = "", **fields) -> Iterator[Dict]:
+        """
+        记录一个阶段
+        
+        with语句返回的字典可以在阶段内补充pixels、colors、output_bytes等字段。
+        
+        Args:
+            name: 阶段名称
+            source: 输入图片路径
+            **fields: StageRecord的其他字段
+        """
+        if not self.sinks:
+            yield fields
+            return
+        
+        tracing = tracemalloc.is_tracing() and hasattr(tracemalloc, "reset_peak")
+        if tracing:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        
+        yield fields
+        
+        record = StageRecord(
+            source,
+            name,
+            wall_seconds=time.perf_counter() - wall_start,
+            cpu_seconds=time.process_time() - cpu_start,
+            peak_bytes=tracemalloc.get_traced_memory()[1] - baseline if tracing else None,
+            **fields
+        )
+        for sink in self.sinks:
+            sink(record)
+
+
+class JsonLinesSink:
+    """将每条记录作为一行JSON追加到文件"""
+    
+    def __init__(self, target: Union[str, TextIO]):
+        """
+        Args:
+            target: 文件路径（每条记录以追加模式写入）或已打开的文本文件对象
+        """
+        self.target = target
+    
+    def __call__(self, record: StageRecord):
+        line = json.dumps(record._asdict(), ensure_ascii=False) + "\n"
+        if isinstance(self.target, str):
+            with open(self.target, "a", encoding="utf-8") as f:
+                f.write(line)
+        else:
+            self.target.write(line)
+            self.target.flush()
+
+
+class LoggingSink:
+    """通过logging输出记录，完整字段放在日志记录的 stage_record 属性中"""
+    
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO):
+        """
+        Args:
+            logger: 日志记录器，默认为 "img2excel"
+            level: 日志级别
+        """
+        self.logger = logger or logging.getLogger("img2excel")
+        self.level = level
+    
+    def __call__(self, record: StageRecord):
+        self.logger.log(
+            self.level,
+            "阶段 %s: 耗时 %.4f 秒, CPU %.4f 秒",
+            record.stage,
+            record.wall_seconds,
+            record.cpu_seconds,
+            extra={"stage_record": record._asdict()}
+        )
+
+
+class ProfileCollector:
+    """在内存中收集记录，用于转换结束后打印分阶段耗时表"""
+    
+    def __init__(self):
+        self.records: List[StageRecord] = []
+    
+    def __call__(self, record: StageRecord):
+        self.records.append(record)
+    
+    def format_table(self) -> str:
+        """
+        生成分阶段耗时表
+        
+        Returns:
+            表格字符串
+        """
+        total = sum(r.wall_seconds for r in self.records) or 1.0
+        lines = [
+            f"{'阶段':<10}  {'耗时(秒)':>7}  {'占比':>4}  {'CPU(秒)':>8}  {'峰值内存':>6}  "
+            f"{'像素数':>7}  {'颜色数':>5}  {'输出大小':>6}",
+            "-" * 80,
+        ]
+        for r in self.records:
+            peak = format_file_size(r.peak_bytes) if r.peak_bytes is not None else "-"
+            output = format_file_size(r.output_bytes) if r.output_bytes is not None else "-"
+            lines.append(
+                f"{r.stage:<12}  {r.wall_seconds:>9.4f}  {r.wall_seconds / total:>6.1%}  "
+                f"{r.cpu_seconds:>8.4f}  {peak:>10}  "
+                f"{r.pixels if r.pixels is not None else '-':>10}  "
+                f"{r.colors if r.colors is not None else '-':>8}  {output:>10}"
+            )
+        lines.append("-" * 80)
+        lines.append(
+            f"{'合计':<10}  {sum(r.wall_seconds for r in self.records):>9.4f}  {'':>6}  "
+            f"{sum(r.cpu_seconds for r in self.records):>8.4f}"
+        )
+        return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def profile_dump(prefix: str, top: int = 30) -> Iterator[None]:
+    """
+    使用cProfile分析代码块，并在tracemalloc开启时保存内存分配快照
+    
+    生成 <prefix>.prof（可用 pstats 或 snakeviz 查看）和
+    <prefix>.tracemalloc.txt（按代码行统计的内存分配前 top 项）。
+    
+    Args:
+        prefix: 输出文件路径前缀
+        top: 内存分配快照保留的条目数
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        
+        # 先保存内存快照，避免把写出cProfile结果本身的分配计算在内
+        if tracemalloc.is_tracing():
+            statistics = tracemalloc.take_snapshot().statistics("lineno")
+            with open(f"{prefix}.tracemalloc.txt", "w", encoding="utf-8") as f:
+                for stat in statistics[:top]:
+                    f.write(f"{stat}\n")
+            print(f"内存分配快照已保存: {prefix}.tracemalloc.txt")
+        
+        profiler.dump_stats(f"{prefix}.prof")
+        print(f"cProfile结果已保存: {prefix}.prof")
@@ -0,0 +1,110 @@
+"""
+缩放结果缓存模块 - 在同一实例的多次转换之间复用缩放后的图片和索引图
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Hashable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .palette import ColorIndex
+
+
+# 每个实例默认最多缓存的字节数
+DEFAULT_MEMO_BYTES = 64 * 1024 * 1024
+
+
+def _nbytes(value) -> int:
+    """估算缓存值占用的内存"""
+    if isinstance(value, Image.Image):
+        return value.width * value.height * len(value.getbands())
+    if isinstance(value, ColorIndex):
+        return value.index_map.nbytes + value.palette.nbytes
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    raise TypeError(f"不支持缓存的类型: {type(value).__name__}")
+
+
+class ImageMemo:
+    """
+    总大小有上限、按最近使用（LRU）淘汰的内存缓存
+    
+    保存解码后的中间图片、缩放后的图片和索引图；
+    单个值超过容量上限时不缓存。线程安全。
+    """
+    
+    def __init__(self, max_bytes: int = DEFAULT_MEMO_BYTES):
+        """
+        Args:
+            max_bytes: 容量上限（字节），0表示不缓存
+        """
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[object, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: Hashable) -> Optional[object]:
+        """
+        查找缓存，命中时将条目标记为最近使用
+        
+        Args:
+            key: 缓存键
+        
+        Returns:
+            缓存的值，未命中时为None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, key: Hashable, value: object):
+        """
+        存入缓存，超出容量上限时淘汰最久未使用的条目
+        
+        Args:
+            key: 缓存键
+            value: PIL图片、ColorIndex或NumPy数组
+        """
+        size = _nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+    
+    def images(self) -> Iterator[Tuple[Hashable, Image.Image]]:
+        """当前缓存中的所有图片（键, 图片），不影响淘汰顺序"""
+        with self._lock:
+            entries: List[Tuple[Hashable, object]] = [
+                (key, value) for key, (value, _) in self._entries.items()
+            ]
+        return ((key, value) for key, value in entries if isinstance(value, Image.Image))
+    
+    def touch(self, key: Hashable):
+        """将条目标记为最近使用"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
@@ -0,0 +1,260 @@
+"""
+调色板模块 - 向量化的像素到颜色索引转换
+"""
+
+from typing import List, NamedTuple
+import numpy as np
+from PIL import Image
+
+
+# 支持的调色板量化方法
+QUANTIZE_METHODS = ("median-cut", "kmeans", "websafe")
+
+# Pillow量化最多支持256种颜色
+MAX_QUANTIZE_COLORS = 256
+
+# Excel单个工作簿中不同单元格样式数量的上限（约64000）
+MAX_EXCEL_STYLES = 64000
+
+# kmeans方法在中位切分结果上的迭代次数
+_KMEANS_ITERATIONS = 8
+
+# 逐条带统计颜色时每个条带的像素数
+_SCAN_PIXELS = 1 << 20
+
+
+class ColorIndex(NamedTuple):
+    """
+    图片的调色板表示
+    
+    Attributes:
+        palette: 形状为 (颜色数, 3) 的uint8数组，按打包颜色值升序排列
+        hex_colors: 与palette一一对应的十六进制颜色字符串（如 "FF0000"）
+        index_map: 形状为 (高度, 宽度) 的数组，每个元素为palette中的索引
+    """
+    palette: np.ndarray
+    hex_colors: List[str]
+    index_map: np.ndarray
+    
+    @property
+    def color_count(self) -> int:
+        """不同颜色数量"""
+        return len(self.hex_colors)
+    
+    @property
+    def size(self):
+        """(宽度, 高度) 元组，与PIL图片的size一致"""
+        height, width = self.index_map.shape
+        return width, height
+    
+    def region(self, top: int, left: int, height: int, width: int) -> np.ndarray:
+        """索引图中从 (top, left) 开始、大小为 height x width 的区域"""
+        return self.index_map[top:top + height, left:left + width]
+
+
+def pack_rgb(pixels: np.ndarray) -> np.ndarray:
+    """
+    将RGB像素数组打包为24位整数
+    
+    Args:
+        pixels: 形状为 (..., 3) 的uint8数组
+    
+    Returns:
+        形状为 (...) 的uint32数组，值为 (r << 16) | (g << 8) | b
+    """
+    pixels = pixels.astype(np.uint32)
+    return (pixels[..., 0] << 16) | (pixels[..., 1] << 8) | pixels[..., 2]
+
+
+def unpack_rgb(packed: np.ndarray) -> np.ndarray:
+    """
+    将24位整数颜色解包为RGB数组
+    
+    Args:
+        packed: uint32颜色数组
+    
+    Returns:
+        形状为 (..., 3) 的uint8数组
+    """
+    packed = np.asarray(packed, dtype=np.uint32)
+    return np.stack(
+        [(packed >> 16) & 0xFF, (packed >> 8) & 0xFF, packed & 0xFF], axis=-1
+    ).astype(np.uint8)
+
+
+def _index_dtype(color_count: int):
+    """选择能容纳全部颜色索引的最小整数类型"""
+    return np.uint16 if color_count <= np.iinfo(np.uint16).max + 1 else np.uint32
+
+
+def build_color_index(image: Image.Image) -> ColorIndex:
+    """
+    将图片一次性转换为调色板和索引图
+    
+    Args:
+        image: PIL图片对象
+    
+    Returns:
+        ColorIndex对象
+    """
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    
+    pixels = np.asarray(image)
+    height, width = pixels.shape[:2]
+    
+    colors, inverse = np.unique(pack_rgb(pixels).ravel(), return_inverse=True)
+    index_map = inverse.reshape(height, width).astype(_index_dtype(len(colors)))
+    
+    # 只为不同颜色生成十六进制字符串，与 rgb_to_hex 的格式一致
+    hex_colors = [f"{color:06X}" for color in colors.tolist()]
+    
+    return ColorIndex(unpack_rgb(colors), hex_colors, index_map)
+
+
+class LazyColorIndex:
+    """
+    不保存整张索引图的调色板表示
+    
+    调色板逐条带扫描图片得到，与 build_color_index 的结果相同；索引图只在
+    region() 请求时为该区域建立，峰值内存与区域大小而不是图片大小成正比。
+    提供与 ColorIndex 相同的 palette、hex_colors、color_count、size 和 region。
+    """
+    
+    def __init__(self, image: Image.Image):
+        """
+        Args:
+            image: PIL图片对象
+        """
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        self.image = image
+        
+        width, height = image.size
+        band_rows = max(1, _SCAN_PIXELS // width)
+        colors = np.zeros(0, dtype=np.uint32)
+        for top in range(0, height, band_rows):
+            band = np.asarray(image.crop((0, top, width, min(top + band_rows, height))))
+            colors = np.union1d(colors, np.unique(pack_rgb(band)))
+        
+        self._colors = colors
+        self._dtype = _index_dtype(len(colors))
+        self.palette = unpack_rgb(colors)
+        self.hex_colors = [f"{color:06X}" for color in colors.tolist()]
+    
+    @property
+    def color_count(self) -> int:
+        """不同颜色数量"""
+        return len(self.hex_colors)
+    
+    @property
+    def size(self):
+        """(宽度, 高度) 元组"""
+        return self.image.size
+    
+    def region(self, top: int, left: int, height: int, width: int) -> np.ndarray:
+        """
+        为图片中的一个区域建立索引图
+        
+        Args:
+            top: 起始像素行
+            left: 起始像素列
+            height: 区域高度
+            width: 区域宽度
+        
+        Returns:
+            形状为 (height, width) 的索引数组，索引与整张图片的调色板一致
+        """
+        pixels = np.asarray(self.image.crop((left, top, left + width, top + height)))
+        return np.searchsorted(self._colors, pack_rgb(pixels)).astype(self._dtype)
+
+
+def _websafe_palette_image() -> Image.Image:
+    """生成包含216种Web安全色的调色板图片"""
+    levels = range(0, 256, 51)
+    palette = [
+        channel
+        for r in levels for g in levels for b in levels
+        for channel in (r, g, b)
+    ]
+    palette_image = Image.new('P', (1, 1))
+    palette_image.putpalette(palette)
+    return palette_image
+
+
+def quantize_palette(
+    image: Image.Image,
+    colors: int = MAX_QUANTIZE_COLORS,
+    method: str = "median-cut"
+) -> Image.Image:
+    """
+    为图片生成量化调色板
+    
+    Args:
+        image: RGB模式的PIL图片对象
+        colors: 目标颜色数量（1-256，websafe方法忽略此参数）
+        method: 量化方法，见 quantize_image
+    
+    Returns:
+        P模式的图片，其调色板可以传给 apply_palette；
+        中位切分和k-means方法返回的就是量化后的图片本身
+    """
+    if method not in QUANTIZE_METHODS:
+        raise ValueError(f"不支持的量化方法: {method}（可选: {', '.join(QUANTIZE_METHODS)}）")
+    
+    if method == "websafe":
+        return _websafe_palette_image()
+    
+    if not 1 <= colors <= MAX_QUANTIZE_COLORS:
+        raise ValueError(f"颜色数量必须在1到{MAX_QUANTIZE_COLORS}之间: {colors}")
+    
+    kmeans = _KMEANS_ITERATIONS if method == "kmeans" else 0
+    return image.quantize(colors, method=Image.Quantize.MEDIANCUT, kmeans=kmeans)
+
+
+def apply_palette(image: Image.Image, palette_image: Image.Image, dither: bool = False) -> Image.Image:
+    """
+    将图片映射到给定调色板中最接近的颜色
+    
+    Args:
+        image: PIL图片对象
+        palette_image: quantize_palette 返回的调色板图片
+        dither: 是否使用Floyd-Steinberg抖动
+    
+    Returns:
+        量化后的RGB图片
+    """
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    dither_mode = Image.Dither.FLOYDSTEINBERG if dither else Image.Dither.NONE
+    return image.quantize(palette=palette_image, dither=dither_mode).convert('RGB')
+
+
+def quantize_image(
+    image: Image.Image,
+    colors: int = MAX_QUANTIZE_COLORS,
+    method: str = "median-cut",
+    dither: bool = False
+) -> Image.Image:
+    """
+    将图片量化为有限数量的颜色
+    
+    Args:
+        image: PIL图片对象
+        colors: 目标颜色数量（1-256，websafe方法忽略此参数）
+        method: 量化方法，"median-cut"（中位切分）、"kmeans"（在中位切分
+            基础上做k-means迭代优化）或 "websafe"（固定216色Web安全调色板）
+        dither: 是否使用Floyd-Steinberg抖动
+    
+    Returns:
+        量化后的RGB图片
+    """
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    
+    palette_image = quantize_palette(image, colors, method)
+    if method != "websafe" and not dither:
+        return palette_image.convert('RGB')
+    
+    # 使用得到的调色板重新映射，以便应用抖动
+    return apply_palette(image, palette_image, dither)
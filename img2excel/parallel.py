@@ -0,0 +1,51 @@
+"""
+并行工具模块 - 保持顺序、限制在途任务数量的进程池映射
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional
+
+
+def default_jobs() -> int:
+    """默认并行进程数（CPU核心数）"""
+    return os.cpu_count() or 1
+
+
+def ordered_map(
+    fn: Callable,
+    tasks: Iterable[tuple],
+    jobs: Optional[int] = None,
+    window: Optional[int] = None
+) -> Iterator:
+    """
+    在进程池中执行任务，并按提交顺序逐个返回结果
+    
+    与 Executor.map 不同，任务按需提交，同时在途的任务最多为window个，
+    因此任务参数和结果占用的内存不会随任务总数增长。
+    
+    Args:
+        fn: 可被pickle的模块级函数
+        tasks: 参数元组的可迭代对象
+        jobs: 并行进程数，默认为CPU核心数；为1时在当前进程中顺序执行
+        window: 最多同时在途的任务数，默认为进程数的两倍
+    
+    Returns:
+        按任务顺序排列的结果迭代器
+    """
+    jobs = jobs or default_jobs()
+    if jobs <= 1:
+        for args in tasks:
+            yield fn(*args)
+        return
+    
+    window = window or jobs * 2
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        for args in tasks:
+            pending.append(executor.submit(fn, *args))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
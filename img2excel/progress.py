@@ -0,0 +1,127 @@
+"""
+进度与取消模块 - 转换进度回调和协作式取消
+"""
+
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+
+
+class ConversionCancelled(Exception):
+    """
+    转换被取消令牌中止
+    
+    Attributes:
+        output_removed: 是否删除了已写出一部分的输出文件；没有写出任何内容
+            （如openpyxl引擎在保存前取消）或输出到文件对象时为False
+    """
+    output_removed = False
+
+
+class Progress(NamedTuple):
+    """
+    转换进度
+    
+    Attributes:
+        stage: 当前阶段，"render"（逐行渲染）或 "save"（写出文件）
+        rows_done: 已渲染的行数
+        rows_total: 总行数
+        bytes_written: 已写出的字节数；原生XML引擎为已生成的工作表XML字节数，
+            其他引擎在保存完成后为输出文件大小，未知时为None
+    """
+    stage: str
+    rows_done: int
+    rows_total: int
+    bytes_written: Optional[int] = None
+    
+    @property
+    def fraction(self) -> float:
+        """完成比例（0~1）"""
+        return self.rows_done / self.rows_total if self.rows_total else 1.0
+
+
+# 接收Progress的回调函数
+ProgressCallback = Callable[[Progress], None]
+
+
+class CancelToken:
+    """
+    取消令牌
+    
+    由其他线程（如GUI的取消按钮）调用 cancel()，转换在下一次
+    检查时抛出ConversionCancelled并删除未完成的输出文件。
+    """
+    
+    def __init__(self):
+        self._event = threading.Event()
+    
+    def cancel(self):
+        """请求取消"""
+        self._event.set()
+    
+    @property
+    def cancelled(self) -> bool:
+        """是否已请求取消"""
+        return self._event.is_set()
+
+
+class ProgressReporter:
+    """
+    在渲染循环中报告进度、检查取消
+    
+    每行调用一次 update 的开销只有一次时间读取和比较；回调最多每
+    min_interval 秒调用一次（最后一行总会报告），不会拖慢渲染。
+    """
+    
+    def __init__(
+        self,
+        callback: Optional[ProgressCallback] = None,
+        cancel: Optional[CancelToken] = None,
+        rows_total: int = 0,
+        min_interval: float = 0.1
+    ):
+        """
+        初始化进度报告器
+        
+        Args:
+            callback: 进度回调函数，None表示不报告进度
+            cancel: 取消令牌，None表示不可取消
+            rows_total: 总行数
+            min_interval: 两次回调之间的最短间隔（秒）
+        """
+        self.callback = callback
+        self.cancel = cancel
+        self.rows_total = rows_total
+        self.min_interval = min_interval
+        self._last_report = 0.0
+    
+    def check(self):
+        """已请求取消时抛出ConversionCancelled"""
+        if self.cancel is not None and self.cancel.cancelled:
+            raise ConversionCancelled("转换已取消")
+    
+    def update(
+        self,
+        rows_done: int,
+        bytes_written: Optional[int] = None,
+        stage: str = "render",
+        force: bool = False
+    ):
+        """
+        报告进度并检查取消
+        
+        Args:
+            rows_done: 已完成的行数
+            bytes_written: 已写出的字节数
+            stage: 当前阶段
+            force: 忽略限流，立即调用回调
+        """
+        self.check()
+        if self.callback is None:
+            return
+        
+        now = time.perf_counter()
+        if not force and rows_done < self.rows_total and now - self._last_report < self.min_interval:
+            return
+        self._last_report = now
+        self.callback(Progress(stage, rows_done, self.rows_total, bytes_written))
@@ -0,0 +1,132 @@
+"""
+多尺寸输出模块 - 将同一张图片的多个尺寸写为一个工作簿的多个工作表或多个工作簿
+"""
+
+import os
+from typing import List, Optional, Sequence
+
+from .palette import ColorIndex
+from .regions import find_regions
+from .xlsx_writer import RawXlsxWriter
+
+
+# 支持的多尺寸输出方式：每个尺寸一个工作表，或每个尺寸一个工作簿
+PYRAMID_LAYOUTS = ("sheets", "workbooks")
+
+# Excel工作表名称的最大长度
+_MAX_SHEET_NAME = 31
+
+
+def parse_pyramid_sizes(text: str) -> List[int]:
+    """
+    解析尺寸列表字符串
+    
+    Args:
+        text: 逗号分隔的宽度（单元格数量），如 "32,64,128,256"
+    
+    Returns:
+        去重后的宽度列表，保持原顺序
+    """
+    try:
+        sizes = [int(part) for part in text.split(",") if part.strip()]
+    except ValueError:
+        raise ValueError(f"无效的尺寸列表: {text}（格式应为逗号分隔的宽度，如 32,64,128）")
+    if not sizes:
+        raise ValueError(f"尺寸列表为空: {text}")
+    if any(size < 1 for size in sizes):
+        raise ValueError(f"尺寸必须大于0: {text}")
+    return list(dict.fromkeys(sizes))
+
+
+def level_name(base: str, width: int) -> str:
+    """生成某个尺寸的工作表名称，如 PixelArt_64"""
+    suffix = f"_{width}"
+    return base[:_MAX_SHEET_NAME - len(suffix)] + suffix
+
+
+def level_path(output_path: str, width: int) -> str:
+    """生成某个尺寸的工作簿路径，如 output_64.xlsx"""
+    return f"{os.path.splitext(output_path)[0]}_{width}.xlsx"
+
+
+def write_pyramid(
+    levels: Sequence[ColorIndex],
+    output_path: str,
+    column_width: float,
+    row_height: float,
+    layout: str = "sheets",
+    sheet_name: str = "PixelArt",
+    merge: Optional[str] = None
+) -> dict:
+    """
+    将多个尺寸的图片写出
+    
+    "sheets" 方式下所有工作表共用一个样式表，相同颜色在各尺寸之间
+    只注册一次。
+    
+    Args:
+        levels: 各尺寸的调色板和索引图，按输出顺序排列
+        output_path: 输出Excel文件路径；"workbooks"方式下作为文件名前缀
+        column_width: 列宽（字符单位）
+        row_height: 行高（磅）
+        layout: "sheets"（每个尺寸一个工作表）或 "workbooks"（每个尺寸一个工作簿）
+        sheet_name: 工作表名称前缀
+        merge: 合并模式，None表示不合并
+    
+    Returns:
+        描述各尺寸输出位置的字典
+    """
+    if layout not in PYRAMID_LAYOUTS:
+        raise ValueError(f"不支持的多尺寸输出方式: {layout}（可选: {', '.join(PYRAMID_LAYOUTS)}）")
+    
+    entries = []
+    styles = 0
+    
+    def level_regions(color_index):
+        return find_regions(color_index.index_map, merge) if merge else None
+    
+    if layout == "sheets":
+        with RawXlsxWriter(output_path) as writer:
+            for color_index in levels:
+                width, height = color_index.size
+                name = level_name(sheet_name, width)
+                writer.add_sheet(
+                    name,
+                    color_index.hex_colors,
+                    color_index.index_map,
+                    column_width,
+                    row_height,
+                    level_regions(color_index)
+                )
+                entries.append({
+                    "width": width,
+                    "height": height,
+                    "colors": color_index.color_count,
+                    "sheet": name,
+                    "file": os.path.basename(output_path)
+                })
+        styles = writer.color_count
+    else:
+        for color_index in levels:
+            width, height = color_index.size
+            path = level_path(output_path, width)
+            with RawXlsxWriter(path) as writer:
+                writer.add_sheet(
+                    sheet_name,
+                    color_index.hex_colors,
+                    color_index.index_map,
+                    column_width,
+                    row_height,
+                    level_regions(color_index)
+                )
+            styles = max(styles, writer.color_count)
+            entries.append({
+                "width": width,
+                "height": height,
+                "colors": color_index.color_count,
+                "sheet": sheet_name,
+                "file": os.path.basename(path),
+                "bytes": os.path.getsize(path)
+            })
+    
+    return {"layout": layout, "styles": styles, "levels": entries}
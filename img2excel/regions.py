@@ -0,0 +1,149 @@
+"""
+区域合并模块 - 查找索引图中相同颜色的行程和矩形
+"""
+
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+import numpy as np
+from openpyxl.utils import get_column_letter
+
+
+# 支持的合并模式
+MERGE_MODES = ("rows", "rects")
+
+
+class Region(NamedTuple):
+    """
+    相同颜色的矩形区域（坐标从0开始）
+    
+    Attributes:
+        top: 首行
+        left: 首列
+        height: 行数
+        width: 列数
+    """
+    top: int
+    left: int
+    height: int
+    width: int
+    
+    @property
+    def cell_count(self) -> int:
+        """区域包含的单元格数量"""
+        return self.height * self.width
+    
+    @property
+    def ref(self) -> str:
+        """Excel区域引用，如 "A1:C2" """
+        first = f"{get_column_letter(self.left + 1)}{self.top + 1}"
+        last = f"{get_column_letter(self.left + self.width)}{self.top + self.height}"
+        return f"{first}:{last}"
+
+
+def _row_runs(row: np.ndarray) -> Iterator[Tuple[int, int, int]]:
+    """
+    查找一行中相同颜色的最长行程
+    
+    Args:
+        row: 一维调色板索引数组
+    
+    Returns:
+        (起始列, 长度, 调色板索引) 的迭代器
+    """
+    starts = np.concatenate(([0], np.flatnonzero(row[1:] != row[:-1]) + 1))
+    widths = np.diff(np.append(starts, len(row)))
+    return zip(starts.tolist(), widths.tolist(), row[starts].tolist())
+
+
+def find_row_runs(index_map: np.ndarray) -> List[Region]:
+    """
+    查找每一行中相同颜色的最长水平行程
+    
+    Args:
+        index_map: 形状为 (高度, 宽度) 的调色板索引数组
+    
+    Returns:
+        Region列表，按行优先顺序排列
+    """
+    regions = []
+    for y in range(index_map.shape[0]):
+        for left, width, _ in _row_runs(index_map[y]):
+            regions.append(Region(y, left, 1, width))
+    return regions
+
+
+def find_rectangles(index_map: np.ndarray) -> List[Region]:
+    """
+    查找相同颜色的矩形区域
+    
+    先求出每行的最长水平行程，再将与上一行位置、长度和颜色完全相同的
+    行程向下合并，得到覆盖整张图片、互不重叠的矩形。
+    
+    Args:
+        index_map: 形状为 (高度, 宽度) 的调色板索引数组
+    
+    Returns:
+        Region列表
+    """
+    regions = []
+    # (起始列, 长度, 调色板索引) -> [首行, 行数]
+    open_rects = {}
+    
+    for y in range(index_map.shape[0]):
+        next_rects = {}
+        for run in _row_runs(index_map[y]):
+            rect = open_rects.pop(run, None)
+            if rect is None:
+                rect = [y, 0]
+            rect[1] += 1
+            next_rects[run] = rect
+        
+        # 没有在本行延续的矩形到此结束
+        for (left, width, _), (top, height) in open_rects.items():
+            regions.append(Region(top, left, height, width))
+        open_rects = next_rects
+    
+    for (left, width, _), (top, height) in open_rects.items():
+        regions.append(Region(top, left, height, width))
+    
+    return regions
+
+
+def find_regions(index_map: np.ndarray, mode: str) -> List[Region]:
+    """
+    按指定模式查找相同颜色的区域
+    
+    Args:
+        index_map: 形状为 (高度, 宽度) 的调色板索引数组
+        mode: 合并模式，"rows"（水平行程）或 "rects"（矩形）
+    
+    Returns:
+        Region列表
+    """
+    if mode == "rows":
+        return find_row_runs(index_map)
+    if mode == "rects":
+        return find_rectangles(index_map)
+    raise ValueError(f"不支持的合并模式: {mode}（可选: {', '.join(MERGE_MODES)}）")
+
+
+def count_regions(regions: Optional[List[Region]]) -> Optional[int]:
+    """合并区域数量（即设置样式的单元格数），不合并（regions为None）时返回None"""
+    return len(regions) if regions is not None else None
+
+
+def anchor_mask(regions: List[Region], shape: Tuple[int, int]) -> np.ndarray:
+    """
+    生成区域左上角单元格的掩码，只有这些单元格需要设置样式
+    
+    Args:
+        regions: Region列表
+        shape: 索引图形状 (高度, 宽度)
+    
+    Returns:
+        布尔数组，区域左上角为True
+    """
+    mask = np.zeros(shape, dtype=bool)
+    if regions:
+        tops, lefts = np.array([(r.top, r.left) for r in regions]).T
+        mask[tops, lefts] = True
+    return mask
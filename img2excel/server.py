@@ -0,0 +1,497 @@
+"""
+转换服务模块 - 常驻的本地HTTP转换服务
+
+服务启动时预热一个进程池，之后每次转换都不需要重新启动Python、
+导入Pillow和openpyxl。请求先经过准入控制：排队的请求超过上限时
+立即返回503，而不是无限堆积。
+
+接口:
+    POST /convert   请求体为图片内容，或用 ?path= 指定服务器上的图片文件；
+                    其余查询参数与 convert_to_excel 相同（如 ?max_width=100&engine=xml）。
+                    指定 ?output= 时写入该路径并返回JSON，否则直接返回xlsx文件。
+                    path 和 output 只能指向服务根目录（root）内的文件，
+                    未配置根目录时只接受上传
+    GET  /metrics   Prometheus文本格式的计数器、队列深度和延迟直方图
+    GET  /health    健康检查
+"""
+
+import contextlib
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from urllib.parse import parse_qs, urlparse
+
+from .core import ImageToExcel
+from .estimate import parse_budget, parse_colors
+
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# 默认上传大小上限
+DEFAULT_MAX_UPLOAD = 50 * 1024 * 1024
+
+# 延迟直方图的桶边界（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _parse_bool(text: str) -> bool:
+    """解析布尔查询参数"""
+    value = text.strip().lower()
+    if value in ("1", "true", "yes", "on"):
+        return True
+    if value in ("0", "false", "no", "off"):
+        return False
+    raise ValueError(f"无效的布尔值: {text}")
+
+
+# 允许通过查询参数传入的 convert_to_excel 参数及其类型
+OPTION_TYPES = {
+    "cell_width": int,
+    "cell_height": int,
+    "max_width": int,
+    "max_height": int,
+    "keep_ratio": _parse_bool,
+    "sheet_name": str,
+    "engine": str,
+    "colors": parse_colors,
+    "quantize": str,
+    "dither": _parse_bool,
+    "merge": str,
+    "budget": parse_budget,
+}
+
+
+class ServiceBusy(Exception):
+    """排队的请求已达上限"""
+
+
+class Histogram:
+    """累积直方图（Prometheus histogram语义），线程安全"""
+    
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float):
+        """记录一个观测值"""
+        with self._lock:
+            self.count += 1
+            self.total += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+    
+    def render(self, name: str, help_text: str) -> List[str]:
+        """生成Prometheus文本格式的行"""
+        with self._lock:
+            lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for bound, count in zip(self.buckets, self.counts):
+                lines.append(f'{name}_bucket{{le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{le="+Inf"}} {self.count}')
+            lines.append(f"{name}_sum {self.total:.6f}")
+            lines.append(f"{name}_count {self.count}")
+        return lines
+
+
+def _warm_up():
+    """工作进程初始化：提前导入重量级依赖"""
+    import numpy  # noqa: F401
+    import openpyxl  # noqa: F401
+    from PIL import Image
+    
+    Image.init()
+
+
+def _convert_job(
+    source: Union[str, bytes],
+    output_path: Optional[str],
+    options: dict,
+    submitted: float
+) -> dict:
+    """
+    在工作进程中执行一次转换
+    
+    Args:
+        source: 输入图片路径，或上传的图片内容
+        output_path: 输出Excel文件路径，None表示在内存中生成并随结果返回
+        options: convert_to_excel 的参数
+        submitted: 提交时间（time.time()），用于计算排队时间
+    
+    Returns:
+        包含排队时间、转换耗时和转换统计信息的字典；
+        未指定输出路径时 "content" 为XLSX文件内容
+    """
+    started = time.time()
+    if isinstance(source, bytes):
+        converter = ImageToExcel.from_bytes(source, name="<upload>")
+    else:
+        converter = ImageToExcel(source)
+    # 转换日志来自多个工作进程，会互相交错，这里直接丢弃
+    with contextlib.redirect_stdout(io.StringIO()):
+        if output_path is None:
+            content = converter.convert_to_bytes(**options)
+        else:
+            converter.convert_to_excel(output_path, **options)
+            content = None
+    return {
+        "queue_seconds": max(0.0, started - submitted),
+        "convert_seconds": time.time() - started,
+        "stats": converter.stats,
+        "content": content,
+    }
+
+
+class ConversionService:
+    """
+    预热的进程池加上有上限的请求队列
+    
+    同时在途的请求（正在转换的和排队等待的）最多为 workers + max_queue 个，
+    超出时 slot() 抛出ServiceBusy。工作进程异常退出（如被系统终止）使进程池
+    损坏时重建进程池，之后的请求不受影响。
+    """
+    
+    def __init__(self, workers: int = 2, max_queue: int = 16):
+        """
+        初始化服务并启动进程池
+        
+        Args:
+            workers: 工作进程数
+            max_queue: 所有工作进程都忙时最多排队的请求数
+        """
+        self.workers = workers
+        self.max_queue = max_queue
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_warm_up)
+        # 立即启动并预热所有工作进程，而不是等第一个请求到来
+        for future in [self.executor.submit(_warm_up) for _ in range(workers)]:
+            future.result()
+        
+        self.pending = 0
+        self.restarts = 0
+        self.counters: Dict[str, int] = {"ok": 0, "error": 0, "rejected": 0}
+        self.request_latency = Histogram()
+        self.queue_latency = Histogram()
+        self.convert_latency = Histogram()
+        self._lock = threading.Lock()
+    
+    def _admit(self):
+        """准入控制，超过上限时抛出ServiceBusy"""
+        with self._lock:
+            if self.pending >= self.workers + self.max_queue:
+                self.counters["rejected"] += 1
+                raise ServiceBusy(f"排队的请求已达上限（{self.max_queue}）")
+            self.pending += 1
+    
+    def _release(self, status: str):
+        with self._lock:
+            self.pending -= 1
+            self.counters[status] += 1
+    
+    @contextlib.contextmanager
+    def slot(self):
+        """
+        占用一个请求名额，退出时释放并记录结果
+        
+        在读取上传内容之前调用，服务繁忙时可以尽早拒绝请求；转换完成后立即退出，
+        不要在名额内发送响应。with语句返回的字典中 status 默认为 "error"，
+        请求成功时由调用方改为 "ok"。
+        """
+        self._admit()
+        started = time.perf_counter()
+        outcome = {"status": "error"}
+        try:
+            yield outcome
+        finally:
+            self._release(outcome["status"])
+            self.request_latency.observe(time.perf_counter() - started)
+    
+    def _restart_executor(self, broken: ProcessPoolExecutor):
+        """用新的进程池替换已损坏的进程池（多个请求同时发现时只替换一次）"""
+        with self._lock:
+            if self.executor is not broken:
+                return
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_up)
+            self.restarts += 1
+        broken.shutdown(wait=False)
+    
+    def convert(self, source: Union[str, bytes], output_path: Optional[str], options: dict) -> dict:
+        """
+        在工作进程中转换，阻塞直到完成（须在 slot() 内调用）
+        
+        进程池在提交前已经损坏时（之前的请求使工作进程退出），重建进程池后重新提交；
+        本次转换进行中工作进程退出时，重建进程池后抛出BrokenProcessPool。
+        
+        Args:
+            source: 输入图片路径，或上传的图片内容
+            output_path: 输出Excel文件路径，None表示返回XLSX文件内容
+            options: convert_to_excel 的参数
+        
+        Returns:
+            _convert_job 的结果字典
+        """
+        executor = self.executor
+        try:
+            future = executor.submit(_convert_job, source, output_path, options, time.time())
+        except BrokenProcessPool:
+            self._restart_executor(executor)
+            executor = self.executor
+            future = executor.submit(_convert_job, source, output_path, options, time.time())
+        
+        try:
+            result = future.result()
+        except BrokenProcessPool:
+            # 可能正是这个请求使工作进程退出（如内存耗尽），不重试
+            self._restart_executor(executor)
+            raise
+        self.queue_latency.observe(result["queue_seconds"])
+        self.convert_latency.observe(result["convert_seconds"])
+        return result
+    
+    def metrics(self) -> str:
+        """生成Prometheus文本格式的指标"""
+        with self._lock:
+            counters = dict(self.counters)
+            pending = self.pending
+            restarts = self.restarts
+        lines = [
+            "# HELP img2excel_requests_total 已处理的转换请求数",
+            "# TYPE img2excel_requests_total counter",
+        ]
+        for status, count in counters.items():
+            lines.append(f'img2excel_requests_total{{status="{status}"}} {count}')
+        lines += [
+            "# HELP img2excel_in_flight 正在转换或排队的请求数",
+            "# TYPE img2excel_in_flight gauge",
+            f"img2excel_in_flight {pending}",
+            "# HELP img2excel_queue_depth 等待空闲工作进程的请求数",
+            "# TYPE img2excel_queue_depth gauge",
+            f"img2excel_queue_depth {max(0, pending - self.workers)}",
+            "# HELP img2excel_workers 工作进程数",
+            "# TYPE img2excel_workers gauge",
+            f"img2excel_workers {self.workers}",
+            "# HELP img2excel_pool_restarts_total 工作进程异常退出后重建进程池的次数",
+            "# TYPE img2excel_pool_restarts_total counter",
+            f"img2excel_pool_restarts_total {restarts}",
+        ]
+        lines += self.request_latency.render(
+            "img2excel_request_seconds", "从接受请求到转换完成的耗时"
+        )
+        lines += self.queue_latency.render(
+            "img2excel_queue_wait_seconds", "请求等待空闲工作进程的时间"
+        )
+        lines += self.convert_latency.render(
+            "img2excel_convert_seconds", "工作进程中的转换耗时"
+        )
+        return "\n".join(lines) + "\n"
+    
+    def close(self):
+        """关闭进程池"""
+        self.executor.shutdown(wait=True)
+
+
+def parse_options(query: Dict[str, List[str]]) -> dict:
+    """
+    将查询参数解析为 convert_to_excel 的参数
+    
+    Args:
+        query: parse_qs 的结果（不含 path、output 等服务参数）
+    
+    Returns:
+        参数字典
+    """
+    options = {}
+    for key, values in query.items():
+        if key not in OPTION_TYPES:
+            raise ValueError(f"不支持的参数: {key}（可选: {', '.join(OPTION_TYPES)}）")
+        try:
+            options[key] = OPTION_TYPES[key](values[-1])
+        except ValueError:
+            raise ValueError(f"参数 {key} 的值无效: {values[-1]}")
+    return options
+
+
+def confine_path(root: str, path: str) -> str:
+    """
+    将请求中的文件路径解析到服务根目录内
+    
+    相对路径相对于根目录；解析符号链接和 .. 之后不在根目录内的路径被拒绝。
+    
+    Args:
+        root: 服务根目录（已解析的绝对路径）
+        path: 请求中的文件路径
+    
+    Returns:
+        解析后的绝对路径
+    """
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise PermissionError(f"路径不在服务根目录内: {path}")
+    return resolved
+
+
+def json_response(
+    status: int,
+    payload: dict,
+    headers: Optional[dict] = None
+) -> Tuple[int, bytes, str, Optional[dict]]:
+    """生成JSON响应的状态码、响应体、内容类型和响应头"""
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    return status, body, "application/json; charset=utf-8", headers
+
+
+class ConversionRequestHandler(BaseHTTPRequestHandler):
+    """转换服务的HTTP请求处理器"""
+    
+    server_version = "img2excel"
+    
+    @property
+    def service(self) -> ConversionService:
+        return self.server.service
+    
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+    
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[dict] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None):
+        self._send(*json_response(status, payload, headers))
+    
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/metrics":
+            self._send(200, self.service.metrics().encode("utf-8"), "text/plain; version=0.0.4")
+        elif path == "/health":
+            self._send_json(200, {"status": "ok", "workers": self.service.workers})
+        else:
+            self._send_json(404, {"error": f"未知路径: {path}"})
+    
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/convert":
+            self._send_json(404, {"error": f"未知路径: {url.path}"})
+            return
+        
+        query = parse_qs(url.query)
+        input_path = query.pop("path", [None])[-1]
+        output_path = query.pop("output", [None])[-1]
+        try:
+            options = parse_options(query)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        
+        if input_path is not None or output_path is not None:
+            if self.server.root is None:
+                self._send_json(403, {"error": "服务未配置根目录，不能使用 path 和 output 参数"})
+                return
+            try:
+                if input_path is not None:
+                    input_path = confine_path(self.server.root, input_path)
+                if output_path is not None:
+                    output_path = confine_path(self.server.root, output_path)
+            except PermissionError as e:
+                self._send_json(403, {"error": str(e)})
+                return
+        
+        try:
+            # 名额只覆盖读取上传内容和转换，响应在释放名额之后发送，
+            # 客户端接收较慢时不会占用名额
+            with self.service.slot() as outcome:
+                response = self._handle_convert(input_path, output_path, options)
+                if response[0] == 200:
+                    outcome["status"] = "ok"
+        except ServiceBusy as e:
+            # 未读取的请求体留在连接中，直接关闭连接
+            self.close_connection = True
+            self._send_json(503, {"error": str(e)}, {"Retry-After": "1"})
+            return
+        self._send(*response)
+    
+    def _handle_convert(
+        self,
+        input_path: Optional[str],
+        output_path: Optional[str],
+        options: dict
+    ) -> Tuple[int, bytes, str, Optional[dict]]:
+        """执行转换，返回 _send 的参数（状态码、响应体、内容类型和响应头）"""
+        if input_path is None:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length <= 0:
+                return json_response(400, {"error": "请在请求体中上传图片，或用 path 参数指定图片文件"})
+            if length > self.server.max_upload:
+                self.close_connection = True
+                return json_response(413, {"error": f"上传内容超过上限（{self.server.max_upload} 字节）"})
+            # 上传内容直接在内存中传给工作进程，不写临时文件
+            source = self.rfile.read(length)
+        elif not os.path.isfile(input_path):
+            return json_response(400, {"error": f"图片文件不存在: {input_path}"})
+        else:
+            source = input_path
+        
+        try:
+            result = self.service.convert(source, output_path, options)
+        except BrokenProcessPool:
+            return json_response(500, {"error": "工作进程异常退出，进程池已重建"})
+        except (ValueError, OSError) as e:
+            # 参数无效、图片无法识别或输出路径不可写
+            return json_response(400, {"error": str(e)})
+        except Exception as e:
+            return json_response(500, {"error": str(e) or type(e).__name__})
+        
+        content = result.pop("content")
+        if output_path:
+            return json_response(200, dict(
+                result,
+                output=output_path,
+                bytes=os.path.getsize(output_path)
+            ))
+        return 200, content, XLSX_CONTENT_TYPE, {
+            "X-Img2excel-Cells": str(result["stats"].get("cells", 0)),
+            "X-Img2excel-Convert-Seconds": f"{result['convert_seconds']:.4f}",
+        }
+
+
+class ConversionServer(ThreadingHTTPServer):
+    """每个请求一个线程的HTTP服务器，转换在共享的进程池中执行"""
+    
+    daemon_threads = True
+    
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        service: ConversionService,
+        max_upload: int = DEFAULT_MAX_UPLOAD,
+        quiet: bool = False,
+        root: Optional[str] = None
+    ):
+        """
+        Args:
+            address: 监听地址 (主机, 端口)，端口为0时自动分配
+            service: 转换服务
+            max_upload: 上传大小上限（字节）
+            quiet: 是否关闭访问日志
+            root: path 和 output 参数可以访问的目录，None表示只接受上传
+        """
+        if root is not None and not os.path.isdir(root):
+            raise ValueError(f"服务根目录不存在: {root}")
+        super().__init__(address, ConversionRequestHandler)
+        self.service = service
+        self.max_upload = max_upload
+        self.quiet = quiet
+        self.root = os.path.realpath(root) if root is not None else None
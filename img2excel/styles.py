@@ -0,0 +1,73 @@
+"""
+样式工具模块 - 颜色填充样式注册表
+"""
+
+from copy import copy
+from typing import List, Optional, Sequence
+from openpyxl.styles import PatternFill
+
+
+class FillRegistry:
+    """
+    颜色→填充样式注册表
+    
+    以调色板索引为键，每种不同颜色只创建一次PatternFill；首次应用到
+    单元格后缓存该单元格的样式索引，之后相同颜色的单元格直接复用，
+    无需再次构造和哈希填充对象。样式索引属于具体的工作簿，因此一个
+    注册表只能用于一个工作簿。
+    """
+    
+    def __init__(self, hex_colors: Sequence[str]):
+        """
+        初始化注册表
+        
+        Args:
+            hex_colors: 调色板的十六进制颜色字符串列表
+        """
+        self._hex_colors = list(hex_colors)
+        self._fills: List[Optional[PatternFill]] = [None] * len(self._hex_colors)
+        self._styles: List[Optional[object]] = [None] * len(self._hex_colors)
+    
+    def get_fill(self, index: int) -> PatternFill:
+        """
+        获取调色板颜色对应的填充样式（不存在时创建）
+        
+        Args:
+            index: 调色板索引
+            
+        Returns:
+            PatternFill对象
+        """
+        fill = self._fills[index]
+        if fill is None:
+            hex_color = self._hex_colors[index]
+            fill = PatternFill(
+                start_color=hex_color,
+                end_color=hex_color,
+                fill_type="solid"
+            )
+            self._fills[index] = fill
+        return fill
+    
+    def apply(self, cell, index: int):
+        """
+        将调色板颜色填充应用到单元格
+        
+        Args:
+            cell: openpyxl单元格（普通单元格或WriteOnlyCell）
+            index: 调色板索引
+        """
+        style = self._styles[index]
+        if style is None:
+            cell.fill = self.get_fill(index)
+            self._styles[index] = copy(cell._style)
+        else:
+            cell._style = copy(style)
+    
+    @property
+    def color_count(self) -> int:
+        """调色板中的不同颜色数量"""
+        return len(self._hex_colors)
+    
+    def __len__(self) -> int:
+        return self.color_count
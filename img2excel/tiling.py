@@ -0,0 +1,207 @@
+"""
+分块输出模块 - 将超大图片拆分为多个工作表或多个工作簿
+"""
+
+import json
+import os
+from typing import List, NamedTuple, Optional, Tuple, Union
+
+from .palette import ColorIndex, LazyColorIndex
+from .parallel import ordered_map
+from .regions import count_regions, find_regions
+from .xlsx_writer import RawXlsxWriter, sheet_xml_chunks
+
+
+# 支持的分块输出方式：每块一个工作表，或每块一个工作簿
+TILE_LAYOUTS = ("sheets", "workbooks")
+
+# Excel工作表名称的最大长度
+_MAX_SHEET_NAME = 31
+
+
+class Tile(NamedTuple):
+    """
+    一个分块在整张图片中的位置（坐标从0开始）
+    
+    Attributes:
+        row: 分块所在的行号
+        col: 分块所在的列号
+        left: 起始像素列
+        top: 起始像素行
+        width: 宽度（单元格数量）
+        height: 高度（单元格数量）
+    """
+    row: int
+    col: int
+    left: int
+    top: int
+    width: int
+    height: int
+
+
+def parse_tile_size(text: str) -> Tuple[int, int]:
+    """
+    解析分块尺寸字符串
+    
+    Args:
+        text: 形如 "256x256" 的字符串
+    
+    Returns:
+        (宽度, 高度) 元组
+    """
+    try:
+        width, height = (int(part) for part in text.lower().split("x"))
+    except ValueError:
+        raise ValueError(f"无效的分块尺寸: {text}（格式应为 宽x高，如 256x256）")
+    if width < 1 or height < 1:
+        raise ValueError(f"分块尺寸必须大于0: {text}")
+    return width, height
+
+
+def plan_tiles(width: int, height: int, tile_width: int, tile_height: int) -> List[Tile]:
+    """
+    按行优先顺序将图片划分为分块
+    
+    Args:
+        width: 图片宽度（单元格数量）
+        height: 图片高度（单元格数量）
+        tile_width: 分块宽度
+        tile_height: 分块高度
+    
+    Returns:
+        Tile列表，边缘分块可能小于指定尺寸
+    """
+    tiles = []
+    for row, top in enumerate(range(0, height, tile_height)):
+        for col, left in enumerate(range(0, width, tile_width)):
+            tiles.append(Tile(
+                row, col, left, top,
+                min(tile_width, width - left),
+                min(tile_height, height - top)
+            ))
+    return tiles
+
+
+def manifest_path(output_path: str) -> str:
+    """分块清单文件路径（与输出文件同名，扩展名为 .manifest.json）"""
+    return f"{os.path.splitext(output_path)[0]}.manifest.json"
+
+
+def _tile_name(base: str, tile: Tile) -> str:
+    """生成分块名称，如 PixelArt_r1_c2"""
+    suffix = f"_r{tile.row + 1}_c{tile.col + 1}"
+    return base[:_MAX_SHEET_NAME - len(suffix)] + suffix
+
+
+def _render_tile_sheet(
+    index_tile,
+    style_lookup,
+    column_width: float,
+    row_height: float,
+    merge: Optional[str]
+) -> Tuple[bytes, Optional[int]]:
+    """在工作进程中序列化一个分块工作表的XML，返回XML和合并区域数量（不合并时为None）"""
+    regions = find_regions(index_tile, merge) if merge else None
+    xml = b"".join(sheet_xml_chunks(style_lookup[index_tile], column_width, row_height, regions))
+    return xml, count_regions(regions)
+
+
+def _render_tile_workbook(
+    path: str,
+    sheet_name: str,
+    hex_colors: List[str],
+    index_tile,
+    column_width: float,
+    row_height: float,
+    merge: Optional[str]
+) -> Tuple[int, Optional[int]]:
+    """在工作进程中将一个分块写为独立的工作簿，返回文件大小和合并区域数量（不合并时为None）"""
+    regions = find_regions(index_tile, merge) if merge else None
+    with RawXlsxWriter(path) as writer:
+        writer.add_sheet(sheet_name, hex_colors, index_tile, column_width, row_height, regions)
+    return os.path.getsize(path), count_regions(regions)
+
+
+def write_tiles(
+    color_index: Union[ColorIndex, LazyColorIndex],
+    output_path: str,
+    tile_size: Tuple[int, int],
+    column_width: float,
+    row_height: float,
+    layout: str = "sheets",
+    sheet_name: str = "PixelArt",
+    merge: Optional[str] = None,
+    jobs: Optional[int] = None
+) -> dict:
+    """
+    将图片按分块并行写出，并生成记录分块坐标的清单文件
+    
+    所有分块共享同一个调色板，颜色在各分块之间保持一致。每个分块的索引图
+    在提交该分块时才通过 color_index.region() 取得，传入 LazyColorIndex 时
+    同时存在的索引图只有在途的几个分块。
+    
+    Args:
+        color_index: 图片的调色板和索引图（或按区域建立索引的 LazyColorIndex）
+        output_path: 输出Excel文件路径；"workbooks"方式下作为分块文件名的前缀
+        tile_size: 分块尺寸 (宽度, 高度)
+        column_width: 列宽（字符单位）
+        row_height: 行高（磅）
+        layout: "sheets"（每块一个工作表）或 "workbooks"（每块一个工作簿）
+        sheet_name: 工作表名称前缀
+        merge: 合并模式，None表示不合并
+        jobs: 并行进程数，默认为CPU核心数
+    
+    Returns:
+        清单字典；合并单元格时 "regions" 为所有分块的合并区域总数（即设置样式的单元格数），
+        不合并时为None
+    """
+    if layout not in TILE_LAYOUTS:
+        raise ValueError(f"不支持的分块方式: {layout}（可选: {', '.join(TILE_LAYOUTS)}）")
+    
+    width, height = color_index.size
+    tiles = plan_tiles(width, height, *tile_size)
+    entries = []
+    region_counts = []
+    
+    def tile_index(tile):
+        return color_index.region(tile.top, tile.left, tile.height, tile.width)
+    
+    if layout == "sheets":
+        with RawXlsxWriter(output_path) as writer:
+            style_lookup = writer.register_colors(color_index.hex_colors)
+            tasks = (
+                (tile_index(tile), style_lookup, column_width, row_height, merge)
+                for tile in tiles
+            )
+            for tile, (xml, region_count) in zip(tiles, ordered_map(_render_tile_sheet, tasks, jobs)):
+                name = _tile_name(sheet_name, tile)
+                writer.add_sheet_xml(name, [xml])
+                entries.append(dict(tile._asdict(), sheet=name, file=os.path.basename(output_path)))
+                region_counts.append(region_count)
+    else:
+        stem = os.path.splitext(output_path)[0]
+        paths = [f"{stem}_r{tile.row + 1}_c{tile.col + 1}.xlsx" for tile in tiles]
+        tasks = (
+            (path, sheet_name, color_index.hex_colors, tile_index(tile),
+             column_width, row_height, merge)
+            for tile, path in zip(tiles, paths)
+        )
+        results = ordered_map(_render_tile_workbook, tasks, jobs)
+        for tile, path, (size, region_count) in zip(tiles, paths, results):
+            entries.append(dict(tile._asdict(), sheet=sheet_name, file=os.path.basename(path), bytes=size))
+            region_counts.append(region_count)
+    
+    manifest = {
+        "width": width,
+        "height": height,
+        "tile_width": tile_size[0],
+        "tile_height": tile_size[1],
+        "layout": layout,
+        "colors": color_index.color_count,
+        "regions": sum(region_counts) if merge else None,
+        "tiles": entries
+    }
+    with open(manifest_path(output_path), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    
+    return manifest
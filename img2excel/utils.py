@@ -2,22 +2,27 @@
 工具函数模块
 """
 
-from typing import Tuple
+from typing import Callable, Optional, Tuple
 from PIL import Image
 
 
-def resize_image(image: Image.Image, target_size: Tuple[int, int]) -> Image.Image:
+def resize_image(
+    image: Image.Image,
+    target_size: Tuple[int, int],
+    resample: int = Image.Resampling.LANCZOS
+) -> Image.Image:
     """
     调整图片尺寸
     
     Args:
         image: PIL图片对象
         target_size: 目标尺寸 (width, height)
+        resample: 重采样滤镜，默认LANCZOS
         
     Returns:
         调整后的图片对象
     """
-    return image.resize(target_size, Image.Resampling.LANCZOS)
+    return image.resize(target_size, resample)
 
 
 def rgb_to_hex(r: int, g: int, b: int) -> str:
@@ -71,7 +76,7 @@ def validate_image_path(image_path: str) -> bool:
         return False
     
     # 检查文件扩展名
-    valid_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff', '.webp'}
+    valid_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tiff', '.webp', '.npy'}
     file_ext = os.path.splitext(image_path)[1].lower()
     
     return file_ext in valid_extensions
@@ -94,6 +99,43 @@ def get_image_dimensions(image_path: str) -> Tuple[int, int]:
         raise ValueError(f"无法读取图片尺寸: {e}")
 
 
+def plan_target_size(
+    width: int,
+    height: int,
+    fits: Callable[[int, int], bool]
+) -> Optional[Tuple[int, int]]:
+    """
+    按比例缩小尺寸，找出满足条件的最大尺寸
+    
+    较长边从1到原长度逐个取值，较短边按比例向下取整（至少为1），
+    二分查找满足 fits 的最大尺寸。fits 须随尺寸单调：较大的尺寸满足时，
+    较小的尺寸也满足。
+    
+    Args:
+        width: 允许的最大宽度
+        height: 允许的最大高度
+        fits: 判断 (宽度, 高度) 是否满足条件的函数
+    
+    Returns:
+        (宽度, 高度) 元组；最小的尺寸也不满足时返回None
+    """
+    longest = max(width, height, 1)
+    
+    def size(step: int) -> Tuple[int, int]:
+        return max(1, width * step // longest), max(1, height * step // longest)
+    
+    if not fits(*size(1)):
+        return None
+    low, high = 1, longest
+    while low < high:
+        middle = (low + high + 1) // 2
+        if fits(*size(middle)):
+            low = middle
+        else:
+            high = middle - 1
+    return size(low)
+
+
 def calculate_cell_count(
     image_width: int, 
     image_height: int, 
@@ -101,35 +143,21 @@ def calculate_cell_count(
     keep_ratio: bool = True
 ) -> Tuple[int, int]:
     """
-    计算适合的单元格数量
+    计算适合的单元格数量：不超过 max_cells 个单元格的最大尺寸，不大于图片本身
     
     Args:
         image_width: 图片宽度
         image_height: 图片高度
         max_cells: 最大单元格数量
-        keep_ratio: 是否保持比例
+        keep_ratio: 是否保持比例（两种方式都按图片比例分配单元格，保留此参数以兼容旧调用）
         
     Returns:
         (宽度单元格数, 高度单元格数) 元组
     """
-    if keep_ratio:
-        # 保持比例，计算缩放因子
-        scale = (max_cells / (image_width * image_height)) ** 0.5
-        new_width = max(1, int(image_width * scale))
-        new_height = max(1, int(image_height * scale))
-    else:
-        # 不保持比例，平均分配
-        total_cells = max_cells
-        aspect_ratio = image_width / image_height
-        
-        new_width = int((total_cells * aspect_ratio) ** 0.5)
-        new_height = int(total_cells / new_width)
-        
-        # 确保至少1x1
-        new_width = max(1, new_width)
-        new_height = max(1, new_height)
-    
-    return new_width, new_height
+    size = plan_target_size(
+        image_width, image_height, lambda width, height: width * height <= max_cells
+    )
+    return size or (1, 1)
 
 
 def format_file_size(size_bytes: int) -> str:
@@ -150,3 +178,27 @@ def format_file_size(size_bytes: int) -> str:
         return f"{size_bytes / (1024 * 1024):.1f} MB"
     else:
         return f"{size_bytes / (1024 * 1024 * 1024):.1f} GB"
+
+
+def parse_file_size(text: str) -> int:
+    """
+    解析文件大小字符串（format_file_size的逆操作）
+    
+    Args:
+        text: 文件大小字符串（如 "512MB"、"1.5 GB"、"1024"）
+        
+    Returns:
+        字节数
+    """
+    units = {"": 1, "B": 1, "K": 1024, "KB": 1024, "M": 1024 ** 2, "MB": 1024 ** 2,
+             "G": 1024 ** 3, "GB": 1024 ** 3}
+    value = text.strip().upper()
+    number = value.rstrip("KMGB ")
+    unit = value[len(number):].strip()
+    
+    if unit not in units:
+        raise ValueError(f"无效的文件大小: {text}")
+    try:
+        return int(float(number) * units[unit])
+    except ValueError:
+        raise ValueError(f"无效的文件大小: {text}")
@@ -0,0 +1,537 @@
+"""
+原生XLSX写入模块 - 绕过openpyxl对象模型直接写出XML
+
+像素画工作表的结构非常规整：所有单元格只有纯色填充、列宽相同、
+行高相同。对于这种结构，直接向压缩包写出 styles.xml 和工作表XML
+比通过openpyxl逐个构造单元格对象快得多，且内存占用只与单行宽度有关。
+"""
+
+import os
+import time
+import zipfile
+import zlib
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import quoteattr
+
+import numpy as np
+from openpyxl.utils import get_column_letter
+from openpyxl.workbook.child import INVALID_TITLE_REGEX
+
+from .regions import Region, anchor_mask
+
+
+_XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+# 每次写入压缩流的行数，减少小块写入的开销
+_ROWS_PER_CHUNK = 64
+
+# Excel工作表名称的最大长度
+_MAX_SHEET_NAME = 31
+
+
+def _format_number(value: float) -> str:
+    """格式化XML中的数值属性（整数值不带小数部分）"""
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def sheet_header(width: int, height: int, column_width: float, row_height: float) -> bytes:
+    """
+    生成工作表XML中 sheetData 之前的部分
+    
+    所有列共用一个 <col min max> 区间，行高写为工作表的默认行高，
+    因此不需要为每一行单独写出 ht 属性。
+    
+    Args:
+        width: 列数
+        height: 行数
+        column_width: 列宽（字符单位）
+        row_height: 行高（磅）
+    
+    Returns:
+        XML字节串
+    """
+    last_cell = f"{get_column_letter(max(width, 1))}{max(height, 1)}"
+    return (
+        f'{_XML_HEADER}<worksheet xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}">'
+        f'<dimension ref="A1:{last_cell}"/>'
+        '<sheetViews><sheetView workbookViewId="0"/></sheetViews>'
+        f'<sheetFormatPr defaultRowHeight="{_format_number(row_height)}" customHeight="1"/>'
+        f'<cols><col min="1" max="{max(width, 1)}" '
+        f'width="{_format_number(column_width)}" customWidth="1"/></cols>'
+        '<sheetData>'
+    ).encode("utf-8")
+
+
+def sheet_rows(
+    style_map: np.ndarray,
+    row_offset: int = 0,
+    mask: Optional[np.ndarray] = None,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Iterator[bytes]:
+    """
+    按行生成 sheetData 中的行XML
+    
+    Args:
+        style_map: 形状为 (行数, 宽度) 的样式索引数组
+        row_offset: 第一行之前的行数（用于分段生成）
+        mask: 与style_map同形状的布尔数组，只写出为True的单元格；
+            None表示写出所有单元格
+        progress: 每个字节块被消费后调用，参数为已生成的行数和累计字节数
+    
+    Returns:
+        XML字节块的迭代器，每块最多包含 _ROWS_PER_CHUNK 行
+    """
+    height, width = style_map.shape
+    
+    # 每列单元格引用的前缀，如 '<c r="AB'
+    prefixes = [f'<c r="{get_column_letter(col)}' for col in range(1, width + 1)]
+    style_attrs: Dict[int, str] = {}
+    
+    chunk = []
+    written = 0
+    for y in range(height):
+        row_number = str(row_offset + y + 1)
+        suffix = f'{row_number}" s="'
+        cells = []
+        style_ids = style_map[y].tolist()
+        columns = range(width) if mask is None else np.flatnonzero(mask[y]).tolist()
+        for x in columns:
+            style_id = style_ids[x]
+            attr = style_attrs.get(style_id)
+            if attr is None:
+                attr = style_attrs[style_id] = f'{style_id}"/>'
+            cells.append(prefixes[x] + suffix + attr)
+        chunk.append(f'<row r="{row_number}">{"".join(cells)}</row>')
+        
+        if len(chunk) >= _ROWS_PER_CHUNK or y == height - 1:
+            data = "".join(chunk).encode("utf-8")
+            yield data
+            chunk = []
+            if progress is not None:
+                written += len(data)
+                progress(y + 1, written)
+
+
+def sheet_footer(regions: Optional[List[Region]] = None) -> Iterator[bytes]:
+    """
+    生成工作表XML中 sheetData 之后的部分（包括合并区域）
+    
+    Args:
+        regions: 相同颜色的合并区域
+    
+    Returns:
+        XML字节块的迭代器
+    """
+    yield b'</sheetData>'
+    
+    merged = [region.ref for region in regions or () if region.cell_count > 1]
+    if merged:
+        yield f'<mergeCells count="{len(merged)}">'.encode("utf-8")
+        for start in range(0, len(merged), _ROWS_PER_CHUNK):
+            yield "".join(
+                f'<mergeCell ref="{ref}"/>' for ref in merged[start:start + _ROWS_PER_CHUNK]
+            ).encode("utf-8")
+        yield b'</mergeCells>'
+    
+    yield (
+        '<pageMargins left="0.75" right="0.75" top="1" bottom="1" '
+        'header="0.5" footer="0.5"/>'
+        '</worksheet>'
+    ).encode("utf-8")
+
+
+def sheet_xml_chunks(
+    style_map: np.ndarray,
+    column_width: float,
+    row_height: float,
+    regions: Optional[List[Region]] = None,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> Iterator[bytes]:
+    """
+    按行流式生成完整的工作表XML
+    
+    Args:
+        style_map: 形状为 (高度, 宽度) 的样式索引数组
+        column_width: 列宽（字符单位）
+        row_height: 行高（磅）
+        regions: 相同颜色的合并区域，只写出区域左上角的单元格
+        progress: 进度回调，见 sheet_rows
+    
+    Returns:
+        XML字节块的迭代器
+    """
+    height, width = style_map.shape
+    mask = anchor_mask(regions, (height, width)) if regions is not None else None
+    
+    yield sheet_header(width, height, column_width, row_height)
+    yield from sheet_rows(style_map, mask=mask, progress=progress)
+    yield from sheet_footer(regions)
+
+
+def deflate_segment(data: bytes, final: bool = False) -> Tuple[bytes, int, int]:
+    """
+    将一段XML压缩为可独立替换的deflate片段
+    
+    每个片段使用新的压缩器并以完全刷新（Z_FULL_FLUSH）结束，不引用之前的数据，
+    因此按顺序拼接各片段即得到完整的deflate流，其中任意片段都可以单独重新生成。
+    
+    Args:
+        data: 未压缩的XML字节串
+        final: 是否为流中的最后一个片段
+    
+    Returns:
+        (压缩后的字节串, 未压缩长度, 未压缩数据的CRC32)
+    """
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+    flush = zlib.Z_FINISH if final else zlib.Z_FULL_FLUSH
+    return compressor.compress(data) + compressor.flush(flush), len(data), zlib.crc32(data)
+
+
+def crc32_combine(crc1: int, crc2: int, length2: int) -> int:
+    """
+    由两段数据各自的CRC32计算拼接后的CRC32，不需要原始数据
+    
+    CRC32对初始值是仿射的：在crc1之后再处理length2个字节，等价于对
+    length2个零字节分别以crc1和0为初始值计算后异或，再异或上crc2。
+    
+    Args:
+        crc1: 前一段数据的CRC32
+        crc2: 后一段数据的CRC32
+        length2: 后一段数据的长度
+    
+    Returns:
+        拼接后数据的CRC32
+    """
+    zeros = bytes(length2)
+    return zlib.crc32(zeros, crc1) ^ zlib.crc32(zeros) ^ crc2
+
+
+def _can_append_raw(archive: zipfile.ZipFile) -> bool:
+    """
+    能否绕过zipfile直接向压缩包追加已压缩的成员（见 _append_raw）
+    
+    需要 ZipFile 的内部属性 fp、start_dir、filelist 和 NameToInfo（在CPython 3.11上
+    验证过，这些属性自Python 2起未变），以及可随机访问的输出文件；写出的成员由
+    tests/test_xlsx_writer.py 按CRC32校验。
+    """
+    fp = getattr(archive, "fp", None)
+    if not (
+        isinstance(getattr(archive, "start_dir", None), int)
+        and isinstance(getattr(archive, "filelist", None), list)
+        and isinstance(getattr(archive, "NameToInfo", None), dict)
+        and fp is not None
+    ):
+        return False
+    try:
+        return fp.seekable()
+    except (AttributeError, ValueError):
+        return False
+
+
+def _append_raw(archive: zipfile.ZipFile, info: zipfile.ZipInfo, segments: Iterable[Tuple[bytes, int, int]]):
+    """
+    将已压缩的片段原样写为压缩包的一个成员
+    
+    在目录区的位置写出文件头和片段，由各片段的CRC32合成整个成员的CRC32，
+    写完后回到文件头补写长度和CRC32，再登记到压缩包的成员列表，关闭时写出目录区。
+    """
+    info.CRC = info.file_size = info.compress_size = 0
+    stream = archive.fp
+    stream.seek(archive.start_dir)
+    info.header_offset = stream.tell()
+    stream.write(info.FileHeader(zip64=True))
+    
+    crc = size = compressed = 0
+    for data, length, segment_crc in segments:
+        stream.write(data)
+        crc = crc32_combine(crc, segment_crc, length)
+        size += length
+        compressed += len(data)
+    info.CRC, info.file_size, info.compress_size = crc, size, compressed
+    
+    end = stream.tell()
+    stream.seek(info.header_offset)
+    stream.write(info.FileHeader(zip64=True))
+    stream.seek(end)
+    archive.start_dir = end
+    archive.filelist.append(info)
+    archive.NameToInfo[info.filename] = info
+
+
+class RawXlsxWriter:
+    """
+    直接写出XLSX文件的轻量级写入器
+    
+    每种不同颜色对应一个填充和一个单元格样式（所有工作表共享），
+    工作表XML按行流式写入压缩包。
+    
+    用法:
+        with RawXlsxWriter("output.xlsx") as writer:
+            writer.add_sheet("PixelArt", hex_colors, index_map, column_width=2, row_height=15)
+    """
+    
+    def __init__(self, file, compression: int = zipfile.ZIP_DEFLATED):
+        """
+        初始化写入器
+        
+        Args:
+            file: 输出文件路径或可写的二进制文件对象
+            compression: 压缩方式（zipfile常量）
+        """
+        self._zip = zipfile.ZipFile(file, "w", compression)
+        # 输出到文件路径时记录路径，出错时删除不完整的文件
+        self._path = file if isinstance(file, (str, os.PathLike)) else None
+        self._sheet_titles: List[str] = []
+        # 十六进制颜色 -> 单元格样式索引（0为默认样式）
+        self._style_ids: Dict[str, int] = {}
+        self._closed = False
+    
+    @property
+    def color_count(self) -> int:
+        """已注册的不同颜色数量"""
+        return len(self._style_ids)
+    
+    def add_sheet(
+        self,
+        title: str,
+        hex_colors: Sequence[str],
+        index_map: np.ndarray,
+        column_width: float,
+        row_height: float,
+        regions: Optional[List[Region]] = None,
+        progress: Optional[Callable[[int, int], None]] = None
+    ):
+        """
+        添加一个像素画工作表
+        
+        Args:
+            title: 工作表名称
+            hex_colors: 调色板的十六进制颜色字符串列表
+            index_map: 形状为 (高度, 宽度) 的调色板索引数组
+            column_width: 列宽（字符单位）
+            row_height: 行高（磅）
+            regions: 相同颜色的合并区域，只写出区域左上角的单元格；
+                None表示写出所有单元格
+            progress: 进度回调，参数为已写出的行数和累计XML字节数
+        """
+        if index_map.ndim != 2:
+            raise ValueError(f"索引图必须是二维数组，实际形状为 {index_map.shape}")
+        
+        # 将本工作表的调色板映射到全局样式索引
+        lookup = self.register_colors(hex_colors)
+        style_map = lookup[index_map] if len(lookup) else index_map
+        
+        self.add_sheet_xml(
+            title, sheet_xml_chunks(style_map, column_width, row_height, regions, progress)
+        )
+    
+    def add_sheet_xml(self, title: str, chunks: Iterable[bytes]):
+        """
+        添加一个已序列化的工作表
+        
+        Args:
+            title: 工作表名称
+            chunks: 工作表XML的字节块（样式索引须来自 register_colors）
+        """
+        self._add_title(title)
+        name = f"xl/worksheets/sheet{len(self._sheet_titles)}.xml"
+        with self._zip.open(name, "w", force_zip64=True) as stream:
+            for chunk in chunks:
+                stream.write(chunk)
+    
+    def add_sheet_deflated(self, title: str, segments: Iterable[Tuple[bytes, int, int]]):
+        """
+        添加一个由已压缩片段组成的工作表，片段原样写入压缩包
+        
+        输出不能随机访问（或zipfile的内部结构与 _can_append_raw 检查的不同）时
+        解压后重新压缩写入，此时压缩后的字节与片段不同，增量更新会退回完整渲染。
+        
+        Args:
+            title: 工作表名称
+            segments: deflate_segment 返回的片段，最后一个片段须以final=True生成
+                （样式索引须来自 register_colors）
+        """
+        self._add_title(title)
+        info = zipfile.ZipInfo(
+            f"xl/worksheets/sheet{len(self._sheet_titles)}.xml", time.localtime(time.time())[:6]
+        )
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.external_attr = 0o600 << 16
+        
+        if _can_append_raw(self._zip):
+            _append_raw(self._zip, info, segments)
+            return
+        
+        # 无法直接追加时逐段解压，由zipfile重新压缩写入
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        with self._zip.open(info, "w", force_zip64=True) as stream:
+            for data, _, _ in segments:
+                stream.write(decompressor.decompress(data))
+            stream.write(decompressor.flush())
+    
+    def _add_title(self, title: str):
+        """
+        检查并记录工作表名称
+        
+        与openpyxl相同，名称不能包含 \\ * ? : / [ ]；此外Excel要求名称非空、
+        不超过31个字符，且在工作簿中不重复（不区分大小写）。
+        """
+        match = INVALID_TITLE_REGEX.search(title)
+        if match:
+            raise ValueError(f"工作表名称中包含无效字符 {match.group(0)!r}: {title}")
+        if not title or len(title) > _MAX_SHEET_NAME:
+            raise ValueError(f"工作表名称长度必须在1到{_MAX_SHEET_NAME}个字符之间: {title!r}")
+        if title.lower() in (existing.lower() for existing in self._sheet_titles):
+            raise ValueError(f"工作表名称重复: {title}")
+        self._sheet_titles.append(title)
+    
+    def register_colors(self, hex_colors: Sequence[str]) -> np.ndarray:
+        """
+        注册调色板颜色，返回调色板索引到全局样式索引的映射
+        
+        Args:
+            hex_colors: 调色板的十六进制颜色字符串列表
+        
+        Returns:
+            一维数组，第i项为调色板第i种颜色的样式索引
+        """
+        return np.array(
+            [self._style_id(hex_color) for hex_color in hex_colors], dtype=np.int64
+        )
+    
+    def _style_id(self, hex_color: str) -> int:
+        """获取颜色对应的样式索引（不存在时分配）"""
+        style_id = self._style_ids.get(hex_color)
+        if style_id is None:
+            style_id = len(self._style_ids) + 1
+            self._style_ids[hex_color] = style_id
+        return style_id
+    
+    def _styles_xml(self) -> str:
+        """生成 styles.xml：每种颜色一个纯色填充和一个单元格样式"""
+        colors = sorted(self._style_ids, key=self._style_ids.get)
+        
+        fills = [
+            '<fill><patternFill patternType="none"/></fill>',
+            '<fill><patternFill patternType="gray125"/></fill>',
+        ]
+        xfs = ['<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>']
+        for fill_id, hex_color in enumerate(colors, start=2):
+            fills.append(
+                '<fill><patternFill patternType="solid">'
+                f'<fgColor rgb="00{hex_color}"/><bgColor rgb="00{hex_color}"/>'
+                '</patternFill></fill>'
+            )
+            xfs.append(
+                f'<xf numFmtId="0" fontId="0" fillId="{fill_id}" borderId="0" '
+                'xfId="0" applyFill="1"/>'
+            )
+        
+        return (
+            f'{_XML_HEADER}<styleSheet xmlns="{_MAIN_NS}">'
+            '<fonts count="1"><font><sz val="11"/><name val="Calibri"/>'
+            '<family val="2"/><scheme val="minor"/></font></fonts>'
+            f'<fills count="{len(fills)}">{"".join(fills)}</fills>'
+            '<borders count="1"><border><left/><right/><top/><bottom/>'
+            '<diagonal/></border></borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" '
+            'borderId="0"/></cellStyleXfs>'
+            f'<cellXfs count="{len(xfs)}">{"".join(xfs)}</cellXfs>'
+            '<cellStyles count="1"><cellStyle name="Normal" xfId="0" '
+            'builtinId="0"/></cellStyles>'
+            '</styleSheet>'
+        )
+    
+    def _workbook_xml(self) -> str:
+        """生成 workbook.xml"""
+        sheets = "".join(
+            f'<sheet name={quoteattr(title)} sheetId="{index}" r:id="rId{index}"/>'
+            for index, title in enumerate(self._sheet_titles, start=1)
+        )
+        return (
+            f'{_XML_HEADER}<workbook xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}">'
+            '<bookViews><workbookView/></bookViews>'
+            f'<sheets>{sheets}</sheets>'
+            '</workbook>'
+        )
+    
+    def _workbook_rels_xml(self) -> str:
+        """生成 workbook.xml.rels"""
+        sheet_type = f"{_REL_NS}/worksheet"
+        rels = [
+            f'<Relationship Id="rId{index}" Type="{sheet_type}" '
+            f'Target="worksheets/sheet{index}.xml"/>'
+            for index in range(1, len(self._sheet_titles) + 1)
+        ]
+        rels.append(
+            f'<Relationship Id="rId{len(self._sheet_titles) + 1}" '
+            f'Type="{_REL_NS}/styles" Target="styles.xml"/>'
+        )
+        return f'{_XML_HEADER}<Relationships xmlns="{_PKG_REL_NS}">{"".join(rels)}</Relationships>'
+    
+    def _content_types_xml(self) -> str:
+        """生成 [Content_Types].xml"""
+        sheet_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"
+        overrides = "".join(
+            f'<Override PartName="/xl/worksheets/sheet{index}.xml" ContentType="{sheet_type}"/>'
+            for index in range(1, len(self._sheet_titles) + 1)
+        )
+        return (
+            f'{_XML_HEADER}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            f'{overrides}'
+            '</Types>'
+        )
+    
+    def close(self):
+        """写出工作簿级别的部件并关闭压缩包"""
+        if self._closed:
+            return
+        if not self._sheet_titles:
+            raise ValueError("工作簿中至少需要一个工作表")
+        
+        package_rels = (
+            f'{_XML_HEADER}<Relationships xmlns="{_PKG_REL_NS}">'
+            f'<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        )
+        self._zip.writestr("[Content_Types].xml", self._content_types_xml())
+        self._zip.writestr("_rels/.rels", package_rels)
+        self._zip.writestr("xl/workbook.xml", self._workbook_xml())
+        self._zip.writestr("xl/_rels/workbook.xml.rels", self._workbook_rels_xml())
+        self._zip.writestr("xl/styles.xml", self._styles_xml())
+        self._zip.close()
+        self._closed = True
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            try:
+                self.close()
+            except BaseException:
+                self._discard()
+                raise
+        else:
+            # 出错时不写出不完整的工作簿部件，输出到文件路径时删除已写入的部分
+            self._discard()
+        return False
+    
+    def _discard(self):
+        """关闭文件句柄并删除不完整的输出文件（输出到文件对象时由调用方丢弃）"""
+        try:
+            self._zip.close()
+        except Exception:
+            pass
+        self._closed = True
+        if self._path is not None and os.path.exists(self._path):
+            os.remove(self._path)
@@ -0,0 +1,90 @@
+"""
+测试共用的夹具：小尺寸的像素画数组、工作簿内容快照和只能顺序写入的输出流
+"""
+
+import io
+import os
+import sys
+
+import numpy as np
+import pytest
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_pixel_art(width: int = 12, height: int = 9, colors: int = 4, seed: int = 0) -> np.ndarray:
+    """生成由少量颜色的色块组成的像素画，既有可合并的区域也有零散像素"""
+    rng = np.random.default_rng(seed)
+    palette = rng.integers(0, 256, (colors, 3), dtype=np.uint8)
+    blocks = rng.integers(0, colors, (-(-height // 3), -(-width // 3)))
+    indices = np.kron(blocks, np.ones((3, 3), dtype=int))[:height, :width]
+    # 打散一部分像素，避免整张图都是规整的色块
+    noise = rng.random((height, width)) < 0.2
+    indices[noise] = rng.integers(0, colors, int(noise.sum()))
+    return palette[indices]
+
+
+def sheet_snapshot(path: str) -> dict:
+    """
+    读取工作簿中影响显示的全部内容
+    
+    Returns:
+        每个工作表的名称、各单元格填充、各列宽度、各行高度和合并区域
+    """
+    workbook = load_workbook(path)
+    sheets = []
+    for worksheet in workbook.worksheets:
+        fills = {}
+        for row in worksheet.iter_rows():
+            for cell in row:
+                fill = cell.fill
+                fills[cell.coordinate] = (fill.fill_type, fill.fgColor.rgb if fill.fill_type else None)
+        
+        widths = {}
+        for dimension in worksheet.column_dimensions.values():
+            for column in range(dimension.min, dimension.max + 1):
+                widths[get_column_letter(column)] = dimension.width
+        default_height = worksheet.sheet_format.defaultRowHeight
+        heights = {
+            row: (worksheet.row_dimensions[row].height or default_height)
+            for row in range(1, worksheet.max_row + 1)
+        }
+        sheets.append({
+            "title": worksheet.title,
+            "fills": fills,
+            "widths": widths,
+            "heights": heights,
+            "merged": sorted(str(merged) for merged in worksheet.merged_cells.ranges),
+        })
+    return {"sheets": sheets}
+
+
+class UnseekableStream(io.RawIOBase):
+    """只能顺序写入的输出流，模拟管道和HTTP响应"""
+    
+    def __init__(self):
+        self.data = bytearray()
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        self.data += data
+        return len(data)
+    
+    def seekable(self):
+        return False
+    
+    def seek(self, *args):
+        raise io.UnsupportedOperation("seek")
+    
+    def tell(self):
+        raise io.UnsupportedOperation("tell")
+
+
+@pytest.fixture
+def pixel_art() -> np.ndarray:
+    """12x9的四色像素画"""
+    return make_pixel_art()
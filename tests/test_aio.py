@@ -0,0 +1,104 @@
+"""
+异步接口测试
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+from conftest import make_pixel_art, sheet_snapshot
+from img2excel import aio
+from img2excel.aio import convert_async, convert_many
+from img2excel.batch import BatchResult
+
+
+def collect(paths, **options):
+    """运行 convert_many 并按完成顺序收集全部结果"""
+    async def run():
+        return [result async for result in convert_many(paths, **options)]
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def images(tmp_path):
+    """三张正常的图片和一个损坏的图片文件"""
+    paths = []
+    for seed in range(3):
+        path = tmp_path / f"art{seed}.png"
+        Image.fromarray(make_pixel_art(seed=seed)).save(path)
+        paths.append(str(path))
+    broken = tmp_path / "broken.png"
+    broken.write_bytes(b"not a png")
+    paths.insert(1, str(broken))
+    return paths
+
+
+def test_concurrency_limits_running_conversions(tmp_path, monkeypatch):
+    active = []
+    peak = []
+    lock = threading.Lock()
+    
+    def slow_convert(input_path, output_path, options, quiet):
+        with lock:
+            active.append(input_path)
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.remove(input_path)
+        return BatchResult(input_path, output_path)
+    
+    monkeypatch.setattr(aio, "convert_one", slow_convert)
+    paths = [str(tmp_path / f"in{number}.png") for number in range(7)]
+    with ThreadPoolExecutor(max_workers=7) as executor:
+        results = collect(paths, concurrency=2, executor=executor)
+    
+    assert sorted(result.input_path for result in results) == sorted(paths)
+    assert max(peak) == 2
+    assert active == []
+
+
+def test_failed_file_does_not_stop_others(tmp_path, images):
+    results = collect(images, out_dir=str(tmp_path / "out"), concurrency=2)
+    
+    assert sorted(result.input_path for result in results) == sorted(images)
+    errors = {result.input_path: result.error for result in results}
+    assert errors.pop(images[1])
+    assert list(errors.values()) == [None] * 3
+    for result in results:
+        if result.error is None:
+            assert result.cells > 0
+            assert sheet_snapshot(result.output_path)["sheets"]
+    assert not (tmp_path / "out" / "broken.xlsx").exists()
+
+
+def test_crashed_conversion_does_not_cancel_others(tmp_path, monkeypatch):
+    # 执行器中抛出的异常（如工作进程崩溃）只影响当前文件
+    finished = []
+    
+    def convert(input_path, output_path, options, quiet):
+        if input_path.endswith("crash.png"):
+            raise RuntimeError("工作进程异常退出")
+        time.sleep(0.05)
+        finished.append(input_path)
+        return BatchResult(input_path, output_path)
+    
+    monkeypatch.setattr(aio, "convert_one", convert)
+    paths = [str(tmp_path / name) for name in ("a.png", "crash.png", "b.png", "c.png")]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = collect(paths, concurrency=4, executor=executor)
+    
+    assert {result.input_path: result.error for result in results} == {
+        paths[0]: None, paths[1]: "工作进程异常退出", paths[2]: None, paths[3]: None
+    }
+    assert sorted(finished) == sorted(paths[:1] + paths[2:])
+
+
+def test_convert_async_writes_output(tmp_path, images):
+    output = tmp_path / "out.xlsx"
+    result = asyncio.run(convert_async(images[0], str(output), engine="xml"))
+    assert result == str(output)
+    assert len(sheet_snapshot(str(output))["sheets"]) == 1
@@ -0,0 +1,109 @@
+"""
+数组输入测试：.npy 文件、原始像素文件和按条带缩小
+"""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from conftest import make_pixel_art, sheet_snapshot
+from img2excel import arrays
+from img2excel.arrays import array_to_image, load_npy, map_raw, reduce_array
+from img2excel.core import ImageToExcel
+
+
+def reference_reduce(array, factor):
+    """NumPy参考实现：舍弃边缘后每 factor x factor 块求平均并四舍五入"""
+    height, width = array.shape[0] // factor, array.shape[1] // factor
+    block = array[:height * factor, :width * factor].astype(np.float64)
+    block = block.reshape((height, factor, width, factor) + array.shape[2:])
+    return np.floor(block.mean(axis=(1, 3)) + 0.5).astype(np.uint8)
+
+
+@pytest.fixture
+def photo():
+    """带渐变和噪声的RGB数组，缩小时各块的平均值各不相同"""
+    rng = np.random.default_rng(7)
+    y, x = np.mgrid[0:90, 0:120]
+    base = np.stack([x * 2, y * 2, (x + y)], axis=-1)
+    return np.clip(base + rng.integers(0, 40, base.shape), 0, 255).astype(np.uint8)
+
+
+@pytest.mark.parametrize("factor", [2, 3, 7])
+def test_reduce_array_matches_reference(photo, factor, monkeypatch):
+    # 条带很小时也与整体计算一致
+    monkeypatch.setattr(arrays, "_BAND_BYTES", 1000)
+    np.testing.assert_array_equal(reduce_array(photo, factor), reference_reduce(photo, factor))
+    gray = photo[..., 0]
+    np.testing.assert_array_equal(reduce_array(gray, factor), reference_reduce(gray, factor))
+
+
+def test_reduce_array_matches_pil_reduce(photo):
+    # 尺寸能被整除时与Pillow的整数倍缩小一致（取整方式可能相差1）
+    reduced = reduce_array(photo, 3).astype(int)
+    expected = np.asarray(Image.fromarray(photo).reduce(3)).astype(int)
+    assert reduced.shape == expected.shape
+    assert np.abs(reduced - expected).max() <= 1
+
+
+def test_reduce_array_reads_memory_map(tmp_path, photo):
+    path = tmp_path / "photo.npy"
+    np.save(path, photo)
+    mapped = load_npy(str(path))
+    assert isinstance(mapped, np.memmap)
+    np.testing.assert_array_equal(reduce_array(mapped, 4), reference_reduce(photo, 4))
+
+
+def test_array_to_image_reduces_by_whole_factor(photo):
+    # 目标30x20时至少保留90x60，120x90不能按2倍缩小；目标10x7时按4倍缩小，舍弃不足一块的边缘
+    assert array_to_image(photo, (30, 20)).size == (120, 90)
+    assert array_to_image(photo, (10, 7)).size == (30, 22)
+    rgba = np.dstack([photo, np.full(photo.shape[:2], 128, dtype=np.uint8)])
+    assert array_to_image(rgba).mode == "RGB"
+
+
+def test_npy_file_converts_like_array(tmp_path):
+    pixels = make_pixel_art(width=24, height=18, colors=5, seed=9)
+    path = tmp_path / "art.npy"
+    np.save(path, pixels)
+    
+    from_file = ImageToExcel(str(path))
+    assert isinstance(from_file._array, np.memmap)
+    from_file.convert_to_excel(str(tmp_path / "file.xlsx"), engine="xml", max_width=12)
+    ImageToExcel.from_array(pixels).convert_to_excel(str(tmp_path / "array.xlsx"), engine="xml", max_width=12)
+    
+    assert sheet_snapshot(str(tmp_path / "file.xlsx")) == sheet_snapshot(str(tmp_path / "array.xlsx"))
+
+
+def test_npy_with_unsupported_dtype_is_rejected(tmp_path):
+    path = tmp_path / "float.npy"
+    np.save(path, np.zeros((4, 4, 3), dtype=np.float32))
+    with pytest.raises(ValueError, match="不支持的数组类型"):
+        load_npy(str(path))
+
+
+@pytest.mark.parametrize("channels", [1, 3, 4])
+def test_raw_file_converts_like_array(tmp_path, channels):
+    pixels = make_pixel_art(width=20, height=15, colors=4, seed=2)
+    if channels == 1:
+        pixels = pixels[..., 0]
+    elif channels == 4:
+        pixels = np.dstack([pixels, np.full(pixels.shape[:2], 255, dtype=np.uint8)])
+    path = tmp_path / "frame.raw"
+    path.write_bytes(pixels.tobytes())
+    
+    ImageToExcel.from_raw(str(path), 20, 15, channels).convert_to_excel(str(tmp_path / "raw.xlsx"), engine="xml")
+    ImageToExcel.from_array(pixels).convert_to_excel(str(tmp_path / "array.xlsx"), engine="xml")
+    
+    assert sheet_snapshot(str(tmp_path / "raw.xlsx")) == sheet_snapshot(str(tmp_path / "array.xlsx"))
+
+
+def test_raw_file_size_must_match(tmp_path):
+    path = tmp_path / "frame.raw"
+    path.write_bytes(bytes(20 * 15 * 3 - 1))
+    with pytest.raises(ValueError, match=r"与尺寸 20x15x3 不符（应为 900 字节）"):
+        map_raw(str(path), 20, 15)
+    with pytest.raises(ValueError, match="不符"):
+        ImageToExcel.from_raw(str(path), 20, 15)
+    with pytest.raises(ValueError, match="不支持的通道数"):
+        map_raw(str(path), 20, 15, channels=2)
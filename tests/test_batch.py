@@ -0,0 +1,76 @@
+"""
+批量转换测试
+"""
+
+import os
+
+import pytest
+from PIL import Image
+
+from conftest import make_pixel_art, sheet_snapshot
+from img2excel.batch import BatchResult, collect_images, convert_batch, format_summary, plan_outputs
+from img2excel.cli import batch_main
+
+
+@pytest.fixture
+def source(tmp_path):
+    """包含三张正常图片、一个损坏的图片文件和一个非图片文件的目录"""
+    directory = tmp_path / "images"
+    directory.mkdir()
+    for seed, name in enumerate(["a.png", "c.png", "d.bmp"]):
+        Image.fromarray(make_pixel_art(seed=seed)).save(directory / name)
+    (directory / "b.png").write_bytes(b"not a png")
+    (directory / "notes.txt").write_text("不是图片")
+    return directory
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_bad_file_does_not_abort_batch(tmp_path, source, jobs):
+    inputs = collect_images(str(source))
+    assert [os.path.basename(path) for path in inputs] == ["a.png", "b.png", "c.png", "d.bmp"]
+    
+    finished = []
+    results = convert_batch(inputs, str(tmp_path / "out"), jobs=jobs, callback=finished.append, engine="xml")
+    
+    # 结果按输入顺序排列，回调按完成顺序对每个文件调用一次
+    assert [result.input_path for result in results] == inputs
+    assert sorted(result.input_path for result in finished) == inputs
+    assert [result.ok for result in results] == [True, False, True, True]
+    assert results[1].error and results[1].output_bytes == 0
+    assert not os.path.exists(results[1].output_path)
+    for result in (result for result in results if result.ok):
+        assert result.cells > 0
+        assert result.output_bytes == os.path.getsize(result.output_path)
+        assert len(sheet_snapshot(result.output_path)["sheets"]) == 1
+
+
+def test_summary_counts(tmp_path):
+    results = [
+        BatchResult("a.png", "a.xlsx", seconds=0.5, cells=108, output_bytes=2048),
+        BatchResult("b.png", "b.xlsx", seconds=0.25, error="无法识别的图片"),
+        BatchResult("c.png", "c.xlsx", seconds=1.0, cells=50, output_bytes=1024),
+    ]
+    summary = format_summary(results).splitlines()
+    assert summary[-1] == "共 3 个文件，成功 2 个，失败 1 个，累计耗时 1.75 秒"
+    assert summary[3].endswith("失败: 无法识别的图片")
+    assert len(summary) == 2 + len(results) + 2
+
+
+def test_plan_outputs_keeps_duplicate_stems_apart(tmp_path):
+    outputs = plan_outputs(["x/a.png", "y/a.jpg", "x/b.png"], str(tmp_path))
+    assert outputs == {
+        "x/a.png": str(tmp_path / "a_png.xlsx"),
+        "y/a.jpg": str(tmp_path / "a_jpg.xlsx"),
+        "x/b.png": str(tmp_path / "b.xlsx"),
+    }
+
+
+def test_cli_reports_failures_after_converting_the_rest(tmp_path, source, capsys):
+    out_dir = tmp_path / "out"
+    with pytest.raises(SystemExit) as info:
+        batch_main([str(source), "--out-dir", str(out_dir), "--jobs", "1", "--no-cache", "--engine", "xml"])
+    assert info.value.code == 1
+    
+    output = capsys.readouterr().out
+    assert "共 4 个文件，成功 3 个，失败 1 个" in output
+    assert sorted(os.listdir(out_dir)) == ["a.xlsx", "c.xlsx", "d.xlsx"]
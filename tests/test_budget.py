@@ -0,0 +1,49 @@
+"""
+按预算选择尺寸测试
+"""
+
+import numpy as np
+import pytest
+
+from conftest import make_pixel_art
+from img2excel.core import ImageToExcel
+from img2excel.estimate import Budget
+
+
+@pytest.fixture
+def flat_image():
+    """少量颜色的大色块，缩小后颜色和变化率都明显增加"""
+    art = make_pixel_art(width=60, height=45, colors=8, seed=7)
+    return np.kron(art, np.ones((16, 16, 1), dtype=np.uint8))
+
+
+@pytest.mark.parametrize("output_bytes", [100_000, 300_000, 1_000_000])
+@pytest.mark.parametrize("engine", ["openpyxl", "xml"])
+def test_plan_estimate_is_within_budget(flat_image, output_bytes, engine):
+    budget = Budget(output_bytes=output_bytes)
+    plan = ImageToExcel.from_array(flat_image).plan(budget, engine=engine)
+    estimate = plan.estimate
+    assert (estimate.width, estimate.height) == (plan.width, plan.height)
+    assert budget.allows(estimate.cells, estimate.output_bytes, estimate.seconds)
+
+
+def test_cell_budget_picks_largest_size(flat_image):
+    plan = ImageToExcel.from_array(flat_image).plan(Budget(cells=10_000))
+    assert plan.width * plan.height <= 10_000
+    assert (plan.width + 1) * (plan.height + 1) > 10_000
+
+
+def test_too_small_budget_is_rejected(flat_image):
+    with pytest.raises(ValueError):
+        ImageToExcel.from_array(flat_image).plan(Budget(output_bytes=10))
+
+
+def test_conversion_records_plan(tmp_path, flat_image, capsys):
+    converter = ImageToExcel.from_array(flat_image)
+    converter.convert_to_excel(str(tmp_path / "out.xlsx"), engine="xml", budget=Budget(cells=5_000))
+    assert converter.last_plan is not None
+    assert converter.stats["cells"] == converter.last_plan.width * converter.last_plan.height
+    assert "按预算" not in capsys.readouterr().out
+    
+    converter.convert_to_excel(str(tmp_path / "out.xlsx"), engine="xml", max_width=10)
+    assert converter.last_plan is None
@@ -0,0 +1,141 @@
+"""
+转换缓存测试
+"""
+
+import argparse
+import os
+import shutil
+
+import pytest
+from PIL import Image
+
+from conftest import make_pixel_art
+from img2excel.cache import CACHE_DIR_ENV, DEFAULT_MAX_BYTES, ConversionCache
+from img2excel.cli import make_cache
+from img2excel.core import ImageToExcel
+from img2excel.estimate import Budget
+from img2excel.progress import CancelToken, ConversionCancelled
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ConversionCache(str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def entry_source(tmp_path):
+    path = tmp_path / "source.xlsx"
+    path.write_bytes(b"PK" + b"x" * 100)
+    return str(path)
+
+
+def test_counters_stay_small(cache, tmp_path, entry_source):
+    cache.store("ab" * 32, entry_source)
+    for _ in range(200):
+        assert cache.fetch("ab" * 32, str(tmp_path / "out.xlsx")) is not None
+        assert cache.fetch("cd" * 32, str(tmp_path / "out.xlsx")) is None
+    
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (200, 200)
+    assert stats["hit_rate"] == 0.5
+    files = [name for name in os.listdir(cache.cache_dir) if os.path.isfile(os.path.join(cache.cache_dir, name))]
+    assert files == ["counters.json"]
+    assert os.path.getsize(os.path.join(cache.cache_dir, "counters.json")) < 64
+
+
+def test_corrupt_counters_restart_from_zero(cache, tmp_path):
+    with open(os.path.join(cache.cache_dir, "counters.json"), "w") as f:
+        f.write("{not json")
+    assert cache.fetch("ab" * 32, str(tmp_path / "out.xlsx")) is None
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (0, 1)
+
+
+@pytest.mark.parametrize("link", [False, True])
+def test_fetch_returns_entry_content(tmp_path, entry_source, link):
+    cache = ConversionCache(str(tmp_path / "cache"), link=link)
+    cache.store("ab" * 32, entry_source, {"width": 3})
+    output = tmp_path / "out.xlsx"
+    output.write_bytes(b"old")
+    assert cache.fetch("ab" * 32, str(output)) == {"width": 3}
+    assert output.read_bytes() == open(entry_source, "rb").read()
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+@pytest.mark.parametrize("link", [False, True])
+def test_entry_pruned_during_fetch_is_a_miss(tmp_path, entry_source, link, monkeypatch):
+    cache = ConversionCache(str(tmp_path / "cache"), link=link)
+    cache.store("ab" * 32, entry_source)
+    
+    # 模拟其他进程正好在链接或复制之前淘汰了条目
+    def pruning(function):
+        def wrapper(source, destination):
+            cache.prune(0)
+            return function(source, destination)
+        return wrapper
+    
+    monkeypatch.setattr(os, "link", pruning(os.link))
+    monkeypatch.setattr(shutil, "copyfile", pruning(shutil.copyfile))
+    output = tmp_path / "out.xlsx"
+    assert cache.fetch("ab" * 32, str(output)) is None
+    assert not output.exists()
+    assert cache.stats()["misses"] == 1
+
+
+def test_miss_keeps_existing_output(cache, tmp_path):
+    output = tmp_path / "out.xlsx"
+    output.write_bytes(b"old")
+    assert cache.fetch("ab" * 32, str(output)) is None
+    assert output.read_bytes() == b"old"
+
+
+def test_prune_removes_entry_info(cache, entry_source):
+    cache.store("ab" * 32, entry_source, {"width": 3})
+    cache.prune(0)
+    assert not [name for _, _, files in os.walk(cache.cache_dir) for name in files if name != "counters.json"]
+
+
+@pytest.fixture
+def image_file(tmp_path):
+    path = tmp_path / "art.png"
+    Image.fromarray(make_pixel_art(width=40, height=30, colors=5)).save(path)
+    return str(path)
+
+
+def test_budget_hit_skips_planning(tmp_path, image_file, monkeypatch):
+    cache = ConversionCache(str(tmp_path / "cache"))
+    output = str(tmp_path / "out.xlsx")
+    budget = Budget(cells=300)
+    first = ImageToExcel(image_file)
+    first.convert_to_excel(output, engine="xml", cache=cache, budget=budget)
+    
+    def fail(*args, **kwargs):
+        raise AssertionError("命中缓存时不应按预算选择尺寸或解码图片")
+    
+    monkeypatch.setattr(ImageToExcel, "plan", fail)
+    monkeypatch.setattr(ImageToExcel, "_intermediate_for", fail)
+    second = ImageToExcel(image_file)
+    second.convert_to_excel(output, engine="xml", cache=cache, budget=budget)
+    
+    assert second.stats["cache_hit"]
+    assert second.last_plan == first.last_plan
+    assert (second.stats["width"], second.stats["height"]) == (first.last_plan.width, first.last_plan.height)
+
+
+def test_failed_conversion_keeps_existing_output(tmp_path, image_file):
+    cache = ConversionCache(str(tmp_path / "cache"))
+    output = tmp_path / "out.xlsx"
+    output.write_bytes(b"old")
+    token = CancelToken()
+    token.cancel()
+    with pytest.raises(ConversionCancelled):
+        ImageToExcel(image_file).convert_to_excel(str(output), engine="xml", cache=cache, cancel=token)
+    assert output.read_bytes() == b"old"
+    assert sorted(os.listdir(tmp_path)) == ["art.png", "cache", "out.xlsx"]
+
+
+@pytest.mark.parametrize("flags", [{"incremental": True}, {"raw_size": "40x30"}])
+def test_cache_env_does_not_apply_to_uncacheable_conversions(tmp_path, monkeypatch, flags):
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+    options = dict(no_cache=False, cache_dir=None, cache_max_size=DEFAULT_MAX_BYTES, incremental=False, raw_size=None)
+    assert make_cache(argparse.Namespace(**options)) is not None
+    assert make_cache(argparse.Namespace(**dict(options, **flags))) is None
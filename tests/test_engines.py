@@ -0,0 +1,62 @@
+"""
+三种渲染引擎输出一致性测试
+"""
+
+import numpy as np
+import pytest
+
+from conftest import sheet_snapshot
+from img2excel.core import ENGINES, ImageToExcel
+
+
+def render(tmp_path, pixels, engine, **options):
+    """用指定引擎转换并返回输出路径"""
+    output_path = str(tmp_path / f"{engine}.xlsx")
+    ImageToExcel.from_array(pixels).convert_to_excel(
+        output_path, engine=engine, cell_width=15, cell_height=12, **options
+    )
+    return output_path
+
+
+@pytest.mark.parametrize("merge", [None, "rows", "rects"])
+def test_engines_produce_identical_workbooks(tmp_path, pixel_art, merge):
+    snapshots = {
+        engine: sheet_snapshot(render(tmp_path, pixel_art, engine, merge=merge))
+        for engine in ENGINES
+    }
+    
+    reference = snapshots["openpyxl"]
+    for engine in ("stream", "xml"):
+        assert snapshots[engine] == reference, engine
+
+
+def test_fills_match_source_pixels(tmp_path, pixel_art):
+    for engine in ENGINES:
+        sheet = sheet_snapshot(render(tmp_path, pixel_art, engine))["sheets"][0]
+        height, width = pixel_art.shape[:2]
+        for y in range(height):
+            for x in range(width):
+                fill_type, color = sheet["fills"][f"{chr(ord('A') + x)}{y + 1}"]
+                assert fill_type == "solid"
+                assert color[-6:] == "{:02X}{:02X}{:02X}".format(*pixel_art[y, x]), engine
+
+
+def test_dimensions_follow_cell_size(tmp_path, pixel_art):
+    for engine in ENGINES:
+        sheet = sheet_snapshot(render(tmp_path, pixel_art, engine))["sheets"][0]
+        height, width = pixel_art.shape[:2]
+        assert len(sheet["widths"]) == width
+        assert len(set(sheet["widths"].values())) == 1
+        assert set(sheet["heights"]) == set(range(1, height + 1))
+        assert set(sheet["heights"].values()) == {9.0}
+
+
+def test_quantized_engines_agree(tmp_path):
+    pixels = np.random.default_rng(1).integers(0, 256, (10, 14, 3), dtype=np.uint8)
+    snapshots = [
+        sheet_snapshot(render(tmp_path, pixels, engine, colors=8)) for engine in ENGINES
+    ]
+    assert snapshots[1] == snapshots[0]
+    assert snapshots[2] == snapshots[0]
+    colors = {color for _, color in snapshots[0]["sheets"][0]["fills"].values()}
+    assert len(colors) <= 8
@@ -0,0 +1,35 @@
+"""
+转换开销估计测试
+"""
+
+import numpy as np
+
+from conftest import make_pixel_art
+from img2excel.core import _RESAMPLE, ImageToExcel
+from img2excel.estimate import MAX_SAMPLED_CELLS
+
+
+def test_small_targets_sample_the_resized_image():
+    pixels = make_pixel_art(width=60, height=40, colors=6)
+    converter = ImageToExcel.from_array(pixels)
+    estimate = converter.estimate()
+    
+    assert (estimate.width, estimate.height) == (60, 40)
+    assert estimate.colors == len(np.unique(pixels.reshape(-1, 3), axis=0))
+    # 缩放结果留在memo中，随后的转换直接复用
+    assert converter.memo.get(("resized", (60, 40), _RESAMPLE)) is not None
+
+
+def test_large_targets_sample_a_small_grid():
+    art = make_pixel_art(width=40, height=30, colors=16, seed=5)
+    pixels = np.kron(art, np.ones((40, 40, 1), dtype=np.uint8))
+    height, width = pixels.shape[:2]
+    assert width * height > MAX_SAMPLED_CELLS
+    
+    converter = ImageToExcel.from_array(pixels)
+    estimate = converter.estimate()
+    
+    assert (estimate.width, estimate.height) == (width, height)
+    assert estimate.colors == len(np.unique(art.reshape(-1, 3), axis=0))
+    # 没有缩放到目标尺寸
+    assert len(converter.memo) == 0
@@ -0,0 +1,150 @@
+"""
+多帧图片转换测试
+"""
+
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from conftest import make_pixel_art, sheet_snapshot
+from img2excel import core
+from img2excel.core import ImageToExcel
+from img2excel.frames import FrameIndexer, prefetch
+
+
+def frame_pixels(path):
+    """按Pillow合成后的完整画面读取每一帧"""
+    with Image.open(path) as image:
+        frames = []
+        for number in range(image.n_frames):
+            image.seek(number)
+            frames.append(np.asarray(image.convert("RGB")))
+    return frames
+
+
+def sheet_content(sheet):
+    """工作表中与名称无关的内容"""
+    return {key: value for key, value in sheet.items() if key != "title"}
+
+
+@pytest.fixture
+def animation(tmp_path):
+    """4帧GIF：每一帧改动上一帧的一小块，第3帧引入新颜色"""
+    first = make_pixel_art(width=15, height=12, colors=4, seed=5)
+    frames = [first]
+    for number, (top, left, color) in enumerate([(2, 3, None), (6, 8, (250, 10, 10)), (0, 0, None)]):
+        pixels = frames[-1].copy()
+        pixels[top:top + 3, left:left + 4] = color if color is not None else first[11, 14 - number]
+        pixels[11, number] = (number * 40, 255 - number * 40, 90)
+        frames.append(pixels)
+    
+    path = tmp_path / "anim.gif"
+    images = [Image.fromarray(pixels) for pixels in frames]
+    images[0].save(path, save_all=True, append_images=images[1:], duration=80, loop=0)
+    return str(path)
+
+
+def test_frames_match_fresh_renders(tmp_path, animation):
+    output = tmp_path / "frames.xlsx"
+    result = ImageToExcel(animation).convert_frames(str(output))
+    pixels = frame_pixels(animation)
+    assert len(result["frames"]) == len(pixels) == 4
+    
+    sheets = sheet_snapshot(str(output))["sheets"]
+    assert [sheet["title"] for sheet in sheets] == [f"PixelArt_{number}" for number in range(1, 5)]
+    for number, frame in enumerate(pixels):
+        fresh = tmp_path / f"fresh{number}.xlsx"
+        ImageToExcel.from_array(frame).convert_to_excel(str(fresh), engine="xml")
+        assert sheet_content(sheets[number]) == sheet_content(sheet_snapshot(str(fresh))["sheets"][0])
+
+
+def test_changed_cells_count_differences_from_previous_frame(animation):
+    converter = ImageToExcel(animation)
+    result = converter.convert_frames(str(animation) + ".xlsx")
+    pixels = frame_pixels(animation)
+    
+    expected = [pixels[0].shape[0] * pixels[0].shape[1]] + [
+        int(np.any(current != previous, axis=-1).sum()) for previous, current in zip(pixels, pixels[1:])
+    ]
+    assert [entry["changed_cells"] for entry in result["frames"]] == expected
+    assert converter.stats["changed_cells"] == sum(expected)
+    assert [entry["duration"] for entry in result["frames"]] == [80] * 4
+
+
+def test_indexer_keeps_ids_of_existing_colors():
+    red, green, blue = (255, 0, 0), (0, 255, 0), (0, 0, 255)
+    indexer = FrameIndexer()
+    first, changed = indexer.index(np.array([[red, green], [green, red]], dtype=np.uint8))
+    assert changed == 4 and indexer.hex_colors == ["00FF00", "FF0000"]
+    np.testing.assert_array_equal(first, [[1, 0], [0, 1]])
+    
+    # 新颜色追加在调色板末尾，已有颜色的索引不变
+    second, changed = indexer.index(np.array([[red, blue], [green, red]], dtype=np.uint8))
+    assert changed == 1
+    assert indexer.hex_colors == ["00FF00", "FF0000", "0000FF"]
+    np.testing.assert_array_equal(second, [[1, 2], [0, 1]])
+
+
+def test_quantized_frames_share_one_palette(tmp_path, animation):
+    output = tmp_path / "frames.xlsx"
+    result = ImageToExcel(animation).convert_frames(str(output), colors=3)
+    
+    # 调色板在第一帧上生成，第3帧新增的颜色也映射到这3种颜色上
+    assert result["styles"] <= 3
+    colors = {
+        fill
+        for sheet in sheet_snapshot(str(output))["sheets"]
+        for fill in sheet["fills"].values()
+    }
+    assert len(colors) == result["styles"]
+
+
+def test_max_frames_limits_sheets(tmp_path, animation):
+    output = tmp_path / "frames.xlsx"
+    converter = ImageToExcel(animation)
+    result = converter.convert_frames(str(output), max_frames=2)
+    
+    assert [entry["frame"] for entry in result["frames"]] == [0, 1]
+    assert converter.stats["frames"] == 2
+    assert len(sheet_snapshot(str(output))["sheets"]) == 2
+
+
+def test_writer_failure_stops_prefetch_before_closing_source(tmp_path, animation, monkeypatch):
+    def failing_write(frames, *args, **kwargs):
+        next(iter(frames))
+        raise RuntimeError("写出失败")
+    
+    # 记录关闭源图片时后台解码线程是否还在运行
+    alive_at_close = []
+    open_image = ImageToExcel._open_image
+    
+    def tracked_open(self):
+        image = open_image(self)
+        close = image.close
+        
+        def tracked_close():
+            alive_at_close.append(any(thread.name == "img2excel-prefetch" for thread in threading.enumerate()))
+            close()
+        
+        image.close = tracked_close
+        return image
+    
+    monkeypatch.setattr(core, "write_frames", failing_write)
+    monkeypatch.setattr(ImageToExcel, "_open_image", tracked_open)
+    with pytest.raises(RuntimeError):
+        ImageToExcel(animation).convert_frames(str(tmp_path / "frames.xlsx"))
+    
+    assert alive_at_close == [False]
+
+
+def test_prefetch_reraises_producer_errors():
+    def items():
+        yield 1
+        raise ValueError("解码失败")
+    
+    pipeline = prefetch(items())
+    assert next(pipeline) == 1
+    with pytest.raises(ValueError):
+        next(pipeline)
@@ -0,0 +1,116 @@
+"""
+xml引擎增量更新测试
+"""
+
+import numpy as np
+import pytest
+
+from conftest import make_pixel_art, sheet_snapshot
+from img2excel.core import ImageToExcel
+from img2excel.progress import CancelToken, ConversionCancelled
+
+
+def convert(pixels, output_path, **options):
+    """转换数组并返回转换器（用于读取统计信息）"""
+    converter = ImageToExcel.from_array(pixels)
+    converter.convert_to_excel(str(output_path), engine="xml", **options)
+    return converter
+
+
+@pytest.fixture
+def frames():
+    # 每个条带546行，共3个条带
+    first = make_pixel_art(width=30, height=1200, colors=5, seed=4)
+    second = first.copy()
+    # 修改中间几行的一小块，并引入第一帧中没有的颜色
+    second[90:95, 3:10] = (1, 2, 3)
+    second[1150, 20] = first[0, 0]
+    return first, second
+
+
+def test_patch_matches_fresh_render(tmp_path, frames):
+    # 补丁后样式索引的顺序可能与完整渲染不同，只比较解析后的颜色和尺寸
+    first, second = frames
+    patched_path = tmp_path / "patched.xlsx"
+    convert(first, patched_path, incremental=True)
+    converter = convert(second, patched_path, incremental=True)
+    assert converter.stats["incremental"]
+    assert 0 < converter.stats["changed_cells"] < second.shape[0] * second.shape[1]
+    
+    fresh_path = tmp_path / "fresh.xlsx"
+    convert(second, fresh_path)
+    assert sheet_snapshot(str(patched_path)) == sheet_snapshot(str(fresh_path))
+
+
+def test_repeated_patches_match_fresh_render(tmp_path, frames):
+    first, second = frames
+    patched_path = tmp_path / "patched.xlsx"
+    for pixels in (first, second, first, second):
+        convert(pixels, patched_path, incremental=True)
+    
+    fresh_path = tmp_path / "fresh.xlsx"
+    convert(second, fresh_path)
+    assert sheet_snapshot(str(patched_path)) == sheet_snapshot(str(fresh_path))
+
+
+def test_unchanged_frame_changes_no_cells(tmp_path, frames):
+    first, _ = frames
+    path = tmp_path / "out.xlsx"
+    convert(first, path, incremental=True)
+    converter = convert(first, path, incremental=True)
+    assert converter.stats["incremental"]
+    assert converter.stats["changed_cells"] == 0
+
+
+def test_size_change_falls_back_to_full_render(tmp_path, frames):
+    first, _ = frames
+    path = tmp_path / "out.xlsx"
+    convert(first, path, incremental=True)
+    smaller = np.ascontiguousarray(first[:600])
+    converter = convert(smaller, path, incremental=True)
+    assert not converter.stats["incremental"]
+    
+    fresh_path = tmp_path / "fresh.xlsx"
+    convert(smaller, fresh_path)
+    assert sheet_snapshot(str(path)) == sheet_snapshot(str(fresh_path))
+
+
+def test_patch_reports_progress(tmp_path, frames):
+    first, second = frames
+    path = tmp_path / "out.xlsx"
+    convert(first, path, incremental=True)
+    
+    reports = []
+    converter = ImageToExcel.from_array(second)
+    converter.convert_to_excel(str(path), engine="xml", incremental=True, progress=reports.append)
+    assert converter.stats["incremental"]
+    rows = [report.rows_done for report in reports if report.stage == "render"]
+    assert rows and rows == sorted(rows)
+    assert reports[-1].rows_done == second.shape[0]
+
+
+def test_cancelled_patch_keeps_previous_workbook(tmp_path, frames):
+    first, second = frames
+    path = tmp_path / "out.xlsx"
+    convert(first, path, incremental=True)
+    before = path.read_bytes()
+    
+    token = CancelToken()
+    
+    def cancel_midway(report):
+        if report.rows_done > 0:
+            token.cancel()
+    
+    with pytest.raises(ConversionCancelled):
+        ImageToExcel.from_array(second).convert_to_excel(
+            str(path), engine="xml", incremental=True, progress=cancel_midway, cancel=token
+        )
+    assert path.read_bytes() == before
+    assert [p.name for p in tmp_path.iterdir() if p.suffix == ".xlsx"] == ["out.xlsx"]
+    
+    # 状态文件仍然有效，下一次转换继续增量更新
+    converter = convert(second, path, incremental=True)
+    assert converter.stats["incremental"]
+    fresh_path = tmp_path / "fresh.xlsx"
+    convert(second, fresh_path)
+    assert sheet_snapshot(str(path)) == sheet_snapshot(str(fresh_path))
@@ -0,0 +1,121 @@
+"""
+性能监测测试：每个转换阶段的记录及输出端
+"""
+
+import io
+import json
+import logging
+import os
+import tracemalloc
+
+import pytest
+from PIL import Image
+
+from conftest import make_pixel_art
+from img2excel.core import ENGINES, ImageToExcel
+from img2excel.instrumentation import (
+    Instrumentation, JsonLinesSink, LoggingSink, ProfileCollector, StageRecord
+)
+
+
+# 各引擎依次经过的阶段（xml引擎的渲染和保存是同一个阶段）
+STAGES = {
+    "openpyxl": ["load", "resize", "index", "regions", "dimensions", "render", "save"],
+    "stream": ["load", "resize", "index", "regions", "dimensions", "render", "save"],
+    "xml": ["load", "resize", "index", "regions", "render"],
+}
+
+# 带有像素数的阶段
+PIXEL_STAGES = {"load", "resize", "index", "regions", "dimensions", "render"}
+
+
+@pytest.fixture
+def png_path(tmp_path):
+    path = tmp_path / "art.png"
+    Image.fromarray(make_pixel_art(width=40, height=30, colors=5)).save(path)
+    return str(path)
+
+
+@pytest.fixture
+def tracing():
+    """在测试期间开启tracemalloc"""
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    yield
+    if started:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_each_stage_records_time_memory_and_size(tmp_path, png_path, tracing, engine):
+    collector = ProfileCollector()
+    output = tmp_path / "out.xlsx"
+    converter = ImageToExcel(png_path, instrumentation=Instrumentation([collector]))
+    converter.convert_to_excel(str(output), engine=engine, merge="rows", max_width=20)
+    
+    records = collector.records
+    assert [record.stage for record in records] == STAGES[engine]
+    for record in records:
+        assert record.source == png_path
+        assert record.wall_seconds >= 0 and record.cpu_seconds >= 0
+        assert isinstance(record.peak_bytes, int) and record.peak_bytes >= 0
+        assert (record.pixels is not None) == (record.stage in PIXEL_STAGES), record.stage
+    
+    by_stage = {record.stage: record for record in records}
+    # 解码的是原图，之后的阶段处理缩放后的20x15
+    assert by_stage["load"].pixels == 40 * 30
+    assert by_stage["resize"].pixels == by_stage["render"].pixels == 20 * 15
+    assert by_stage["index"].colors == by_stage["render"].colors == converter.stats["colors"]
+    # 只有写出文件的阶段记录输出大小
+    assert records[-1].output_bytes == os.path.getsize(output)
+    assert [record.output_bytes for record in records[:-1]] == [None] * (len(records) - 1)
+    
+    table = collector.format_table()
+    for stage in STAGES[engine]:
+        assert stage in table
+
+
+def test_peak_memory_requires_tracemalloc(png_path, tmp_path):
+    if tracemalloc.is_tracing():
+        pytest.skip("tracemalloc已在外部开启")
+    collector = ProfileCollector()
+    ImageToExcel(png_path, instrumentation=Instrumentation([collector])).convert_to_excel(
+        str(tmp_path / "out.xlsx"), engine="xml"
+    )
+    assert collector.records
+    assert all(record.peak_bytes is None for record in collector.records)
+
+
+def test_stage_without_sinks_records_nothing():
+    instrumentation = Instrumentation()
+    with instrumentation.stage("render", pixels=10) as fields:
+        fields["colors"] = 3
+    assert fields == {"pixels": 10, "colors": 3}
+    
+    records = []
+    instrumentation.add_sink(records.append)
+    with instrumentation.stage("render", source="a.png", pixels=10) as fields:
+        fields["colors"] = 3
+    assert len(records) == 1
+    assert records[0][:2] == ("a.png", "render")
+    assert (records[0].pixels, records[0].colors) == (10, 3)
+
+
+def test_json_lines_and_logging_sinks(tmp_path, png_path, caplog):
+    path = tmp_path / "stages.jsonl"
+    stream = io.StringIO()
+    instrumentation = Instrumentation([JsonLinesSink(str(path)), JsonLinesSink(stream), LoggingSink()])
+    with caplog.at_level(logging.INFO, logger="img2excel"):
+        ImageToExcel(png_path, instrumentation=instrumentation).convert_to_excel(
+            str(tmp_path / "out.xlsx"), engine="xml"
+        )
+    
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert lines == stream.getvalue().splitlines()
+    records = [StageRecord(**json.loads(line)) for line in lines]
+    assert [record.stage for record in records] == ["load", "resize", "index", "render"]
+    
+    logged = [entry.stage_record for entry in caplog.records if hasattr(entry, "stage_record")]
+    assert [entry["stage"] for entry in logged] == ["load", "resize", "index", "render"]
+    assert logged[-1]["output_bytes"] == records[-1].output_bytes > 0
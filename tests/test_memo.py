@@ -0,0 +1,123 @@
+"""
+缩放结果缓存测试
+"""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from conftest import make_pixel_art, sheet_snapshot
+from img2excel import core
+from img2excel.core import ImageToExcel
+from img2excel.memo import ImageMemo
+
+
+def counting(monkeypatch, owner, name):
+    """将 owner.name 替换为记录调用次数的包装，返回调用次数列表"""
+    calls = []
+    original = getattr(owner, name)
+    
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+    
+    monkeypatch.setattr(owner, name, wrapper)
+    return calls
+
+
+@pytest.fixture
+def png_path(tmp_path):
+    path = tmp_path / "art.png"
+    Image.fromarray(make_pixel_art(width=240, height=180, colors=6, seed=1)).save(path)
+    return str(path)
+
+
+def test_repeated_conversion_reuses_decoded_and_resized_image(tmp_path, png_path, monkeypatch):
+    loads = counting(monkeypatch, ImageToExcel, "_load_image")
+    resizes = counting(monkeypatch, core, "resize_image")
+    converter = ImageToExcel(png_path)
+    
+    converter.convert_to_excel(str(tmp_path / "first.xlsx"), engine="xml", max_width=60)
+    assert (len(loads), len(resizes)) == (1, 1)
+    
+    # 相同尺寸：直接复用索引图，不再解码和缩放
+    converter.convert_to_excel(str(tmp_path / "second.xlsx"), engine="stream", max_width=60)
+    assert (len(loads), len(resizes)) == (1, 1)
+    assert converter.memo.hits >= 1
+    
+    # 较小的尺寸：从已解码的图片缩放，不再解码
+    converter.convert_to_excel(str(tmp_path / "small.xlsx"), engine="xml", max_width=20)
+    assert (len(loads), len(resizes)) == (1, 2)
+    
+    assert sheet_snapshot(str(tmp_path / "second.xlsx")) == sheet_snapshot(str(tmp_path / "first.xlsx"))
+    # 从中间图片缩放与从原图缩放只有很小的差别
+    reused = np.asarray(converter.get_resized_image((20, 15)), dtype=int)
+    fresh = np.asarray(ImageToExcel(png_path).get_resized_image((20, 15)), dtype=int)
+    assert np.abs(reused - fresh).max() <= 8
+    assert len(loads) == 2
+
+
+def test_quantize_options_are_part_of_the_key(tmp_path, png_path, monkeypatch):
+    resizes = counting(monkeypatch, core, "resize_image")
+    converter = ImageToExcel(png_path)
+    converter.convert_to_excel(str(tmp_path / "full.xlsx"), engine="xml", max_width=60)
+    converter.convert_to_excel(str(tmp_path / "quantized.xlsx"), engine="xml", max_width=60, colors=3)
+    
+    # 缩放结果复用，量化后的索引图单独缓存
+    assert len(resizes) == 1
+    fills = {fill for fill in sheet_snapshot(str(tmp_path / "quantized.xlsx"))["sheets"][0]["fills"].values()}
+    assert len(fills) <= 3
+
+
+def test_small_memo_still_converts(tmp_path, png_path, monkeypatch):
+    loads = counting(monkeypatch, ImageToExcel, "_load_image")
+    converter = ImageToExcel(png_path)
+    converter.memo = ImageMemo(max_bytes=0)
+    for _ in range(2):
+        converter.convert_to_excel(str(tmp_path / "out.xlsx"), engine="xml", max_width=60)
+    # 不缓存时每次都重新解码
+    assert len(loads) == 2
+    assert len(converter.memo) == 0
+
+
+def test_memo_evicts_least_recently_used():
+    memo = ImageMemo(max_bytes=300)
+    for key in "abc":
+        memo.put(key, np.zeros(100, dtype=np.uint8))
+    assert memo.bytes == 300
+    
+    # 读取a后，b成为最久未使用的条目
+    assert memo.get("a") is not None
+    memo.put("d", np.zeros(100, dtype=np.uint8))
+    assert memo.get("b") is None
+    assert [key for key in "acd" if memo.get(key) is not None] == ["a", "c", "d"]
+    
+    # touch 同样更新使用顺序
+    memo.touch("a")
+    memo.put("e", np.zeros(150, dtype=np.uint8))
+    assert memo.get("c") is None and memo.get("d") is None
+    assert memo.get("a") is not None and memo.get("e") is not None
+    assert memo.bytes == 250 and len(memo) == 2
+
+
+def test_memo_replaces_and_skips_oversized_values():
+    memo = ImageMemo(max_bytes=100)
+    memo.put("a", np.zeros(60, dtype=np.uint8))
+    memo.put("a", np.zeros(40, dtype=np.uint8))
+    assert memo.bytes == 40 and len(memo) == 1
+    
+    # 超过容量的值不缓存，也不淘汰已有条目
+    memo.put("big", np.zeros(101, dtype=np.uint8))
+    assert memo.get("big") is None
+    assert memo.get("a") is not None
+    assert (memo.hits, memo.misses) == (1, 1)
+    
+    image = Image.new("RGB", (4, 5))
+    memo.put("image", image)
+    assert memo.bytes == 40 + 4 * 5 * 3
+    assert list(memo.images()) == [("image", image)]
+    with pytest.raises(TypeError):
+        memo.put("text", "不支持")
+    
+    memo.clear()
+    assert memo.bytes == 0 and len(memo) == 0
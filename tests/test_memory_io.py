@@ -0,0 +1,112 @@
+"""
+内存中的输入与输出测试：from_bytes、from_pil、convert_to_bytes 和 convert_to_stream
+"""
+
+import io
+import zipfile
+
+import pytest
+from PIL import Image
+
+from conftest import UnseekableStream, make_pixel_art, sheet_snapshot
+from img2excel.core import ENGINES, ImageToExcel
+from img2excel.progress import CancelToken, ConversionCancelled
+
+
+@pytest.fixture(scope="module")
+def pixels():
+    return make_pixel_art(width=30, height=120, colors=5, seed=3)
+
+
+@pytest.fixture(scope="module")
+def png_path(tmp_path_factory, pixels):
+    path = tmp_path_factory.mktemp("input") / "art.png"
+    Image.fromarray(pixels).save(path)
+    return str(path)
+
+
+@pytest.fixture(scope="module", params=ENGINES)
+def engine(request):
+    return request.param
+
+
+@pytest.fixture(scope="module")
+def expected(tmp_path_factory, png_path, engine):
+    """同一引擎从文件读取、写入文件的结果"""
+    output = tmp_path_factory.mktemp(engine) / "expected.xlsx"
+    ImageToExcel(png_path).convert_to_excel(str(output), engine=engine, max_width=20)
+    return sheet_snapshot(str(output))
+
+
+def test_convert_to_bytes_matches_file_output(png_path, engine, expected):
+    data = ImageToExcel(png_path).convert_to_bytes(engine=engine, max_width=20)
+    assert zipfile.ZipFile(io.BytesIO(data)).testzip() is None
+    assert sheet_snapshot(io.BytesIO(data)) == expected
+
+
+def test_convert_to_stream_writes_after_current_position(png_path, engine, expected):
+    stream = io.BytesIO()
+    stream.write(b"header")
+    reports = []
+    result = ImageToExcel(png_path).convert_to_stream(
+        stream, engine=engine, max_width=20, progress=reports.append
+    )
+    assert result is stream
+    
+    data = stream.getvalue()
+    assert data[:6] == b"header"
+    assert sheet_snapshot(io.BytesIO(data[6:])) == expected
+    assert reports[-1].bytes_written == len(data) - 6
+
+
+def test_from_bytes_matches_file_input(png_path, engine, expected):
+    with open(png_path, "rb") as f:
+        data = f.read()
+    converter = ImageToExcel.from_bytes(data)
+    assert sheet_snapshot(io.BytesIO(converter.convert_to_bytes(engine=engine, max_width=20))) == expected
+
+
+@pytest.mark.parametrize("mode", ["RGB", "P", "RGBA"])
+def test_from_pil_matches_file_input(pixels, engine, expected, mode):
+    # 调色板模式使用自适应调色板，颜色与原图完全一致
+    image = Image.fromarray(pixels).convert(mode, palette=Image.Palette.ADAPTIVE)
+    converter = ImageToExcel.from_pil(image)
+    assert sheet_snapshot(io.BytesIO(converter.convert_to_bytes(engine=engine, max_width=20))) == expected
+    # 调用方的图片不被修改
+    assert image.mode == mode and image.size == (30, 120)
+
+
+def test_empty_bytes_are_rejected():
+    with pytest.raises(ValueError, match="图片数据为空"):
+        ImageToExcel.from_bytes(b"")
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_unseekable_stream(png_path, engine, expected, jobs):
+    stream = UnseekableStream()
+    reports = []
+    ImageToExcel(png_path).convert_to_stream(
+        stream, engine=engine, max_width=20, jobs=jobs, progress=reports.append
+    )
+    
+    data = bytes(stream.data)
+    assert zipfile.ZipFile(io.BytesIO(data)).testzip() is None
+    assert sheet_snapshot(io.BytesIO(data)) == expected
+    # 无法获取写入位置时不报告输出大小
+    assert reports[-1].stage == "save" and reports[-1].bytes_written is None
+
+
+def test_cancel_into_unseekable_stream(pixels, engine):
+    token = CancelToken()
+    reports = []
+    
+    def cancel(progress):
+        reports.append(progress)
+        token.cancel()
+    
+    with pytest.raises(ConversionCancelled) as info:
+        ImageToExcel.from_array(pixels).convert_to_stream(
+            UnseekableStream(), engine=engine, progress=cancel, cancel=token
+        )
+    assert len(reports) == 1
+    assert not info.value.output_removed
@@ -0,0 +1,42 @@
+"""
+xml引擎分带并行渲染测试
+"""
+
+import zipfile
+
+import pytest
+
+from conftest import make_pixel_art
+from img2excel.bands import can_render_bands, plan_bands
+from img2excel.core import ImageToExcel
+
+
+def zip_members(path):
+    """读取xlsx中每个部件解压后的内容"""
+    with zipfile.ZipFile(path) as archive:
+        return {name: archive.read(name) for name in archive.namelist()}
+
+
+@pytest.mark.parametrize("merge", [None, "rows", "rects"])
+def test_parallel_bands_match_serial_output(tmp_path, merge):
+    pixels = make_pixel_art(width=40, height=300, colors=6, seed=2)
+    assert can_render_bands(pixels.shape[0], 3)
+    assert len(plan_bands(pixels.shape[0], 3)) > 1
+    
+    outputs = {}
+    for jobs in (1, 3):
+        output_path = str(tmp_path / f"jobs{jobs}.xlsx")
+        ImageToExcel.from_array(pixels).convert_to_excel(
+            output_path, engine="xml", merge=merge, jobs=jobs
+        )
+        outputs[jobs] = zip_members(output_path)
+    
+    assert outputs[3].keys() == outputs[1].keys()
+    for name in outputs[1]:
+        assert outputs[3][name] == outputs[1][name], name
+
+
+def test_short_images_render_serially():
+    assert not can_render_bands(10, 4)
+    assert not can_render_bands(1000, 1)
+    assert not can_render_bands(1000, None)
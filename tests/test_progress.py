@@ -0,0 +1,76 @@
+"""
+进度报告和取消测试
+"""
+
+import io
+import os
+import tempfile
+
+import pytest
+
+from conftest import make_pixel_art
+from img2excel.core import ENGINES, ImageToExcel
+from img2excel.progress import CancelToken, ConversionCancelled
+
+
+def cancel_after_first_report(token):
+    """第一次报告进度时请求取消的回调，返回回调和收到的进度列表"""
+    reports = []
+    
+    def callback(progress):
+        reports.append(progress)
+        token.cancel()
+    
+    return callback, reports
+
+
+@pytest.fixture
+def temp_dir(tmp_path, monkeypatch):
+    """将临时文件（如只写工作簿的行缓存）放到单独的目录，便于检查是否清理"""
+    path = tmp_path / "temp"
+    path.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(path))
+    return path
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_cancel_leaves_no_partial_output(tmp_path, temp_dir, engine):
+    token = CancelToken()
+    callback, reports = cancel_after_first_report(token)
+    output = tmp_path / "out.xlsx"
+    
+    with pytest.raises(ConversionCancelled) as info:
+        ImageToExcel.from_array(make_pixel_art(width=20, height=200)).convert_to_excel(
+            str(output), engine=engine, progress=callback, cancel=token
+        )
+    
+    assert len(reports) == 1 and reports[0].rows_done < 200
+    assert not output.exists()
+    assert os.listdir(temp_dir) == []
+    # 只有xml引擎在取消前写入了输出文件
+    assert info.value.output_removed == (engine == "xml")
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_cancel_into_stream_removes_nothing(temp_dir, engine):
+    token = CancelToken()
+    callback, _ = cancel_after_first_report(token)
+    
+    with pytest.raises(ConversionCancelled) as info:
+        ImageToExcel.from_array(make_pixel_art(width=20, height=200)).convert_to_excel(
+            io.BytesIO(), engine=engine, progress=callback, cancel=token
+        )
+    
+    assert not info.value.output_removed
+    assert os.listdir(temp_dir) == []
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_progress_reaches_all_rows(tmp_path, engine):
+    reports = []
+    ImageToExcel.from_array(make_pixel_art(width=20, height=50)).convert_to_excel(
+        str(tmp_path / "out.xlsx"), engine=engine, progress=reports.append
+    )
+    assert reports[-1].stage == "save"
+    assert reports[-1].rows_done == reports[-1].rows_total == 50
+    assert reports[-1].bytes_written == os.path.getsize(tmp_path / "out.xlsx")
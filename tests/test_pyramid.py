@@ -0,0 +1,130 @@
+"""
+多尺寸（图片金字塔）输出测试
+"""
+
+import re
+import zipfile
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from conftest import make_pixel_art, sheet_snapshot
+from img2excel.core import ImageToExcel
+from img2excel.pyramid import level_name, level_path, parse_pyramid_sizes
+
+
+SIZES = [16, 48, 8]
+
+
+@pytest.fixture
+def png_path(tmp_path):
+    path = tmp_path / "art.png"
+    Image.fromarray(make_pixel_art(width=48, height=36, colors=5, seed=8)).save(path)
+    return str(path)
+
+
+def sheet_dimensions(sheet):
+    """工作表中有填充的区域的宽度和高度"""
+    return len(sheet["widths"]), len(sheet["heights"])
+
+
+def style_colors(path):
+    """styles.xml 中的填充颜色，每个单元格样式对应一个"""
+    with zipfile.ZipFile(path) as archive:
+        styles = archive.read("xl/styles.xml").decode("utf-8")
+    cell_xfs = re.search(r"<cellXfs count=\"(\d+)\">", styles)
+    colors = re.findall(r'<fgColor rgb="00([0-9A-F]{6})"/>', styles)
+    # 第一个样式为默认样式，没有填充
+    assert int(cell_xfs.group(1)) == len(colors) + 1
+    return colors
+
+
+def test_one_sheet_per_level(tmp_path, png_path):
+    output = tmp_path / "pyramid.xlsx"
+    converter = ImageToExcel(png_path)
+    result = converter.convert_pyramid(str(output), SIZES)
+    
+    sheets = sheet_snapshot(str(output))["sheets"]
+    assert [sheet["title"] for sheet in sheets] == [level_name("PixelArt", size) for size in SIZES]
+    # 高度按原图比例（48x36）计算
+    expected = [(16, 12), (48, 36), (8, 6)]
+    assert [sheet_dimensions(sheet) for sheet in sheets] == expected
+    assert [(level["width"], level["height"]) for level in result["levels"]] == expected
+    assert {level["file"] for level in result["levels"]} == {"pyramid.xlsx"}
+    assert converter.stats["levels"] == 3
+    assert converter.stats["cells"] == sum(width * height for width, height in expected)
+
+
+def test_levels_share_one_style_table(tmp_path):
+    # 左右两半各一种颜色：每个尺寸都含有这两种纯色，只有交界处的过渡色不同
+    pixels = np.zeros((36, 48, 3), dtype=np.uint8)
+    pixels[:, :24] = (200, 30, 30)
+    pixels[:, 24:] = (30, 30, 200)
+    output = tmp_path / "pyramid.xlsx"
+    result = ImageToExcel.from_array(pixels).convert_pyramid(str(output), SIZES)
+    
+    colors = style_colors(str(output))
+    assert len(colors) == len(set(colors)) == result["styles"]
+    used = {
+        fill[1][2:]
+        for sheet in sheet_snapshot(str(output))["sheets"]
+        for fill in sheet["fills"].values()
+    }
+    assert used == set(colors)
+    assert {"C81E1E", "1E1EC8"} <= set(colors)
+    # 各尺寸共有的颜色只注册一次
+    assert result["styles"] <= sum(level["colors"] for level in result["levels"]) - 2 * (len(SIZES) - 1)
+
+
+def test_full_size_level_matches_single_conversion(tmp_path, png_path):
+    output = tmp_path / "pyramid.xlsx"
+    ImageToExcel(png_path).convert_pyramid(str(output), SIZES, merge="rows")
+    single = tmp_path / "single.xlsx"
+    ImageToExcel(png_path).convert_to_excel(str(single), engine="xml", max_width=48, merge="rows")
+    
+    level = sheet_snapshot(str(output))["sheets"][1]
+    expected = sheet_snapshot(str(single))["sheets"][0]
+    assert {key: value for key, value in level.items() if key != "title"} == {
+        key: value for key, value in expected.items() if key != "title"
+    }
+
+
+def test_image_is_decoded_once(tmp_path, png_path, monkeypatch):
+    loads = []
+    load_image = ImageToExcel._load_image
+    
+    def counting_load(self, *args, **kwargs):
+        loads.append(args)
+        return load_image(self, *args, **kwargs)
+    
+    monkeypatch.setattr(ImageToExcel, "_load_image", counting_load)
+    ImageToExcel(png_path).convert_pyramid(str(tmp_path / "pyramid.xlsx"), SIZES)
+    assert len(loads) == 1
+
+
+def test_workbook_per_level(tmp_path, png_path):
+    output = tmp_path / "pyramid.xlsx"
+    result = ImageToExcel(png_path).convert_pyramid(str(output), SIZES, layout="workbooks")
+    
+    assert not output.exists()
+    for size, level in zip(SIZES, result["levels"]):
+        path = level_path(str(output), size)
+        assert level["file"] == f"pyramid_{size}.xlsx"
+        sheets = sheet_snapshot(path)["sheets"]
+        assert len(sheets) == 1 and sheets[0]["title"] == "PixelArt"
+        assert sheet_dimensions(sheets[0]) == (level["width"], level["height"])
+        assert len(style_colors(path)) == level["colors"]
+
+
+def test_invalid_layout_and_sizes(tmp_path, png_path):
+    converter = ImageToExcel(png_path)
+    with pytest.raises(ValueError, match="不支持的多尺寸输出方式"):
+        converter.convert_pyramid(str(tmp_path / "out.xlsx"), SIZES, layout="pages")
+    with pytest.raises(ValueError, match="尺寸必须大于0"):
+        converter.convert_pyramid(str(tmp_path / "out.xlsx"), [16, 0])
+    
+    assert parse_pyramid_sizes("32, 64,32,128") == [32, 64, 128]
+    for text in ("", "32,abc", "32,-1"):
+        with pytest.raises(ValueError):
+            parse_pyramid_sizes(text)
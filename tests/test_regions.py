@@ -0,0 +1,90 @@
+"""
+相同颜色区域查找与合并单元格测试
+"""
+
+import numpy as np
+import pytest
+
+from conftest import make_pixel_art, sheet_snapshot
+from img2excel.core import ENGINES, ImageToExcel
+from img2excel.regions import MERGE_MODES, Region, anchor_mask, find_regions
+
+
+def coverage(regions, shape):
+    """统计每个单元格被区域覆盖的次数"""
+    counts = np.zeros(shape, dtype=int)
+    for region in regions:
+        counts[region.top:region.top + region.height, region.left:region.left + region.width] += 1
+    return counts
+
+
+@pytest.mark.parametrize("mode", MERGE_MODES)
+@pytest.mark.parametrize("seed", range(5))
+def test_regions_tile_image_with_uniform_colors(mode, seed):
+    index_map = np.random.default_rng(seed).integers(0, 3, (15, 20))
+    index_map[3:9, 4:12] = 0
+    
+    regions = find_regions(index_map, mode)
+    
+    assert (coverage(regions, index_map.shape) == 1).all()
+    for region in regions:
+        block = index_map[region.top:region.top + region.height, region.left:region.left + region.width]
+        assert (block == block[0, 0]).all()
+
+
+def test_row_runs_are_maximal():
+    index_map = np.array([
+        [0, 0, 1, 1, 1],
+        [2, 2, 2, 2, 2],
+    ])
+    assert find_regions(index_map, "rows") == [
+        Region(0, 0, 1, 2), Region(0, 2, 1, 3), Region(1, 0, 1, 5)
+    ]
+
+
+def test_rectangles_merge_identical_runs_downwards():
+    index_map = np.array([
+        [0, 0, 1],
+        [0, 0, 2],
+        [0, 0, 2],
+        [3, 3, 3],
+    ])
+    assert sorted(find_regions(index_map, "rects")) == [
+        Region(0, 0, 3, 2), Region(0, 2, 1, 1), Region(1, 2, 2, 1), Region(3, 0, 1, 3)
+    ]
+
+
+def test_region_ref():
+    assert Region(0, 0, 1, 1).ref == "A1:A1"
+    assert Region(2, 25, 3, 2).ref == "Z3:AA5"
+
+
+def test_anchor_mask_marks_top_left_cells():
+    regions = [Region(0, 0, 2, 2), Region(0, 2, 2, 1)]
+    mask = anchor_mask(regions, (2, 3))
+    assert mask.tolist() == [[True, False, True], [False, False, False]]
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        find_regions(np.zeros((2, 2), dtype=int), "diagonal")
+
+
+@pytest.mark.parametrize("mode", MERGE_MODES)
+def test_workbook_merges_multi_cell_regions(tmp_path, mode):
+    pixels = make_pixel_art(seed=3)
+    converter = ImageToExcel.from_array(pixels)
+    index_map = converter._prepare_color_index(pixels.shape[1], pixels.shape[0]).index_map
+    expected = sorted(
+        region.ref for region in find_regions(index_map, mode) if region.cell_count > 1
+    )
+    
+    for engine in ENGINES:
+        output_path = str(tmp_path / f"{engine}.xlsx")
+        ImageToExcel.from_array(pixels).convert_to_excel(output_path, engine=engine, merge=mode)
+        sheet = sheet_snapshot(output_path)["sheets"][0]
+        assert sheet["merged"] == expected, engine
+        # 每个合并区域的左上角保留该区域的颜色
+        for ref in expected:
+            top_left = ref.split(":")[0]
+            assert sheet["fills"][top_left][0] == "solid"
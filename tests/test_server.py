@@ -0,0 +1,241 @@
+"""
+本地转换服务测试
+"""
+
+import io
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from PIL import Image
+
+from conftest import make_pixel_art
+from img2excel.server import ConversionServer, ConversionService, ServiceBusy
+
+
+@pytest.fixture(scope="module")
+def service():
+    service = ConversionService(workers=1, max_queue=0)
+    yield service
+    service.close()
+
+
+@pytest.fixture
+def serve(service):
+    """启动服务器的工厂，测试结束时关闭"""
+    servers = []
+    
+    def start(target=None, **options):
+        server = ConversionServer(("127.0.0.1", 0), target or service, quiet=True, **options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+    
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def server(serve):
+    return serve()
+
+
+@pytest.fixture(scope="module")
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.fromarray(make_pixel_art()).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def request(server, method, path, data=None):
+    """发送请求，返回状态码、响应头和响应体"""
+    url = f"http://127.0.0.1:{server.server_address[1]}{path}"
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data, method=method)) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def post(server, query, data=b""):
+    """发送转换请求，返回状态码和响应体"""
+    status, _, body = request(server, "POST", f"/convert?{query}", data)
+    return status, body
+
+
+def metric_values(server):
+    """读取 /metrics 中不带桶标签的指标值"""
+    status, _, body = request(server, "GET", "/metrics")
+    assert status == 200
+    values = {}
+    for line in body.decode("utf-8").splitlines():
+        if line and not line.startswith("#") and "_bucket" not in line:
+            name, value = line.rsplit(" ", 1)
+            values[name] = float(value)
+    return values
+
+
+def test_sequential_requests_are_never_rejected(server, service, png_bytes):
+    # 只有一个名额时，上一个响应收到后名额必须已经释放
+    for _ in range(20):
+        status, body = post(server, "engine=xml", png_bytes)
+        assert status == 200
+        assert body[:2] == b"PK"
+    assert service.counters["rejected"] == 0
+    assert service.pending == 0
+
+
+def test_slot_is_released_before_response_is_sent(server, service, png_bytes, monkeypatch):
+    from img2excel.server import ConversionRequestHandler
+    
+    pending = []
+    send = ConversionRequestHandler._send
+    
+    def recording_send(handler, *args, **kwargs):
+        pending.append(service.pending)
+        send(handler, *args, **kwargs)
+    
+    monkeypatch.setattr(ConversionRequestHandler, "_send", recording_send)
+    assert post(server, "", png_bytes)[0] == 200
+    assert post(server, "engine=bogus", png_bytes)[0] == 400
+    assert pending == [0, 0]
+
+
+def test_paths_are_disabled_without_root(server, tmp_path, png_bytes):
+    image_path = tmp_path / "in.png"
+    image_path.write_bytes(png_bytes)
+    status, _ = post(server, f"path={image_path}&output={tmp_path / 'out.xlsx'}")
+    assert status == 403
+    assert not (tmp_path / "out.xlsx").exists()
+
+
+def test_paths_are_confined_to_root(serve, tmp_path, png_bytes):
+    root = tmp_path / "root"
+    root.mkdir()
+    (root / "in.png").write_bytes(png_bytes)
+    (tmp_path / "secret.png").write_bytes(png_bytes)
+    os.symlink(tmp_path / "secret.png", root / "link.png")
+    server = serve(root=str(root))
+    
+    status, body = post(server, "path=in.png&output=out.xlsx")
+    assert status == 200
+    assert json.loads(body)["output"] == str(root.resolve() / "out.xlsx")
+    assert (root / "out.xlsx").exists()
+    
+    for query in (
+        f"path={tmp_path / 'secret.png'}&output=a.xlsx",
+        "path=../secret.png&output=a.xlsx",
+        "path=link.png&output=a.xlsx",
+        f"path=in.png&output={tmp_path / 'escaped.xlsx'}",
+        "path=in.png&output=../escaped.xlsx",
+    ):
+        assert post(server, query)[0] == 403, query
+    assert not (root / "a.xlsx").exists()
+    assert not (tmp_path / "escaped.xlsx").exists()
+
+
+def test_missing_root_is_rejected(service, tmp_path):
+    with pytest.raises(ValueError):
+        ConversionServer(("127.0.0.1", 0), service, root=str(tmp_path / "missing"))
+
+
+@pytest.fixture
+def own_service():
+    """计数器从0开始的独立服务（一个工作进程，不排队）"""
+    service = ConversionService(workers=1, max_queue=0)
+    yield service
+    service.close()
+
+
+def test_busy_service_rejects_with_503(serve, own_service, png_bytes):
+    server = serve(own_service)
+    # 占住唯一的名额，之后的请求都应立即被拒绝
+    with own_service.slot():
+        for _ in range(3):
+            status, headers, body = request(server, "POST", "/convert", png_bytes)
+            assert status == 503
+            assert headers["Retry-After"] == "1"
+            assert "error" in json.loads(body)
+        with pytest.raises(ServiceBusy):
+            with own_service.slot():
+                pass
+    
+    assert post(server, "", png_bytes)[0] == 200
+    assert own_service.counters == {"ok": 1, "error": 1, "rejected": 4}
+
+
+def test_concurrent_requests_beyond_capacity_are_rejected(serve, own_service, png_bytes):
+    server = serve(own_service)
+    # 较大的图片使第一个转换持续一段时间，其余并发请求在此期间到达
+    buffer = io.BytesIO()
+    Image.fromarray(make_pixel_art(width=300, height=300, colors=200)).save(buffer, "PNG")
+    statuses = []
+    started = threading.Barrier(4)
+    
+    def send():
+        started.wait()
+        statuses.append(post(server, "", buffer.getvalue())[0])
+    
+    threads = [threading.Thread(target=send) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert sorted(statuses) == [200, 503, 503, 503]
+    assert own_service.counters == {"ok": 1, "error": 0, "rejected": 3}
+    assert own_service.pending == 0
+
+
+def test_metrics_report_counters_and_latency(serve, own_service, png_bytes):
+    server = serve(own_service)
+    assert post(server, "engine=xml", png_bytes)[0] == 200
+    assert post(server, "engine=xml", png_bytes)[0] == 200
+    assert post(server, "engine=bogus", png_bytes)[0] == 400
+    with own_service.slot() as outcome:
+        outcome["status"] = "ok"
+        assert post(server, "", png_bytes)[0] == 503
+    
+    values = metric_values(server)
+    assert values['img2excel_requests_total{status="ok"}'] == 3
+    assert values['img2excel_requests_total{status="error"}'] == 1
+    assert values['img2excel_requests_total{status="rejected"}'] == 1
+    assert values["img2excel_in_flight"] == 0
+    assert values["img2excel_queue_depth"] == 0
+    assert values["img2excel_workers"] == 1
+    assert values["img2excel_pool_restarts_total"] == 0
+    # 被拒绝的请求不计入延迟；参数无效的请求也在工作进程中执行（转换时才校验引擎）
+    assert values["img2excel_request_seconds_count"] == 4
+    assert values["img2excel_convert_seconds_count"] == 2
+    assert values["img2excel_queue_wait_seconds_count"] == 2
+
+
+def exit_after(seconds):
+    """在工作进程中等待一段时间后直接退出，模拟转换进行中工作进程被系统终止"""
+    time.sleep(seconds)
+    os._exit(1)
+
+
+def test_crashed_worker_pool_is_replaced(serve, own_service, png_bytes):
+    server = serve(own_service)
+    
+    # 进程池在请求到来之前已经损坏：重建后转换照常完成
+    with pytest.raises(BrokenProcessPool):
+        own_service.executor.submit(os._exit, 1).result()
+    assert post(server, "", png_bytes)[0] == 200
+    assert own_service.restarts == 1
+    
+    # 转换排在即将退出的工作进程之后：本次请求失败，之后的请求使用新的进程池
+    own_service.executor.submit(exit_after, 0.5)
+    status, body = post(server, "", png_bytes)
+    assert status == 500
+    assert "进程池已重建" in json.loads(body)["error"]
+    assert post(server, "", png_bytes)[0] == 200
+    assert metric_values(server)["img2excel_pool_restarts_total"] == 2
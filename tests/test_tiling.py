@@ -0,0 +1,81 @@
+"""
+分块输出测试
+"""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from conftest import make_pixel_art, sheet_snapshot
+from img2excel import core, palette
+from img2excel.core import ImageToExcel
+from img2excel.palette import LazyColorIndex, build_color_index
+from img2excel.regions import find_regions
+from img2excel.tiling import TILE_LAYOUTS, plan_tiles
+
+
+@pytest.mark.parametrize("layout", TILE_LAYOUTS)
+def test_merged_tiles_record_region_count(tmp_path, layout):
+    pixels = make_pixel_art(width=30, height=20, colors=3, seed=6)
+    converter = ImageToExcel.from_array(pixels)
+    index_map = converter._prepare_color_index(30, 20).index_map
+    expected = sum(
+        len(find_regions(index_map[tile.top:tile.top + tile.height, tile.left:tile.left + tile.width], "rects"))
+        for tile in plan_tiles(30, 20, 8, 8)
+    )
+    
+    manifest = converter.convert_tiled(
+        str(tmp_path / "out.xlsx"), (8, 8), layout=layout, merge="rects", jobs=1
+    )
+    
+    assert manifest["regions"] == expected
+    assert converter.stats["styled_cells"] == expected
+    assert converter.stats["cells"] == 30 * 20
+
+
+def test_unmerged_tiles_style_every_cell(tmp_path):
+    converter = ImageToExcel.from_array(make_pixel_art())
+    manifest = converter.convert_tiled(str(tmp_path / "out.xlsx"), (5, 5), jobs=1)
+    assert manifest["regions"] is None
+    assert converter.stats["styled_cells"] == converter.stats["cells"]
+
+
+def test_lazy_color_index_matches_full_index(monkeypatch):
+    monkeypatch.setattr(palette, "_SCAN_PIXELS", 50)
+    image = Image.fromarray(make_pixel_art(width=30, height=20, colors=5, seed=3))
+    full = build_color_index(image)
+    lazy = LazyColorIndex(image)
+    
+    assert lazy.size == full.size
+    assert lazy.hex_colors == full.hex_colors
+    np.testing.assert_array_equal(lazy.palette, full.palette)
+    for tile in plan_tiles(30, 20, 7, 6):
+        region = (tile.top, tile.left, tile.height, tile.width)
+        np.testing.assert_array_equal(lazy.region(*region), full.region(*region))
+        assert lazy.region(*region).dtype == full.index_map.dtype
+
+
+def test_tiles_do_not_build_full_index_map(tmp_path, monkeypatch):
+    def fail(image):
+        raise AssertionError("convert_tiled 不应建立整张图片的索引图")
+    
+    monkeypatch.setattr(core, "build_color_index", fail)
+    converter = ImageToExcel.from_array(make_pixel_art(width=20, height=10))
+    manifest = converter.convert_tiled(str(tmp_path / "out.xlsx"), (8, 8), jobs=1)
+    assert len(manifest["tiles"]) == 6
+
+
+@pytest.mark.parametrize("layout", TILE_LAYOUTS)
+def test_parallel_tiles_match_serial_tiles(tmp_path, layout):
+    pixels = make_pixel_art(width=20, height=14, colors=4, seed=8)
+    snapshots = {}
+    for jobs in (1, 2):
+        out_dir = tmp_path / str(jobs)
+        out_dir.mkdir()
+        manifest = ImageToExcel.from_array(pixels).convert_tiled(
+            str(out_dir / "out.xlsx"), (8, 8), layout=layout, jobs=jobs
+        )
+        files = sorted({tile["file"] for tile in manifest["tiles"]})
+        snapshots[jobs] = [sheet_snapshot(str(out_dir / name)) for name in files]
+    
+    assert snapshots[2] == snapshots[1]
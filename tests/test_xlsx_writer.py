@@ -0,0 +1,129 @@
+"""
+RawXlsxWriter 测试
+"""
+
+import io
+import zipfile
+import zlib
+
+import numpy as np
+import pytest
+
+from conftest import UnseekableStream, make_pixel_art, sheet_snapshot
+from img2excel import xlsx_writer
+from img2excel.xlsx_writer import (
+    RawXlsxWriter, deflate_segment, sheet_footer, sheet_header, sheet_rows
+)
+
+
+COLORS = ["FF0000", "00FF00"]
+INDEX_MAP = np.array([[0, 1], [1, 0]])
+
+
+def test_writes_readable_workbook(tmp_path):
+    path = tmp_path / "out.xlsx"
+    with RawXlsxWriter(str(path)) as writer:
+        writer.add_sheet("像素画", COLORS, INDEX_MAP, 2.0, 9.0)
+    
+    sheet = sheet_snapshot(str(path))["sheets"][0]
+    assert sheet["title"] == "像素画"
+    assert sheet["fills"]["A1"] == ("solid", "00FF0000")
+    assert sheet["fills"]["B1"] == ("solid", "0000FF00")
+
+
+def test_exception_removes_partial_output(tmp_path):
+    path = tmp_path / "out.xlsx"
+    with pytest.raises(RuntimeError):
+        with RawXlsxWriter(str(path)) as writer:
+            writer.add_sheet("Sheet", COLORS, INDEX_MAP, 2.0, 9.0)
+            raise RuntimeError("中断")
+    assert not path.exists()
+
+
+def test_invalid_sheet_name_removes_partial_output(tmp_path):
+    path = tmp_path / "out.xlsx"
+    with pytest.raises(ValueError):
+        with RawXlsxWriter(str(path)) as writer:
+            writer.add_sheet("Sheet", COLORS, INDEX_MAP, 2.0, 9.0)
+            writer.add_sheet("a" * 32, COLORS, INDEX_MAP, 2.0, 9.0)
+    assert not path.exists()
+
+
+@pytest.mark.parametrize("title", ["", "a" * 32, "a[1]", "a:b", "a*", "a?", "a/b", "a\\b"])
+def test_rejects_invalid_sheet_names(tmp_path, title):
+    with RawXlsxWriter(str(tmp_path / "out.xlsx")) as writer:
+        with pytest.raises(ValueError):
+            writer.add_sheet(title, COLORS, INDEX_MAP, 2.0, 9.0)
+        writer.add_sheet("a" * 31, COLORS, INDEX_MAP, 2.0, 9.0)
+
+
+def test_rejects_duplicate_sheet_names(tmp_path):
+    with RawXlsxWriter(str(tmp_path / "out.xlsx")) as writer:
+        writer.add_sheet("Frame", COLORS, INDEX_MAP, 2.0, 9.0)
+        with pytest.raises(ValueError):
+            writer.add_sheet("frame", COLORS, INDEX_MAP, 2.0, 9.0)
+
+
+def deflated_segments(style_map, band_rows=7):
+    """按条带压缩的工作表片段（与增量更新写出的结构相同）"""
+    height, width = style_map.shape
+    yield deflate_segment(sheet_header(width, height, 2.0, 9.0))
+    for start in range(0, height, band_rows):
+        yield deflate_segment(b"".join(sheet_rows(style_map[start:start + band_rows], row_offset=start)))
+    yield deflate_segment(b"".join(sheet_footer()), final=True)
+
+
+def check_members(data):
+    """每个成员的CRC32与解压后的内容一致，返回工作表XML"""
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        for info in archive.infolist():
+            assert zlib.crc32(archive.read(info)) == info.CRC, info.filename
+        return archive.read("xl/worksheets/sheet2.xml")
+
+
+@pytest.fixture
+def deflated_workbook():
+    """写出一个普通工作表和一个由已压缩片段组成的工作表，返回 (写出函数, 完整写出的工作表XML)"""
+    pixels = make_pixel_art(width=20, height=30, colors=4, seed=6)
+    colors, index_map = np.unique(pixels.reshape(-1, 3), axis=0, return_inverse=True)
+    hex_colors = [f"{r:02X}{g:02X}{b:02X}" for r, g, b in colors]
+    index_map = index_map.reshape(pixels.shape[:2])
+    
+    def write(output):
+        with RawXlsxWriter(output) as writer:
+            writer.add_sheet("Plain", COLORS, INDEX_MAP, 2.0, 9.0)
+            lookup = writer.register_colors(hex_colors)
+            writer.add_sheet_deflated("Deflated", deflated_segments(lookup[index_map]))
+    
+    buffer = io.BytesIO()
+    with RawXlsxWriter(buffer) as writer:
+        writer.add_sheet("Plain", COLORS, INDEX_MAP, 2.0, 9.0)
+        writer.add_sheet("Deflated", hex_colors, index_map, 2.0, 9.0)
+    with zipfile.ZipFile(buffer) as archive:
+        expected = archive.read("xl/worksheets/sheet2.xml")
+    return write, expected
+
+
+def test_deflated_sheet_members_have_valid_crc(tmp_path, deflated_workbook):
+    write, expected = deflated_workbook
+    path = tmp_path / "out.xlsx"
+    write(str(path))
+    assert check_members(path.read_bytes()) == expected
+    assert [sheet["title"] for sheet in sheet_snapshot(str(path))["sheets"]] == ["Plain", "Deflated"]
+
+
+def test_deflated_sheet_without_raw_append(tmp_path, deflated_workbook, monkeypatch):
+    # zipfile内部结构不符时退回解压后重新压缩写入
+    write, expected = deflated_workbook
+    monkeypatch.setattr(xlsx_writer, "_can_append_raw", lambda archive: False)
+    path = tmp_path / "out.xlsx"
+    write(str(path))
+    assert check_members(path.read_bytes()) == expected
+
+
+def test_deflated_sheet_into_unseekable_stream(deflated_workbook):
+    write, expected = deflated_workbook
+    stream = UnseekableStream()
+    write(stream)
+    assert check_members(bytes(stream.data)) == expected